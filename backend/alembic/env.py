@@ -20,12 +20,16 @@ from app.models.game_faq import GameFAQ
 from app.models.game_instruction import GameInstruction
 from app.models.product import Product
 from app.models.order import Order
+from app.models.order_item import OrderItem
 from app.models.auth_token import AuthToken
 from app.models.blog.article import Article, ArticleTag
 from app.models.support import SupportMessage
 from app.models.referral import ReferralEarning
 from app.models.payment_terms import PaymentTerm
 from app.models.review import Review  # ДОБАВЛЕНО: Импорт модели отзывов
+from app.models.outbox import OutboxEvent
+from app.models.notification import NotificationReadState
+from app.models.payment_event import PaymentEvent
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
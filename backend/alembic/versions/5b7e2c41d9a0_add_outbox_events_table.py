@@ -0,0 +1,44 @@
+"""add_outbox_events_table
+
+Revision ID: 5b7e2c41d9a0
+Revises: 1cf026cc6dfa
+Create Date: 2026-10-18 10:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b7e2c41d9a0'
+down_revision: Union[str, None] = '1cf026cc6dfa'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('outbox_events',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('event_type', sa.String(length=64), nullable=False),
+    sa.Column('payload', sa.JSON(), nullable=False),
+    sa.Column('status', sa.Enum('pending', 'processing', 'done', 'failed', name='outboxstatus'), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('available_at', sa.DateTime(), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('processed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_outbox_events_id'), 'outbox_events', ['id'], unique=False)
+    op.create_index('ix_outbox_events_status_available_at', 'outbox_events', ['status', 'available_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_outbox_events_status_available_at', table_name='outbox_events')
+    op.drop_index(op.f('ix_outbox_events_id'), table_name='outbox_events')
+    op.drop_table('outbox_events')
+    sa.Enum(name='outboxstatus').drop(op.get_bind(), checkfirst=True)
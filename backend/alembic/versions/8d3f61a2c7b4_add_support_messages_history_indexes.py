@@ -0,0 +1,30 @@
+"""add_support_messages_history_indexes
+
+Revision ID: 8d3f61a2c7b4
+Revises: 5b7e2c41d9a0
+Create Date: 2026-10-18 11:05:12.402117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d3f61a2c7b4'
+down_revision: Union[str, None] = '5b7e2c41d9a0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_support_messages_user_id_created_at', 'support_messages', ['user_id', 'created_at'], unique=False)
+    op.create_index('ix_support_messages_guest_id_created_at', 'support_messages', ['guest_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_support_messages_guest_id_created_at', table_name='support_messages')
+    op.drop_index('ix_support_messages_user_id_created_at', table_name='support_messages')
@@ -0,0 +1,38 @@
+"""add_notification_read_states
+
+Revision ID: a41c9e7f3b2d
+Revises: 8d3f61a2c7b4
+Create Date: 2026-10-18 11:48:31.220945
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a41c9e7f3b2d'
+down_revision: Union[str, None] = '8d3f61a2c7b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('notification_read_states',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('owner_key', sa.String(length=128), nullable=False),
+    sa.Column('channel', sa.String(length=32), nullable=False),
+    sa.Column('last_read_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('owner_key', 'channel', name='uq_notification_read_states_owner_channel')
+    )
+    op.create_index('ix_orders_user_id_updated_at', 'orders', ['user_id', 'updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_orders_user_id_updated_at', table_name='orders')
+    op.drop_table('notification_read_states')
@@ -0,0 +1,40 @@
+"""add_payment_events_table
+
+Revision ID: c27d5b8e0f13
+Revises: a41c9e7f3b2d
+Create Date: 2026-10-18 12:31:07.845310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c27d5b8e0f13'
+down_revision: Union[str, None] = 'a41c9e7f3b2d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('payment_events',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('provider', sa.String(length=32), nullable=False),
+    sa.Column('inv_id', sa.Integer(), nullable=False),
+    sa.Column('out_sum', sa.String(length=32), nullable=False),
+    sa.Column('signature', sa.String(length=128), nullable=False),
+    sa.Column('payload', sa.JSON(), nullable=False),
+    sa.Column('result', sa.String(length=32), nullable=True),
+    sa.Column('received_at', sa.DateTime(), nullable=False),
+    sa.Column('processed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('provider', 'inv_id', 'out_sum', 'signature', name='uq_payment_events_delivery')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('payment_events')
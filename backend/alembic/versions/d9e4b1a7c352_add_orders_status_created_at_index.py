@@ -0,0 +1,28 @@
+"""add_orders_status_created_at_index
+
+Revision ID: d9e4b1a7c352
+Revises: c27d5b8e0f13
+Create Date: 2026-10-18 15:02:47.518302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd9e4b1a7c352'
+down_revision: Union[str, None] = 'c27d5b8e0f13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_orders_status_created_at', 'orders', ['status', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_orders_status_created_at', table_name='orders')
@@ -0,0 +1,308 @@
+"""add_order_items_table
+
+Revision ID: e6c2f8d41a97
+Revises: d9e4b1a7c352
+Create Date: 2026-10-18 16:21:09.734118
+
+"""
+import json
+import re
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation, ROUND_DOWN
+from typing import Iterable, List, Optional, Sequence, Tuple, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6c2f8d41a97'
+down_revision: Union[str, None] = 'd9e4b1a7c352'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH = 1000
+CENT = Decimal("0.01")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('order_items',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=True),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('product_name', sa.String(length=255), nullable=True),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('price', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('amount', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('currency', sa.String(length=10), nullable=False),
+    sa.Column('form_data', sa.JSON().with_variant(postgresql.JSONB(), 'postgresql'), nullable=True),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_order_items_order_id'), 'order_items', ['order_id'], unique=False)
+    op.create_index(op.f('ix_order_items_product_id'), 'order_items', ['product_id'], unique=False)
+
+    backfill_order_items()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_order_items_product_id'), table_name='order_items')
+    op.drop_index(op.f('ix_order_items_order_id'), table_name='order_items')
+    op.drop_table('order_items')
+
+
+# ------------------------------------------------------------
+# Замороженная копия app.services.order_comments.parse_order_comment на момент миграции:
+# миграция не должна менять результат бэкфилла вслед за изменениями парсера в приложении
+# ------------------------------------------------------------
+FORMS_SECTION = "Данные форм:"
+GUEST_KEYS = ("guest_email", "guest_name")
+
+# "[Товар #12] {...}" (гостевые) и "[12] {...}" (bulk)
+_ITEM_LINE = re.compile(r"^\[(?:Товар #)?(\d+)\]\s?(.*)$")
+
+
+@dataclass
+class CommentItem:
+    """Позиция корзины, восстановленная из старого формата comment"""
+    product_id: Optional[int]
+    product_name: Optional[str] = None
+    amount: Optional[Decimal] = None
+    form_data: Optional[dict] = None
+    text: Optional[str] = None  # данные формы, если это не JSON
+
+
+@dataclass
+class ParsedComment:
+    guest: dict = field(default_factory=dict)  # guest_email, guest_name
+    items: List[CommentItem] = field(default_factory=list)
+    user_data: dict = field(default_factory=dict)  # ручные заказы: JSON или key=value
+    text: List[str] = field(default_factory=list)  # строки без структуры
+
+
+def parse_form_data(value) -> Optional[dict]:
+    """JSON данных формы из позиции корзины (None, если это не JSON-объект)"""
+    if isinstance(value, dict):
+        return value
+    if not value:
+        return None
+    try:
+        data = json.loads(value)
+    except (TypeError, ValueError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _decimal(value) -> Optional[Decimal]:
+    try:
+        return Decimal(str(value)) if value is not None else None
+    except InvalidOperation:
+        return None
+
+
+def _parse_item_lines(lines: Iterable[str]) -> List[CommentItem]:
+    items = []
+    for line in lines:
+        match = _ITEM_LINE.match(line.strip())
+        if not match:
+            continue
+        text = match.group(2).strip()
+        form_data = parse_form_data(text)
+        items.append(CommentItem(
+            product_id=int(match.group(1)),
+            form_data=form_data,
+            text=None if form_data is not None or not text else text,
+        ))
+    return items
+
+
+def _parse_key_values(lines: Iterable[str]) -> Tuple[dict, List[str]]:
+    data, text = {}, []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if "=" in line:
+            key, value = line.split("=", 1)
+            data[key.strip()] = value.strip()
+        elif ":" in line and not line.startswith("http"):
+            key, value = line.split(":", 1)
+            data[key.strip()] = value.strip()
+        else:
+            text.append(line)
+    return data, text
+
+
+def parse_order_comment(comment: Optional[str]) -> ParsedComment:
+    """
+    Разбирает comment в старых форматах:
+    - гостевой: JSON {"guest_email", "guest_name", "items": [...]} + секция "Данные форм:";
+    - bulk: строки "[product_id] данные формы";
+    - ручной/одиночный: JSON-объект или строки key=value / key: value.
+    """
+    parsed = ParsedComment()
+    if not comment:
+        return parsed
+
+    comment = comment.replace("\r\n", "\n")
+    head, _, forms = comment.partition(f"\n\n{FORMS_SECTION}\n")
+    if not forms and head.startswith(FORMS_SECTION):
+        head, forms = "", head[len(FORMS_SECTION):]
+
+    try:
+        data = json.loads(head)
+    except ValueError:
+        data = None
+
+    if isinstance(data, dict) and isinstance(data.get("items"), list):
+        parsed.guest = {key: data.get(key) for key in GUEST_KEYS}
+        for item in data["items"]:
+            if not isinstance(item, dict):
+                continue
+            form_data = parse_form_data(item.get("comment"))
+            parsed.items.append(CommentItem(
+                product_id=item.get("product_id"),
+                product_name=item.get("product_name"),
+                amount=_decimal(item.get("amount")),
+                form_data=form_data,
+                text=item.get("comment") if form_data is None and item.get("comment") else None,
+            ))
+    elif isinstance(data, dict):
+        parsed.guest = {key: data[key] for key in GUEST_KEYS if key in data}
+        parsed.user_data = {key: value for key, value in data.items() if key not in GUEST_KEYS}
+    elif head:
+        lines = head.split("\n")
+        parsed.items = _parse_item_lines(lines)
+        if not parsed.items:
+            parsed.user_data, parsed.text = _parse_key_values(lines)
+
+    # Секция "Данные форм" дополняет позиции из JSON тем, чего в них не было
+    if forms:
+        by_product = {item.product_id: item for item in parsed.items}
+        for form_item in _parse_item_lines(forms.strip().split("\n")):
+            item = by_product.get(form_item.product_id)
+            if item is None:
+                parsed.items.append(form_item)
+            elif item.form_data is None and item.text is None:
+                item.form_data, item.text = form_item.form_data, form_item.text
+    return parsed
+
+
+def _money(value) -> Decimal:
+    return Decimal(str(value or 0)).quantize(CENT)
+
+
+def _fit_to_total(items: list, total: Decimal) -> list:
+    """
+    Суммы позиций без своей цены в comment взяты по текущему каталогу и могут не сойтись
+    с orders.amount: раскладываем сумму заказа пропорционально (без известных цен - поровну),
+    остаток копеек достается последней позиции
+    """
+    if sum(item["amount"] for item in items) == total:
+        return items
+    weights = [item["amount"] for item in items]
+    if sum(weights) <= 0:
+        weights = [Decimal(1)] * len(items)
+    weight_total = sum(weights)
+
+    allocated = Decimal("0.00")
+    for item, weight in zip(items[:-1], weights):
+        amount = (total * weight / weight_total).quantize(CENT, rounding=ROUND_DOWN)
+        item["price"] = item["amount"] = amount
+        allocated += amount
+    items[-1]["price"] = items[-1]["amount"] = total - allocated
+    return items
+
+
+def _legacy_items(row, products: dict) -> list:
+    """Позиции заказа из comment (старый формат); comment заказа не меняется"""
+    parsed = parse_order_comment(row.comment)
+    quantity = row.quantity or 1
+
+    if len(parsed.items) > 1:
+        items = []
+        for position, item in enumerate(parsed.items):
+            name, price = products.get(item.product_id, (None, None))
+            amount = _money(item.amount if item.amount is not None else price)
+            form_data = item.form_data if item.form_data is not None else (
+                {"comment": item.text} if item.text else None
+            )
+            items.append({
+                "order_id": row.id,
+                "product_id": item.product_id if item.product_id in products else None,
+                "position": position,
+                "product_name": item.product_name or name,
+                "quantity": 1,
+                "price": amount,
+                "amount": amount,
+                "currency": row.currency,
+                "form_data": form_data,
+            })
+        return _fit_to_total(items, _money(row.amount))
+
+    # Одна позиция - сумма и количество берутся из самого заказа
+    item = parsed.items[0] if parsed.items else None
+    form_data = parsed.user_data or None
+    if item is not None:
+        form_data = item.form_data if item.form_data is not None else (
+            {"comment": item.text} if item.text else None
+        )
+    name, _ = products.get(row.product_id, (None, None))
+    return [{
+        "order_id": row.id,
+        "product_id": row.product_id if row.product_id in products else None,
+        "position": 0,
+        "product_name": row.manual_game_name or (item.product_name if item else None) or name,
+        "quantity": quantity,
+        "price": _money(Decimal(str(row.amount)) / quantity),
+        "amount": _money(row.amount),
+        "currency": row.currency,
+        "form_data": form_data,
+    }]
+
+
+def backfill_order_items():
+    """Переносит товары и данные форм из orders.comment в order_items пачками по id"""
+    bind = op.get_bind()
+    orders = sa.table(
+        'orders',
+        sa.column('id', sa.Integer), sa.column('product_id', sa.Integer),
+        sa.column('quantity', sa.Integer), sa.column('amount', sa.Numeric(10, 2)),
+        sa.column('currency', sa.String), sa.column('comment', sa.Text),
+        sa.column('manual_game_name', sa.String),
+    )
+    products = sa.table(
+        'products', sa.column('id', sa.Integer), sa.column('name', sa.String), sa.column('price_rub', sa.Numeric(10, 2))
+    )
+    order_items = sa.table(
+        'order_items',
+        sa.column('order_id', sa.Integer), sa.column('product_id', sa.Integer),
+        sa.column('position', sa.Integer), sa.column('product_name', sa.String),
+        sa.column('quantity', sa.Integer), sa.column('price', sa.Numeric(10, 2)),
+        sa.column('amount', sa.Numeric(10, 2)), sa.column('currency', sa.String),
+        sa.column('form_data', sa.JSON(none_as_null=True).with_variant(postgresql.JSONB(none_as_null=True), 'postgresql')),
+    )
+
+    catalog = {
+        row.id: (row.name, row.price_rub)
+        for row in bind.execute(sa.select(products.c.id, products.c.name, products.c.price_rub))
+    }
+
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(orders).where(orders.c.id > last_id).order_by(orders.c.id).limit(BACKFILL_BATCH)
+        ).fetchall()
+        if not rows:
+            break
+        items = []
+        for row in rows:
+            items.extend(_legacy_items(row, catalog))
+        if items:
+            bind.execute(order_items.insert(), items)
+        last_id = rows[-1].id
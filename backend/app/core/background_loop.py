@@ -0,0 +1,81 @@
+# backend/app/core/background_loop.py - ОТДЕЛЬНЫЙ EVENT LOOP В ФОНОВОМ ПОТОКЕ
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Coroutine, Optional
+
+from loguru import logger
+
+
+class BackgroundLoop:
+    """
+    Долгоживущий event loop в daemon-потоке.
+
+    Нужен для async клиентов (aiohttp, aiogram), которые вызываются из
+    синхронного кода: сессия создается один раз и всегда живет в этом loop,
+    а не в временном loop очередного потока.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None or not self._thread.is_alive():
+            with self._lock:
+                if self._loop is None or not self._thread.is_alive():
+                    self._start()
+        return self._loop
+
+    def _start(self):
+        started = threading.Event()
+        loop = asyncio.new_event_loop()
+
+        def run():
+            asyncio.set_event_loop(loop)
+            loop.call_soon(started.set)
+            loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name=self.name, daemon=True)
+        self._thread.start()
+        started.wait()
+        self._loop = loop
+        logger.debug(f"🔁 Фоновый event loop '{self.name}' запущен")
+
+    def in_loop(self) -> bool:
+        """True, если код уже выполняется в этом loop"""
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def submit(self, coro: Coroutine) -> Future:
+        """Запускает корутину в фоновом loop, не дожидаясь результата"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Coroutine, timeout: Optional[float] = None) -> Any:
+        """Запускает корутину в фоновом loop и ждет результат (только из синхронного кода)"""
+        return self.submit(coro).result(timeout)
+
+    async def run_async(self, coro: Coroutine) -> Any:
+        """Await из любого другого loop"""
+        if self.in_loop():
+            return await coro
+        return await asyncio.wrap_future(self.submit(coro))
+
+    def stop(self, shutdown: Optional[Coroutine] = None, timeout: float = 5):
+        """Останавливает loop, предварительно выполнив shutdown-корутину (закрытие сессий)"""
+        if self._loop is None or not self._thread.is_alive():
+            if shutdown is not None:
+                shutdown.close()
+            return
+        if shutdown is not None:
+            try:
+                self.run(shutdown, timeout)
+            except Exception as e:
+                logger.warning(f"⚠️ Ошибка остановки '{self.name}': {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)
@@ -7,6 +7,28 @@ class Settings(BaseSettings):
     # База данных
     DATABASE_URL: str
 
+    # Пул соединений БД. Каждый процесс (API-воркер uvicorn, outbox воркер, бот) держит два
+    # engine - sync и async, поэтому в худшем случае соединений:
+    #   DB_PROCESS_COUNT * 2 * (DB_POOL_SIZE + DB_MAX_OVERFLOW) <= DB_CONNECTION_BUDGET
+    # DB_CONNECTION_BUDGET - max_connections PostgreSQL (по умолчанию 100) минус
+    # superuser_reserved_connections и запас на миграции/psql. Без явных DB_POOL_SIZE /
+    # DB_MAX_OVERFLOW пул считается из бюджета: 80 // (6 * 2) = 6 -> pool 4 + overflow 2.
+    # Сверх пула запросы ждут соединение до DB_POOL_TIMEOUT, а не получают "too many clients".
+    DB_CONNECTION_BUDGET: int = 80
+    DB_PROCESS_COUNT: int = 6  # UVICORN_WORKERS (4) + outbox воркер + бот, см. docker-compose.prod.yml
+    DB_POOL_SIZE: Optional[int] = None
+    DB_MAX_OVERFLOW: Optional[int] = None
+    DB_POOL_TIMEOUT: int = 30  # секунды ожидания свободного соединения
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE: int = 1800  # секунды, 0 - не пересоздавать
+    DB_STATEMENT_TIMEOUT_MS: int = 15000  # statement_timeout PostgreSQL, 0 - без ограничения
+    DB_ECHO: bool = False
+
+    # Бюджет SQL на один HTTP запрос (0 - без ограничения)
+    SQL_BUDGET_MAX_QUERIES: int = 50
+    SQL_BUDGET_MAX_TIME_MS: int = 2000
+    SQL_BUDGET_ENFORCE: bool = False  # True - отклонять запросы сверх лимита числа запросов
+
     # JWT
     JWT_SECRET: str
 
@@ -16,10 +38,47 @@ class Settings(BaseSettings):
     MAIL_PORT: Optional[int] = None
     MAIL_USERNAME: Optional[str] = None
     MAIL_PASSWORD: Optional[str] = None
+    SMTP_POOL_SIZE: int = 2  # одновременно открытых SMTP соединений на процесс
+    SMTP_IDLE_CHECK: int = 30  # секунды простоя, после которых соединение проверяется NOOP
+    SMTP_BATCH_SIZE: int = 20  # писем из фоновой очереди за одну сессию
+
+    # Шаблоны писем (None - каталог байткода во временной папке системы)
+    EMAIL_TEMPLATE_CACHE_DIR: Optional[str] = None
+    EMAIL_TEMPLATES_AUTO_RELOAD: bool = False  # True - перечитывать измененные шаблоны (разработка)
 
     # Telegram-бот
     TG_BOT_TOKEN: Optional[str] = None
     TG_ADMIN_CHAT_IDS: Optional[str] = None
+    TG_GLOBAL_RATE: float = 25  # сообщений в секунду на бота (лимит Telegram ~30)
+    TG_PER_CHAT_RATE: float = 1  # сообщений в секунду в один чат
+    TG_PER_CHAT_BURST: int = 3
+    TG_MAX_RETRIES: int = 5
+    TG_MAX_CONNECTIONS: int = 10
+
+    # Redis для pub/sub между API, ботом и воркером (None - только внутри процесса)
+    REDIS_URL: Optional[str] = None
+
+    # WebSocket чат поддержки
+    WS_SEND_QUEUE_SIZE: int = 100  # сообщений в буфере одного сокета, дальше - отключение
+    WS_HEARTBEAT_INTERVAL: int = 25  # секунд между ping
+    WS_HEARTBEAT_TIMEOUT: int = 60  # секунд без сообщений от клиента до отключения
+    WS_REPLAY_BUFFER_SIZE: int = 50  # последних сообщений комнаты в памяти для догрузки
+    WS_REPLAY_MAX_ROOMS: int = 1000  # комнат с буфером (самые давние вытесняются)
+    WS_REPLAY_MAX_MESSAGES: int = 200  # максимум сообщений при догрузке из БД
+    WS_AUTH_TIMEOUT: int = 10  # секунд на кадр {"type": "auth"}, если токена нет в query
+
+    # История чата поддержки
+    SUPPORT_HISTORY_PAGE_SIZE: int = 50  # страница /api/support/history по умолчанию
+    SUPPORT_HISTORY_MAX_PAGE: int = 100
+    SUPPORT_MY_LIMIT: int = 200  # последних сообщений в /api/support/my
+
+    # Уведомления: за сколько часов показывать события
+    NOTIFICATION_WINDOW_HOURS: int = 24
+
+    # SSE статуса заказа (/api/orders/{id}/events)
+    ORDER_EVENTS_HEARTBEAT: int = 15  # секунд между keep-alive комментариями
+    ORDER_EVENTS_MAX_SECONDS: int = 600  # после этого поток закрывается, клиент переподключается
+    ORDER_EVENTS_RETRY_MS: int = 3000  # пауза переподключения EventSource
 
     # Фронт (для ссылок в письмах)
     FRONTEND_URL: str = "http://localhost:8000"  # fallback
@@ -27,6 +86,34 @@ class Settings(BaseSettings):
     # Реферальная система
     REFERRAL_PERCENTAGE: Optional[str] = "1.0"  # Процент от покупок рефералов (по умолчанию 1%)
 
+    # Кеш каталога игр (секунды жизни снимка, 0 - только явная инвалидация)
+    CATALOG_SNAPSHOT_TTL: int = 300
+
+    # Cache-Control: max-age для публичных GET с ETag (секунды)
+    HTTP_CACHE_MAX_AGE: int = 30
+
+    # Outbox воркер (письма, Telegram, рефералка после коммита заказа)
+    OUTBOX_BATCH_SIZE: int = 20
+    OUTBOX_POLL_INTERVAL: float = 2.0  # секунды между опросами пустой очереди
+    OUTBOX_MAX_ATTEMPTS: int = 8
+    OUTBOX_RETRY_BASE_SECONDS: int = 10  # задержка повтора: base * 2^(попытка-1)
+    OUTBOX_RETRY_MAX_SECONDS: int = 3600
+    OUTBOX_LEASE_SECONDS: int = 300  # через сколько зависшее событие снова берется в работу
+
+    # Сверка зависших pending заказов RoboKassa через OpStateExt (в воркере)
+    RECONCILE_ENABLED: bool = True
+    RECONCILE_INTERVAL_MINUTES: int = 10
+    RECONCILE_MIN_AGE_MINUTES: int = 15  # моложе - Result еще может прийти сам
+    RECONCILE_MAX_AGE_HOURS: int = 72  # старше - ссылка давно протухла, не опрашиваем
+    RECONCILE_BATCH_SIZE: int = 100
+    RECONCILE_CONCURRENCY: int = 5  # одновременных запросов к RoboKassa
+    RECONCILE_REQUEST_TIMEOUT: int = 15
+
+    # Массовый импорт/экспорт товаров в админке
+    PRODUCT_IMPORT_CHUNK_SIZE: int = 500  # строк на одну транзакцию
+    PRODUCT_IMPORT_REPORT_LIMIT: int = 1000  # подробных изменений/ошибок в отчете
+    PRODUCT_IMPORT_MAX_ROWS: int = 50000
+
     class Config:
         env_file = ".env"  # или ".env.dev" — в зависимости от окружения
         extra = 'allow'
@@ -1,17 +1,82 @@
+from typing import Tuple
+
+from loguru import logger
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 from .config import settings
+from .query_stats import install_query_stats
+
+
+def get_async_database_url(url: str) -> str:
+    """Подменяет синхронный драйвер в DATABASE_URL на асинхронный"""
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    return url
+
+
+# sync + async engine в каждом процессе
+ENGINES_PER_PROCESS = 2
+
+
+def get_pool_limits() -> Tuple[int, int]:
+    """(pool_size, max_overflow) одного engine так, чтобы все процессы уложились в DB_CONNECTION_BUDGET"""
+    engines = max(1, settings.DB_PROCESS_COUNT) * ENGINES_PER_PROCESS
+    per_engine = max(1, settings.DB_CONNECTION_BUDGET // engines)
+
+    pool_size = settings.DB_POOL_SIZE
+    if pool_size is None:
+        pool_size = max(1, per_engine - per_engine // 3)
+    max_overflow = settings.DB_MAX_OVERFLOW
+    if max_overflow is None:
+        max_overflow = max(0, per_engine - pool_size)
+
+    total = engines * (pool_size + max_overflow)
+    if total > settings.DB_CONNECTION_BUDGET:
+        logger.warning(
+            f"⚠️ Пулы БД до {total} соединений при бюджете {settings.DB_CONNECTION_BUDGET}: "
+            f"{settings.DB_PROCESS_COUNT} процессов x {ENGINES_PER_PROCESS} engine x ({pool_size} + {max_overflow})"
+        )
+    return pool_size, max_overflow
+
+
+def get_engine_options(url: str) -> dict:
+    """Настройки пула и таймаутов из Settings (SQLite оставляем на дефолтах)"""
+    options = {"echo": settings.DB_ECHO}
+    if url.startswith("sqlite"):
+        return options
+
+    pool_size, max_overflow = get_pool_limits()
+    options.update(
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        pool_recycle=settings.DB_POOL_RECYCLE or -1,
+    )
+
+    if settings.DB_STATEMENT_TIMEOUT_MS > 0:
+        timeout = str(settings.DB_STATEMENT_TIMEOUT_MS)
+        if "+asyncpg" in url:
+            options["connect_args"] = {"server_settings": {"statement_timeout": timeout}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+    return options
+
 
 # 1) Создаём Engine
 engine = create_engine(
     settings.DATABASE_URL,
-    echo=True,
     future=True,
+    **get_engine_options(settings.DATABASE_URL),
 )
 
-# 2) Создаём SessionLalembic revision --autogenerate -m "add all domain tables"ocal
+# 2) Создаём SessionLocal
 SessionLocal = sessionmaker(
     bind=engine,
     autoflush=False,
@@ -19,6 +84,24 @@ SessionLocal = sessionmaker(
     future=True,
 )
 
+# 2.1) Асинхронный Engine и сессии для async def эндпоинтов
+ASYNC_DATABASE_URL = get_async_database_url(settings.DATABASE_URL)
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    **get_engine_options(ASYNC_DATABASE_URL),
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+# 2.2) Счетчик SQL на HTTP запрос (см. middleware в main.py)
+install_query_stats(engine)
+install_query_stats(async_engine.sync_engine)
+
 # 3) Declarative Base для моделей
 Base = declarative_base()
 
@@ -30,3 +113,21 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# 5) Async dependency для FastAPI (не блокирует event loop на время запроса)
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# 6) INSERT с ON CONFLICT (PostgreSQL в проде, SQLite в разработке)
+def dialect_insert(db, table):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"ON CONFLICT не поддержан для {dialect}")
+    return insert(table)
@@ -0,0 +1,123 @@
+# backend/app/core/http_cache.py - ETAG / IF-NONE-MATCH ДЛЯ ПУБЛИЧНЫХ GET ЭНДПОИНТОВ
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from fastapi import Request, Response
+
+from app.core.config import settings
+
+
+class ContentVersions:
+    """
+    Версии контента по областям ("catalog", "articles", "payment_terms") и запомненные ETag ответов.
+
+    Сам ETag - хэш тела ответа (etag_for_bytes), поэтому он одинаков во всех процессах API
+    и после рестарта. Версия области только помечает запомненные ETag устаревшими:
+    bump() вызывается после коммита в админке (в других процессах - по pub/sub),
+    а раз в ttl секунд они устаревают сами на случай пропущенного сообщения.
+    Пока запомненный ETag актуален, совпавший If-None-Match получает 304 без запроса в БД.
+    """
+
+    def __init__(self, ttl: int = 300, max_entries: int = 1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._versions: Dict[str, int] = {}
+        # (область, ключ запроса) -> (версия, эпоха, ETag)
+        self._etags: "OrderedDict[Tuple[str, str], Tuple[int, int, str]]" = OrderedDict()
+
+    def bump(self, scope: str) -> int:
+        with self._lock:
+            self._versions[scope] = self._versions.get(scope, 0) + 1
+            return self._versions[scope]
+
+    def get(self, scope: str) -> int:
+        return self._versions.get(scope, 0)
+
+    def stamp(self, scope: str) -> Tuple[int, int]:
+        """Версия и эпоха TTL - берется до чтения из БД, чтобы не запомнить ETag устаревших данных"""
+        epoch = int(time.time() // self.ttl) if self.ttl > 0 else 0
+        return self.get(scope), epoch
+
+    def cached_etag(self, scope: str, key: str) -> Optional[str]:
+        entry = self._etags.get((scope, key))
+        if entry is None or entry[:2] != self.stamp(scope):
+            return None
+        return entry[2]
+
+    def remember_etag(self, scope: str, key: str, stamp: Tuple[int, int], etag: str):
+        with self._lock:
+            self._etags[(scope, key)] = (*stamp, etag)
+            self._etags.move_to_end((scope, key))
+            while len(self._etags) > self.max_entries:
+                self._etags.popitem(last=False)
+
+
+def etag_for_bytes(content: bytes) -> str:
+    """Сильный ETag по содержимому ответа"""
+    return f'"{hashlib.sha1(content).hexdigest()[:32]}"'
+
+
+def cache_control(max_age: Optional[int] = None) -> str:
+    if max_age is None:
+        max_age = settings.HTTP_CACHE_MAX_AGE
+    return f"public, max-age={max_age}, must-revalidate"
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Проверяет If-None-Match (слабое сравнение, как требует RFC 9110)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+
+    candidates = [tag.strip() for tag in header.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def set_cache_headers(response: Response, etag: str, max_age: Optional[int] = None):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control(max_age)
+
+
+def not_modified(etag: str, max_age: Optional[int] = None) -> Response:
+    response = Response(status_code=304)
+    set_cache_headers(response, etag, max_age)
+    return response
+
+
+def cached_json(request: Request, content: bytes, etag: Optional[str] = None,
+                max_age: Optional[int] = None) -> Response:
+    """Отдает готовый JSON с валидаторами или 304, если у клиента та же версия"""
+    etag = etag or etag_for_bytes(content)
+    if etag_matches(request, etag):
+        return not_modified(etag, max_age)
+
+    response = Response(content=content, media_type="application/json")
+    set_cache_headers(response, etag, max_age)
+    return response
+
+
+# Глобальный реестр версий
+content_versions = ContentVersions(ttl=settings.CATALOG_SNAPSHOT_TTL)
+
+
+def cached_not_modified(request: Request, scope: str, key: str = "",
+                        max_age: Optional[int] = None) -> Optional[Response]:
+    """304 без запроса в БД, если If-None-Match совпал с ETag, запомненным для текущей версии"""
+    etag = content_versions.cached_etag(scope, key)
+    if etag is not None and etag_matches(request, etag):
+        return not_modified(etag, max_age)
+    return None
+
+
+def versioned_json(request: Request, scope: str, key: str, stamp: Tuple[int, int], content: bytes,
+                   max_age: Optional[int] = None) -> Response:
+    """Отдает JSON с ETag по содержимому и запоминает этот ETag для версии stamp"""
+    etag = etag_for_bytes(content)
+    content_versions.remember_etag(scope, key, stamp, etag)
+    return cached_json(request, content, etag, max_age)
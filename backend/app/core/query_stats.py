@@ -0,0 +1,86 @@
+# backend/app/core/query_stats.py - СЧЕТЧИК SQL ЗАПРОСОВ И БЮДЖЕТ НА ОДИН HTTP ЗАПРОС
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+
+class QueryBudgetExceeded(Exception):
+    """Запрос выполнил больше SQL, чем разрешено SQL_BUDGET_MAX_QUERIES"""
+
+    def __init__(self, count: int, limit: int):
+        self.count = count
+        self.limit = limit
+        super().__init__(f"SQL budget exceeded: {count} > {limit} statements")
+
+
+class QueryStats:
+    """
+    Статистика SQL одного HTTP запроса.
+
+    Объект изменяемый: sync эндпоинты работают в пуле потоков с копией
+    контекста, но ссылка на тот же объект в копии сохраняется.
+    """
+
+    __slots__ = ("count", "total_ms", "max_queries", "enforce")
+
+    def __init__(self, max_queries: int = 0, enforce: bool = False):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_queries = max_queries
+        self.enforce = enforce
+
+    @property
+    def over_count(self) -> bool:
+        return 0 < self.max_queries < self.count
+
+    def over_time(self, max_time_ms: int) -> bool:
+        return 0 < max_time_ms < self.total_ms
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def start_request_stats() -> QueryStats:
+    """Заводит статистику для текущего запроса (вызывается из middleware)"""
+    stats = QueryStats(
+        max_queries=settings.SQL_BUDGET_MAX_QUERIES,
+        enforce=settings.SQL_BUDGET_ENFORCE,
+    )
+    _current_stats.set(stats)
+    return stats
+
+
+def get_request_stats() -> Optional[QueryStats]:
+    return _current_stats.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    if stats is None:
+        return
+
+    stats.count += 1
+    if stats.enforce and stats.over_count:
+        raise QueryBudgetExceeded(stats.count, stats.max_queries)
+    if context is not None:
+        context._query_start_time = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    started = getattr(context, "_query_start_time", None)
+    if stats is None or started is None:
+        return
+
+    stats.total_ms += (time.perf_counter() - started) * 1000
+
+
+def install_query_stats(engine: Engine):
+    """Подписывает engine на подсчет запросов (для async engine передается .sync_engine)"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
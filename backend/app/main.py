@@ -1,8 +1,13 @@
 # backend/app/main.py - ИСПРАВЛЕННАЯ ВЕРСИЯ
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from app.routers import router as api_router
+from app.core.config import settings
 from app.core.logger import logger
+from app.core.query_stats import QueryBudgetExceeded, start_request_stats
+from app.services.email_templates import email_templates
+from app.services.pubsub import pubsub
 from fastapi.middleware.cors import CORSMiddleware
 
 import os
@@ -39,6 +44,27 @@ if not os.path.exists(uploads_dir):
 # Подключаем статические файлы для uploads
 app.mount("/uploads", StaticFiles(directory=uploads_dir), name="uploads")
 
+@app.middleware("http")
+async def sql_budget(request: Request, call_next):
+    """Считает SQL запросы обработчика и предупреждает о выходе за бюджет (ловит N+1)"""
+    stats = start_request_stats()
+    response = await call_next(request)
+
+    if stats.over_count or stats.over_time(settings.SQL_BUDGET_MAX_TIME_MS):
+        logger.warning(
+            f"🐢 SQL бюджет превышен: {request.method} {request.url.path} - "
+            f"{stats.count} запросов, {stats.total_ms:.0f} мс "
+            f"(лимит {settings.SQL_BUDGET_MAX_QUERIES} / {settings.SQL_BUDGET_MAX_TIME_MS} мс)"
+        )
+    return response
+
+
+@app.exception_handler(QueryBudgetExceeded)
+async def query_budget_exceeded_handler(request: Request, exc: QueryBudgetExceeded):
+    logger.error(f"❌ Запрос {request.method} {request.url.path} отклонен: {exc}")
+    return JSONResponse(status_code=503, content={"detail": "Too many database queries"})
+
+
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     logger.info(f"📥 {request.method} {request.url}")
@@ -53,6 +79,21 @@ async def log_requests(request: Request, call_next):
 # Подключаем основной API роутер
 app.include_router(api_router)
 
+
+@app.on_event("startup")
+def precompile_email_templates():
+    email_templates.precompile()
+
+
+@app.on_event("startup")
+async def start_pubsub_listener():
+    await pubsub.start_listener()
+
+
+@app.on_event("shutdown")
+async def stop_pubsub_listener():
+    await pubsub.stop_listener()
+
 @app.get("/")
 def read_root():
     logger.debug("Root endpoint called")
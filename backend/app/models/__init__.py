@@ -4,6 +4,7 @@ from app.models.game_subcategory import GameSubcategory
 from app.models.product import Product
 from app.models.user import User
 from app.models.order import Order
+from app.models.order_item import OrderItem
 from app.models.auth_token import AuthToken
 from app.models.blog.article import Article, ArticleTag
 from app.models.support import SupportMessage
@@ -13,6 +14,9 @@ from app.models.game_faq import GameFAQ
 from app.models.game_instruction import GameInstruction
 from app.models.game_input_field import GameInputField
 from app.models.review import Review  # ДОБАВЛЕНО
+from app.models.outbox import OutboxEvent
+from app.models.notification import NotificationReadState
+from app.models.payment_event import PaymentEvent
 
 __all__ = [
     "Game",
@@ -21,6 +25,7 @@ __all__ = [
     "Product",
     "User",
     "Order",
+    "OrderItem",
     "AuthToken",
     "Article",
     "ArticleTag",
@@ -30,4 +35,7 @@ __all__ = [
     "GameFAQ",
     "GameInstruction",
     "Review",  # ДОБАВЛЕНО
+    "OutboxEvent",
+    "NotificationReadState",
+    "PaymentEvent",
 ]
\ No newline at end of file
@@ -0,0 +1,26 @@
+# backend/app/models/notification.py - ОТМЕТКИ ПРОЧТЕНИЯ УВЕДОМЛЕНИЙ
+from sqlalchemy import Column, Integer, String, DateTime, UniqueConstraint
+from datetime import datetime
+from app.core.database import Base
+
+
+class NotificationReadState(Base):
+    """
+    До какого момента владелец прочитал уведомления канала.
+    owner_key: "user:<id>" или "guest:<guest_id>", channel: "support_reply", "order_update".
+    Непрочитанные - все события канала новее last_read_at.
+    """
+    __tablename__ = "notification_read_states"
+
+    id = Column(Integer, primary_key=True)
+    owner_key = Column(String(128), nullable=False)
+    channel = Column(String(32), nullable=False)
+    last_read_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("owner_key", "channel", name="uq_notification_read_states_owner_channel"),
+    )
+
+    def __repr__(self):
+        return f"<NotificationReadState(owner={self.owner_key}, channel={self.channel}, at={self.last_read_at})>"
@@ -1,5 +1,5 @@
 # backend/app/models/order.py - ОБНОВЛЕННАЯ ВЕРСИЯ С ОТЗЫВАМИ
-from sqlalchemy import Column, Integer, String, ForeignKey, Numeric, DateTime, Enum, Text, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, Numeric, DateTime, Enum, Text, Boolean, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.database import Base
@@ -51,9 +51,24 @@ class Order(Base):
     game = relationship("Game")
     product = relationship("Product")
 
+    # Позиции корзины (товары, количества, данные форм)
+    items = relationship(
+        "OrderItem",
+        back_populates="order",
+        cascade="all, delete-orphan",
+        order_by="OrderItem.position",
+    )
+
     # ДОБАВЛЕНО: Связь с отзывом (один заказ = один отзыв максимум)
     review = relationship("Review", back_populates="order", uselist=False, cascade="all, delete-orphan")
 
+    # Уведомления о заказах пользователя выбираются по времени обновления,
+    # сверка платежей - pending заказы по времени создания
+    __table_args__ = (
+        Index("ix_orders_user_id_updated_at", "user_id", "updated_at"),
+        Index("ix_orders_status_created_at", "status", "created_at"),
+    )
+
     def can_leave_review(self):
         """Проверяет, можно ли оставить отзыв на этот заказ"""
         # Отзыв можно оставить только после финального статуса
@@ -0,0 +1,32 @@
+# backend/app/models/order_item.py - ПОЗИЦИИ ЗАКАЗА (ВМЕСТО СПИСКА ТОВАРОВ В COMMENT)
+from sqlalchemy import Column, Integer, String, ForeignKey, Numeric, JSON
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import relationship
+from app.core.database import Base
+
+
+class OrderItem(Base):
+    """
+    Одна позиция корзины: товар, количество, цена за единицу на момент заказа
+    и данные формы (ID игрока, сервер и т.п.).
+    """
+    __tablename__ = "order_items"
+
+    id = Column(Integer, primary_key=True)
+    order_id = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"), nullable=False, index=True)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="SET NULL"), nullable=True, index=True)
+    position = Column(Integer, nullable=False, default=0)  # порядок в корзине
+
+    product_name = Column(String(255), nullable=True)  # название на момент заказа
+    quantity = Column(Integer, nullable=False, default=1)
+    price = Column(Numeric(10, 2), nullable=False)  # за единицу
+    amount = Column(Numeric(10, 2), nullable=False)  # сумма позиции
+    currency = Column(String(10), nullable=False)
+
+    form_data = Column(JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), "postgresql"), nullable=True)
+
+    order = relationship("Order", back_populates="items")
+    product = relationship("Product")
+
+    def __repr__(self):
+        return f"<OrderItem(id={self.id}, order_id={self.order_id}, product_id={self.product_id}, quantity={self.quantity})>"
@@ -0,0 +1,39 @@
+# backend/app/models/outbox.py - ОЧЕРЕДЬ ПОБОЧНЫХ ЭФФЕКТОВ (TRANSACTIONAL OUTBOX)
+from sqlalchemy import Column, Integer, String, DateTime, Enum, Text, JSON, Index
+from datetime import datetime
+from app.core.database import Base
+import enum
+
+
+class OutboxStatus(enum.Enum):
+    pending = "pending"  # ждет обработки (или повтора после ошибки)
+    processing = "processing"  # взято воркером до available_at
+    done = "done"
+    failed = "failed"  # исчерпаны попытки
+
+
+class OutboxEvent(Base):
+    """
+    Событие, которое пишется в той же транзакции, что и изменение заказа,
+    а выполняется воркером (письма, Telegram, реферальные начисления).
+    """
+    __tablename__ = "outbox_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    event_type = Column(String(64), nullable=False)
+    payload = Column(JSON, nullable=False, default=dict)
+
+    status = Column(Enum(OutboxStatus), default=OutboxStatus.pending, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    available_at = Column(DateTime, default=datetime.utcnow, nullable=False)  # не раньше этого времени
+    last_error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    processed_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_outbox_events_status_available_at", "status", "available_at"),
+    )
+
+    def __repr__(self):
+        return f"<OutboxEvent(id={self.id}, type={self.event_type}, status={self.status})>"
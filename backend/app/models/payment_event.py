@@ -0,0 +1,32 @@
+# backend/app/models/payment_event.py - ВХОДЯЩИЕ УВЕДОМЛЕНИЯ ОБ ОПЛАТЕ (ДЕДУПЛИКАЦИЯ)
+from sqlalchemy import Column, Integer, String, DateTime, JSON, UniqueConstraint
+from datetime import datetime
+from app.core.database import Base
+
+
+class PaymentEvent(Base):
+    """
+    Каждое уведомление платежной системы (ResultURL) пишется сюда один раз.
+    Повтор с тем же (provider, inv_id, out_sum, signature) упирается в уникальный
+    ключ и не обрабатывается второй раз.
+    """
+    __tablename__ = "payment_events"
+
+    id = Column(Integer, primary_key=True)
+    provider = Column(String(32), nullable=False)  # robokassa
+    inv_id = Column(Integer, nullable=False)
+    out_sum = Column(String(32), nullable=False)
+    signature = Column(String(128), nullable=False)
+    payload = Column(JSON, nullable=False, default=dict)
+    # applied - заказ переведен в оплаченный, ignored - заказ уже был не в pending
+    result = Column(String(32), nullable=True)
+
+    received_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    processed_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("provider", "inv_id", "out_sum", "signature", name="uq_payment_events_delivery"),
+    )
+
+    def __repr__(self):
+        return f"<PaymentEvent(id={self.id}, provider={self.provider}, inv_id={self.inv_id}, result={self.result})>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, Text, DateTime, Boolean, Enum, BigInteger, String
+from sqlalchemy import Column, Integer, ForeignKey, Text, DateTime, Boolean, Enum, BigInteger, String, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.database import Base
@@ -26,3 +26,9 @@ class SupportMessage(Base):
 
     user = relationship("User", foreign_keys=[user_id])
     admin = relationship("User", foreign_keys=[admin_id])
+
+    # История диалога и уведомления всегда выбираются по владельцу в порядке времени
+    __table_args__ = (
+        Index("ix_support_messages_user_id_created_at", "user_id", "created_at"),
+        Index("ix_support_messages_guest_id_created_at", "guest_id", "created_at"),
+    )
@@ -7,6 +7,7 @@ from app.schemas.admin.articles import ArticleCreate, ArticleUpdate, ArticleRead
 from app.services.auth import get_current_user
 from app.models.user import User
 from app.services.auth import admin_required
+from app.services.cache_sync import invalidate_content
 from datetime import datetime
 
 router = APIRouter()
@@ -98,6 +99,7 @@ def create_article(article: ArticleCreate, db: Session = Depends(get_db), admin:
 
     db.commit()
     db.refresh(new_article)
+    invalidate_content("articles")
 
     categories = new_article.get_category_names()
     tags = new_article.get_tag_names()
@@ -168,6 +170,7 @@ def update_article(article_id: int, article: ArticleUpdate, db: Session = Depend
 
     db.commit()
     db.refresh(db_article)
+    invalidate_content("articles")
     return db_article
 
 
@@ -179,6 +182,7 @@ def delete_article(article_id: int, db: Session = Depends(get_db), admin: User =
 
     db.delete(db_article)
     db.commit()
+    invalidate_content("articles")
     return {"detail": "Article deleted"}
 
 
@@ -225,6 +229,7 @@ def create_category(category_data: dict, db: Session = Depends(get_db), admin: U
 
     db.add(category)
     db.commit()
+    invalidate_content("articles")
     db.refresh(category)
 
     return {"name": category.name, "slug": category.slug, "color": category.color}
\ No newline at end of file
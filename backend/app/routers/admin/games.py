@@ -4,11 +4,13 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.models.game import Game
-from app.models.game_input_field import GameInputField  # ДОБАВЛЕНО
 from app.schemas.admin.games import GameCreate, GameUpdate, GameRead
 from app.services.auth import get_current_user
 from app.models.user import User
 from app.services.auth import admin_required
+from app.services.catalog import catalog_service
+from app.services.games import sync_input_fields
+from app.services.input_validation import input_field_validator
 from loguru import logger
 
 router = APIRouter()
@@ -38,43 +40,13 @@ def create_game(game: GameCreate, db: Session = Depends(get_db), admin: User = D
     db.commit()
     db.refresh(new_game)
 
-    # ДОБАВЛЕНО: Создаем поля ввода отдельно
+    # ДОБАВЛЕНО: Создаем поля ввода отдельно (одним bulk INSERT)
     if input_fields_data:
         logger.info(f"🎮 Creating {len(input_fields_data)} input fields for game {new_game.id}")
-
-        for idx, field_data in enumerate(input_fields_data):
-            # Пропускаем поля без названия
-            if not field_data.get('name') or not field_data.get('label'):
-                logger.warning(f"🎮 Skipping field {idx}: missing name or label")
-                continue
-
-            # ВАЖНО: Обрабатываем subcategory_id
-            subcategory_id = field_data.get('subcategory_id')
-            if subcategory_id == 0:  # Если выбрано "Для всех подкатегорий"
-                subcategory_id = None
-
-            input_field = GameInputField(
-                game_id=new_game.id,
-                name=field_data['name'],
-                label=field_data['label'],
-                field_type=field_data.get('type', 'text'),
-                required=field_data.get('required', True),
-                placeholder=field_data.get('placeholder'),
-                help_text=field_data.get('help_text'),
-                options=field_data.get('options'),  # JSON поле
-                min_length=field_data.get('min_length'),
-                max_length=field_data.get('max_length'),
-                validation_regex=field_data.get('validation_regex'),
-                sort_order=idx,
-                subcategory_id=subcategory_id,  # КЛЮЧЕВОЕ ПОЛЕ!
-                enabled=True
-            )
-
-            db.add(input_field)
-            logger.info(f"🎮 Added input field: {field_data['label']} (subcategory: {subcategory_id})")
-
+        sync_input_fields(db, new_game.id, input_fields_data)
         db.commit()
 
+    catalog_service.invalidate(f"game {new_game.id} created")
     logger.info(f"🎮 Game created successfully: {new_game.id}")
     return new_game
 
@@ -111,43 +83,17 @@ def update_game(game_id: int, game: GameUpdate, db: Session = Depends(get_db), a
     for field, value in game_data.items():
         setattr(db_game, field, value)
 
-    # ДОБАВЛЕНО: Обновляем поля ввода
+    # ДОБАВЛЕНО: Обновляем поля ввода - только то, что реально изменилось
+    field_changes = None
     if input_fields_data is not None:
         logger.info(f"🎮 Updating input fields for game {game_id}")
-
-        # Удаляем все старые поля
-        db.query(GameInputField).filter(GameInputField.game_id == game_id).delete()
-
-        # Создаем новые поля
-        for idx, field_data in enumerate(input_fields_data):
-            if not field_data.get('name') or not field_data.get('label'):
-                continue
-
-            subcategory_id = field_data.get('subcategory_id')
-            if subcategory_id == 0:
-                subcategory_id = None
-
-            input_field = GameInputField(
-                game_id=game_id,
-                name=field_data['name'],
-                label=field_data['label'],
-                field_type=field_data.get('type', 'text'),
-                required=field_data.get('required', True),
-                placeholder=field_data.get('placeholder'),
-                help_text=field_data.get('help_text'),
-                options=field_data.get('options'),
-                min_length=field_data.get('min_length'),
-                max_length=field_data.get('max_length'),
-                validation_regex=field_data.get('validation_regex'),
-                sort_order=idx,
-                subcategory_id=subcategory_id,
-                enabled=True
-            )
-
-            db.add(input_field)
+        field_changes = sync_input_fields(db, game_id, input_fields_data)
 
     db.commit()
     db.refresh(db_game)
+    catalog_service.invalidate(f"game {game_id} updated")
+    if field_changes is not None and field_changes.changed:
+        input_field_validator.invalidate(game_id)
     logger.info(f"🎮 Game {game_id} updated successfully")
     return db_game
 
@@ -163,6 +109,7 @@ def delete_game(game_id: int, db: Session = Depends(get_db), admin: User = Depen
     # Мягкое удаление
     db_game.is_deleted = True
     db.commit()
+    catalog_service.invalidate(f"game {game_id} deleted")
     logger.info(f"🎮 Game {game_id} soft deleted successfully")
     return {"detail": "Game deleted"}
 
@@ -1,13 +1,18 @@
+from datetime import datetime, timedelta
 from fastapi import APIRouter, Depends, HTTPException, Query, Body
+from loguru import logger
+from sqlalchemy import bindparam, update
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 from decimal import Decimal
 from app.core.database import get_db
-from app.models.order import Order, OrderStatus
-from app.schemas.admin.orders import OrderRead, OrderUpdate
+from app.models.order import Order, OrderStatus, PaymentMethod
+from app.schemas.admin.orders import OrderRead, OrderUpdate, PaymentLinksReissue
 from app.services.auth import get_current_user
 from app.models.user import User
-from app.services.mailer import send_email, render_template
+from app.services.mailer import queue_email, render_template
+from app.services.order_events import publish_order_status
+from app.services.robokassa import payment_description, robokassa_service
 from app.services.auth import admin_required
 
 router = APIRouter()
@@ -36,10 +41,13 @@ def update_order(
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
 
-    for field, value in order_update.dict(exclude_unset=True).items():
+    changes = order_update.dict(exclude_unset=True)
+    for field, value in changes.items():
         setattr(order, field, value)
     db.commit()
     db.refresh(order)
+    if "status" in changes:
+        publish_order_status(order)
 
     user = db.query(User).filter(User.id == order.user_id).first()
     if order.status == "completed" and user and user.email:
@@ -49,7 +57,7 @@ def update_order(
             "currency": order.currency,
             "username": user.username,
         })
-        send_email(
+        queue_email(
             to=user.email,
             subject="✅ Заказ выполнен | Donate Raid",
             body=html
@@ -109,6 +117,7 @@ def refund_order(
     user.balance = new_balance
     order.status = OrderStatus.canceled
     db.commit()
+    publish_order_status(order)
 
     print(f"    → Баланс user_id={user.id} был {old_balance}, стал {new_balance}")
     print(f"    → Заказ id={order.id} переведён в статус {order.status}")
@@ -121,7 +130,7 @@ def refund_order(
             "currency": order.currency,
             "username": user.username,
         })
-        send_email(
+        queue_email(
             to=user.email,
             subject="💸 Возврат средств | Donate Raid",
             body=html
@@ -135,4 +144,43 @@ def refund_order(
         "order_id": order.id,
         "user_id": user.id,
         "currency": order.currency
-    }
\ No newline at end of file
+    }
+
+
+@router.post("/payment-links/reissue")
+def reissue_payment_links(
+    data: PaymentLinksReissue,
+    db: Session = Depends(get_db),
+    admin: User = Depends(admin_required)
+):
+    """Перевыпуск ссылок RoboKassa для неоплаченных заказов (например, после истечения)"""
+    query = (
+        db.query(Order.id, Order.amount)
+        .filter(
+            Order.status == OrderStatus.pending,
+            Order.payment_method.in_([PaymentMethod.sberbank, PaymentMethod.sbp]),
+        )
+    )
+    if data.order_ids:
+        query = query.filter(Order.id.in_(data.order_ids))
+    if data.older_than_minutes:
+        query = query.filter(Order.updated_at < datetime.utcnow() - timedelta(minutes=data.older_than_minutes))
+    rows = query.order_by(Order.id).limit(max(1, min(data.limit, 5000))).all()
+
+    urls = robokassa_service.create_payment_urls(
+        (order_id, amount, payment_description(order_id)) for order_id, amount in rows
+    )
+    if urls:
+        # Один UPDATE с executemany вместо загрузки и сохранения каждого заказа
+        db.execute(
+            update(Order.__table__)
+            .where(Order.__table__.c.id == bindparam("order_id"))
+            .where(Order.__table__.c.status == OrderStatus.pending)
+            .values(payment_url=bindparam("payment_url"), updated_at=datetime.utcnow()),
+            [{"order_id": order_id, "payment_url": url} for order_id, url in urls.items()],
+        )
+        db.commit()
+
+    logger.info(f"💳 Перевыпущено {len(urls)} ссылок на оплату (админ {admin.id})")
+    return {"reissued": len(urls), "order_ids": list(urls)}
+
@@ -1,11 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
+from app.core.config import settings
 from app.core.database import get_db
 from app.models.product import Product
-from app.schemas.admin.products import ProductCreate, ProductUpdate, ProductRead
+from app.schemas.admin.products import (
+    ProductCreate, ProductUpdate, ProductRead,
+    ProductImportReport, BulkPriceUpdate, BulkPriceUpdateReport,
+)
 from app.services.auth import get_current_user
 from app.models.user import User
 from app.services.auth import admin_required
+from app.services.catalog import catalog_service
+from app.services.product_import import (
+    FORMATS, ProductImportError, bulk_update_prices, iter_import_rows, product_importer,
+    stream_products_csv, stream_products_json,
+)
 from fastapi import Query
 from typing import Optional
 
@@ -29,6 +39,80 @@ def list_products(
     return query.order_by(Product.sort_order.asc()).all()
 
 
+# Массовые операции объявлены до /{product_id}, иначе "export" попадет в product_id
+@router.get("/export")
+def export_products(
+        format: str = Query("csv", description="csv или json"),
+        game_id: Optional[int] = Query(None, description="Фильтр по игре"),
+        admin: User = Depends(admin_required)
+):
+    """Потоковая выгрузка товаров (цены, порядок, подкатегория, enabled) для правки и обратного импорта"""
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"format: допустимо {', '.join(FORMATS)}")
+
+    chunk_size = settings.PRODUCT_IMPORT_CHUNK_SIZE
+    if format == "csv":
+        content = stream_products_csv(game_id, chunk_size)
+        media_type = "text/csv; charset=utf-8"
+    else:
+        content = stream_products_json(game_id, chunk_size)
+        media_type = "application/json"
+    filename = f"products{f'_game{game_id}' if game_id else ''}.{format}"
+    return StreamingResponse(
+        content,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.post("/import", response_model=ProductImportReport)
+def import_products(
+        file: UploadFile = File(...),
+        format: Optional[str] = Query(None, description="csv или json, по умолчанию - по расширению файла"),
+        dry_run: bool = Query(False, description="Только отчет об изменениях, без записи"),
+        db: Session = Depends(get_db),
+        admin: User = Depends(admin_required)
+):
+    """
+    Импорт товаров из CSV/JSON: строки с id обновляют товар (только переданные колонки),
+    строки без id создают новый. Запись пачками по PRODUCT_IMPORT_CHUNK_SIZE строк.
+    """
+    fmt = format or (file.filename or "").rsplit(".", 1)[-1].lower()
+    try:
+        rows = iter_import_rows(file.file, fmt)
+    except ProductImportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    report = product_importer.run(db, rows, dry_run=dry_run)
+    if report.error:
+        # Часть пачек могла быть уже записана - вместе с ошибкой отдаем отчет о них
+        return JSONResponse(status_code=400, content={"detail": report.error, "report": report.as_dict()})
+    return report.as_dict()
+
+
+@router.post("/prices", response_model=BulkPriceUpdateReport)
+def update_prices(data: BulkPriceUpdate, db: Session = Depends(get_db), admin: User = Depends(admin_required)):
+    """Изменение цен на процент по игре/подкатегории/списку товаров с округлением"""
+    try:
+        report = bulk_update_prices(
+            db,
+            percent=data.percent,
+            game_id=data.game_id,
+            subcategory_id=data.subcategory_id,
+            product_ids=data.product_ids,
+            round_to=data.round_to,
+            old_price=data.old_price,
+            dry_run=data.dry_run,
+            chunk_size=settings.PRODUCT_IMPORT_CHUNK_SIZE,
+            report_limit=settings.PRODUCT_IMPORT_REPORT_LIMIT,
+        )
+    except ProductImportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if report["error"]:
+        return JSONResponse(status_code=500, content={"detail": report["error"], "report": report})
+    return report
+
+
 @router.delete("/{product_id}")
 def delete_product(product_id: int, db: Session = Depends(get_db), admin: User = Depends(admin_required)):
     db_product = db.query(Product).filter(Product.id == product_id, Product.is_deleted == False).first()
@@ -38,6 +122,7 @@ def delete_product(product_id: int, db: Session = Depends(get_db), admin: User =
     # Мягкое удаление
     db_product.is_deleted = True
     db.commit()
+    catalog_service.invalidate(f"product {product_id} deleted")
     return {"detail": "Product deleted"}
 
 
@@ -61,6 +146,7 @@ def create_product(product: ProductCreate, db: Session = Depends(get_db), admin:
     db.add(new_product)
     db.commit()
     db.refresh(new_product)
+    catalog_service.invalidate(f"product {new_product.id} created")
     return new_product
 
 
@@ -77,6 +163,7 @@ def update_product(product_id: int, product: ProductUpdate, db: Session = Depend
 
     db.commit()
     db.refresh(db_product)
+    catalog_service.invalidate(f"product {product_id} updated")
     return db_product
 
 
@@ -98,4 +185,5 @@ def delete_product(product_id: int, db: Session = Depends(get_db), admin: User =
 
     db.delete(db_product)
     db.commit()
+    catalog_service.invalidate(f"product {product_id} deleted")
     return {"detail": "Product deleted"}
\ No newline at end of file
@@ -6,6 +6,7 @@ from app.models.game_subcategory import GameSubcategory
 from app.models.game import Game
 from app.schemas.game_subcategory import GameSubcategoryCreate, GameSubcategoryUpdate, GameSubcategoryRead
 from app.services.auth import admin_required
+from app.services.catalog import catalog_service
 from app.models.user import User
 from typing import List
 from loguru import logger
@@ -67,6 +68,7 @@ def create_subcategory(
     db.add(new_subcategory)
     db.commit()
     db.refresh(new_subcategory)
+    catalog_service.invalidate(f"subcategory {new_subcategory.id} created")
 
     logger.info(f"🏷️ Подкатегория создана с ID: {new_subcategory.id}")
     return new_subcategory
@@ -106,6 +108,7 @@ def update_subcategory(
 
     db.commit()
     db.refresh(subcategory)
+    catalog_service.invalidate(f"subcategory {subcategory_id} updated")
 
     logger.info(f"🏷️ Подкатегория {subcategory_id} обновлена")
     return subcategory
@@ -136,6 +139,7 @@ def delete_subcategory(
 
     db.delete(subcategory)
     db.commit()
+    catalog_service.invalidate(f"subcategory {subcategory_id} deleted")
 
     logger.info(f"🏷️ Подкатегория {subcategory_id} удалена")
     return {"detail": "Subcategory deleted successfully"}
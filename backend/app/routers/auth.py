@@ -10,7 +10,7 @@ from app.core.database import get_db
 from app.core.config import settings
 from app.models.user import User
 from app.models.auth_token import AuthToken
-from app.services.mailer import send_email, render_template
+from app.services.mailer import queue_email, render_template
 from app.services.referral import ReferralService
 from app.services.auth import get_current_user
 
@@ -72,9 +72,9 @@ def request_login_link(data: EmailRequest, db: Session = Depends(get_db)):
     # Ссылка для входа
     link = f"{settings.FRONTEND_URL}/auth/verify?token={token}"
 
-    # Рендер письма и отправка
+    # Рендер письма и отправка в фоне (ответ не ждет SMTP)
     html = render_template("login_link.html", {"link": link})
-    send_email(
+    queue_email(
         to=user.email,
         subject="🔐 Ваш вход в Donate Raid",
         body=html
@@ -1,17 +1,22 @@
 # backend/app/routers/blog/article.py - ОБНОВЛЕННЫЙ API С МНОЖЕСТВЕННЫМИ КАТЕГОРИЯМИ И ТЕГАМИ
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import or_, and_
+from pydantic import TypeAdapter
 from typing import List, Optional
 from app.core.database import get_db
+from app.core.http_cache import cached_not_modified, content_versions, versioned_json
 from app.models.blog.article import Article, ArticleTag
 from app.schemas.blog.article import ArticleRead
 
 router = APIRouter()
 
+ARTICLE_LIST = TypeAdapter(List[ArticleRead])
+
 
 @router.get("", response_model=List[ArticleRead])
 def get_articles(
+        request: Request,
         db: Session = Depends(get_db),
         q: str = Query("", alias="q"),
         category: Optional[str] = None,
@@ -31,6 +36,12 @@ def get_articles(
     - tags: несколько тегов через запятую (например: "CS2,Dota2")
     - game_id: ID игры
     """
+    # ETag по содержимому, запомненный для версии статей и параметров фильтрации: 304 без запроса в БД
+    cached = cached_not_modified(request, "articles", request.url.query)
+    if cached is not None:
+        return cached
+    stamp = content_versions.stamp("articles")
+
     # Используем joinedload для загрузки тегов
     query = db.query(Article).options(joinedload(Article.tags)).filter(Article.published == True)
 
@@ -104,7 +115,7 @@ def get_articles(
     print(f"Поиск: q='{q}', category='{category}', categories='{categories}', tag='{tag}', tags='{tags}'")
     print(f"Найдено {len(articles)} статей")
 
-    return articles
+    return versioned_json(request, "articles", request.url.query, stamp, ARTICLE_LIST.dump_json(ARTICLE_LIST.validate_python(articles, from_attributes=True)))
 
 
 @router.get("/categories", response_model=List[dict])
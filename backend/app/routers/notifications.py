@@ -1,14 +1,18 @@
 # backend/app/routers/notifications.py - ИСПРАВЛЕННАЯ ВЕРСИЯ
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, desc
 from app.core.database import get_db
-from app.models.support import SupportMessage, SupportStatus
-from app.models.order import Order, OrderStatus
 from app.services.auth import get_current_user_optional  # ✅ Теперь эта функция существует
+from app.services.notifications import (
+    count_unread,
+    list_notifications,
+    mark_read,
+    notification_owner_key,
+    owner_channels,
+)
 from app.models.user import User
 from typing import Optional, List
-from datetime import datetime, timedelta
+from datetime import datetime, timezone
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -23,6 +27,12 @@ class NotificationResponse(BaseModel):
     data: Optional[dict] = None
 
 
+class NotificationReadRequest(BaseModel):
+    guest_id: Optional[str] = None
+    channels: Optional[List[str]] = None  # None - все каналы владельца
+    until: Optional[datetime] = None  # по умолчанию - текущий момент
+
+
 @router.get("", response_model=List[NotificationResponse])
 def get_notifications(
         guest_id: Optional[str] = Query(None),
@@ -30,92 +40,13 @@ def get_notifications(
         db: Session = Depends(get_db),
         current_user: Optional[User] = Depends(get_current_user_optional)
 ):
-    """Получить уведомления для пользователя или гостя"""
-
-    notifications = []
-
-    # Для авторизованных пользователей
-    if current_user:
-        # Проверяем новые ответы от поддержки
-        support_replies = (
-            db.query(SupportMessage)
-            .filter(
-                and_(
-                    SupportMessage.user_id == current_user.id,
-                    SupportMessage.is_from_user == False,
-                    SupportMessage.created_at >= datetime.utcnow() - timedelta(hours=24)
-                )
-            )
-            .order_by(desc(SupportMessage.created_at))
-            .limit(limit)
-            .all()
-        )
-
-        for reply in support_replies:
-            notifications.append(NotificationResponse(
-                type="support_reply",
-                title="Ответ от поддержки",
-                message=reply.message[:100] + "..." if len(reply.message) > 100 else reply.message,
-                created_at=reply.created_at.isoformat(),
-                data={"message_id": reply.id}
-            ))
-
-        # Проверяем обновления заказов - ИСПРАВЛЕНО: используем created_at если updated_at is None
-        order_updates = (
-            db.query(Order)
-            .filter(
-                and_(
-                    Order.user_id == current_user.id,
-                    Order.status.in_([OrderStatus.done, OrderStatus.canceled])
-                )
-            )
-            .order_by(desc(Order.updated_at))
-            .limit(limit)
-            .all()
-        )
-
-        for order in order_updates:
-            # Проверяем, что заказ был обновлен недавно
-            check_time = order.updated_at if order.updated_at else order.created_at
-            if check_time >= datetime.utcnow() - timedelta(hours=24):
-                status_text = "выполнен" if order.status == OrderStatus.done else "отменен"
-                notifications.append(NotificationResponse(
-                    type="order_update",
-                    title=f"Заказ #{order.id} {status_text}",
-                    message=f"Ваш заказ на сумму {order.amount} {order.currency} {status_text}",
-                    created_at=check_time.isoformat(),
-                    data={"order_id": order.id, "status": order.status.value}
-                ))
-
-    # Для гостей - только ответы поддержки
-    elif guest_id:
-        support_replies = (
-            db.query(SupportMessage)
-            .filter(
-                and_(
-                    SupportMessage.guest_id == guest_id,
-                    SupportMessage.is_from_user == False,
-                    SupportMessage.created_at >= datetime.utcnow() - timedelta(hours=24)
-                )
-            )
-            .order_by(desc(SupportMessage.created_at))
-            .limit(limit)
-            .all()
-        )
-
-        for reply in support_replies:
-            notifications.append(NotificationResponse(
-                type="support_reply",
-                title="Ответ от поддержки",
-                message=reply.message[:100] + "..." if len(reply.message) > 100 else reply.message,
-                created_at=reply.created_at.isoformat(),
-                data={"message_id": reply.id}
-            ))
-
-    # Сортируем по времени создания
-    notifications.sort(key=lambda x: x.created_at, reverse=True)
-
-    return notifications[:limit]
+    """Получить уведомления для пользователя или гостя (гостям - только ответы поддержки)"""
+    return list_notifications(
+        db,
+        user_id=current_user.id if current_user else None,
+        guest_id=guest_id if not current_user else None,
+        limit=limit,
+    )
 
 
 @router.get("/count")
@@ -124,61 +55,37 @@ def get_notification_count(
         db: Session = Depends(get_db),
         current_user: Optional[User] = Depends(get_current_user_optional)
 ):
-    """Получить количество непрочитанных уведомлений"""
-
-    count = 0
-
-    # Для авторизованных пользователей
-    if current_user:
-        # Непрочитанные ответы поддержки
-        support_count = (
-            db.query(SupportMessage)
-            .filter(
-                and_(
-                    SupportMessage.user_id == current_user.id,
-                    SupportMessage.is_from_user == False,
-                    SupportMessage.status == SupportStatus.in_progress,
-                    SupportMessage.created_at >= datetime.utcnow() - timedelta(hours=24)
-                )
-            )
-            .count()
-        )
-
-        # Обновления заказов (за последние 24 часа)
-        order_count = 0
-        recent_orders = (
-            db.query(Order)
-            .filter(
-                and_(
-                    Order.user_id == current_user.id,
-                    Order.status.in_([OrderStatus.done, OrderStatus.canceled])
-                )
-            )
-            .all()
-        )
-
-        for order in recent_orders:
-            check_time = order.updated_at if order.updated_at else order.created_at
-            if check_time >= datetime.utcnow() - timedelta(hours=24):
-                order_count += 1
-
-        count = support_count + order_count
-
-    # Для гостей
-    elif guest_id:
-        support_count = (
-            db.query(SupportMessage)
-            .filter(
-                and_(
-                    SupportMessage.guest_id == guest_id,
-                    SupportMessage.is_from_user == False,
-                    SupportMessage.status == SupportStatus.in_progress,
-                    SupportMessage.created_at >= datetime.utcnow() - timedelta(hours=24)
-                )
-            )
-            .count()
-        )
-
-        count = support_count
-
-    return {"count": count}
\ No newline at end of file
+    """Получить количество непрочитанных уведомлений (один запрос к БД)"""
+    count = count_unread(
+        db,
+        user_id=current_user.id if current_user else None,
+        guest_id=guest_id if not current_user else None,
+    )
+    return {"count": count}
+
+
+@router.post("/read")
+def mark_notifications_read(
+        data: NotificationReadRequest,
+        db: Session = Depends(get_db),
+        current_user: Optional[User] = Depends(get_current_user_optional)
+):
+    """Отметить уведомления прочитанными до момента until"""
+    user_id = current_user.id if current_user else None
+    owner_key = notification_owner_key(user_id, data.guest_id if not current_user else None)
+    if owner_key is None:
+        raise HTTPException(status_code=400, detail="guest_id is required for unauthenticated users")
+
+    allowed = owner_channels(user_id)
+    channels = data.channels or list(allowed)
+    unknown = [channel for channel in channels if channel not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown notification channels: {', '.join(unknown)}")
+
+    until = None
+    if data.until:
+        until = data.until.astimezone(timezone.utc).replace(tzinfo=None) if data.until.tzinfo else data.until
+        # Будущие события заранее не "прочитываются"
+        until = min(until, datetime.utcnow())
+    read_at = mark_read(db, owner_key, channels, until)
+    return {"channels": channels, "read_at": read_at.isoformat()}
@@ -1,11 +1,14 @@
 # backend/app/routers/payment_terms.py - НОВЫЙ ФАЙЛ
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 from app.core.database import get_db
+from app.core.http_cache import cached_not_modified, content_versions, versioned_json
 from app.services.auth import admin_required
+from app.services.cache_sync import invalidate_content
 from app.models.payment_terms import PaymentTerm
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 from typing import List, Optional
+from datetime import datetime
 
 router = APIRouter()
 
@@ -28,18 +31,26 @@ class PaymentTermUpdate(PaymentTermBase):
 
 class PaymentTermRead(PaymentTermBase):
     id: int
-    created_at: str
-    updated_at: str
+    created_at: datetime
+    updated_at: datetime
 
     class Config:
         from_attributes = True
 
 
+PAYMENT_TERM_LIST = TypeAdapter(List[PaymentTermRead])
+
+
 @router.get("", response_model=List[PaymentTermRead])
-def get_payment_terms(db: Session = Depends(get_db)):
+def get_payment_terms(request: Request, db: Session = Depends(get_db)):
     """Получить активные пользовательские соглашения для отображения при оплате"""
+    cached = cached_not_modified(request, "payment_terms")
+    if cached is not None:
+        return cached
+    stamp = content_versions.stamp("payment_terms")
+
     terms = db.query(PaymentTerm).filter_by(is_active=True).order_by(PaymentTerm.sort_order.asc()).all()
-    return terms
+    return versioned_json(request, "payment_terms", "", stamp, PAYMENT_TERM_LIST.dump_json(PAYMENT_TERM_LIST.validate_python(terms, from_attributes=True)))
 
 
 @router.get("/admin/all", response_model=List[PaymentTermRead])
@@ -60,6 +71,7 @@ def create_payment_term(
     db.add(new_term)
     db.commit()
     db.refresh(new_term)
+    invalidate_content("payment_terms")
     return new_term
 
 
@@ -80,6 +92,7 @@ def update_payment_term(
 
     db.commit()
     db.refresh(term)
+    invalidate_content("payment_terms")
     return term
 
 
@@ -96,6 +109,7 @@ def delete_payment_term(
 
     db.delete(term)
     db.commit()
+    invalidate_content("payment_terms")
     return {"detail": "Payment term deleted"}
 
 
@@ -140,6 +154,7 @@ def create_default_payment_terms(db: Session = Depends(get_db), admin=Depends(ad
             created_count += 1
 
     db.commit()
+    invalidate_content("payment_terms")
 
     return {
         "message": f"Создано {created_count} стандартных соглашений",
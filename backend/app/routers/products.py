@@ -1,13 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 from app.core.database import get_db
+from app.core.http_cache import cached_not_modified, content_versions, versioned_json
 from app.models.product import Product
 from app.models.game import Game
 from app.schemas.product import ProductCreate, ProductRead
+from app.services.catalog import catalog_service
+from pydantic import TypeAdapter
 from typing import List
 
 router = APIRouter()
 
+PRODUCT_LIST = TypeAdapter(List[ProductRead])
+
 
 @router.get("", response_model=List[ProductRead])
 def list_products(db: Session = Depends(get_db)):
@@ -24,6 +29,7 @@ def create_product(product_data: ProductCreate, db: Session = Depends(get_db)):
     db.add(new_product)
     db.commit()
     db.refresh(new_product)
+    catalog_service.invalidate(f"product {new_product.id} created")
     return new_product
 
 @router.get("/{product_id}", response_model=ProductRead)
@@ -38,10 +44,16 @@ def get_product(product_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/game/{game_id}", response_model=List[ProductRead])
-def get_products_for_game(game_id: int, db: Session = Depends(get_db)):
+def get_products_for_game(game_id: int, request: Request, db: Session = Depends(get_db)):
+    key = f"products:{game_id}"
+    cached = cached_not_modified(request, "catalog", key)
+    if cached is not None:
+        return cached
+    stamp = content_versions.stamp("catalog")
+
     products = db.query(Product).filter(
         Product.game_id == game_id,
         Product.enabled == True,
         Product.is_deleted == False
     ).all()
-    return products
\ No newline at end of file
+    return versioned_json(request, "catalog", key, stamp, PRODUCT_LIST.dump_json(PRODUCT_LIST.validate_python(products, from_attributes=True)))
\ No newline at end of file
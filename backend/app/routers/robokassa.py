@@ -1,95 +1,32 @@
 # backend/app/routers/robokassa.py
-from fastapi import APIRouter, Request, HTTPException, Depends
-from fastapi.responses import RedirectResponse
-from sqlalchemy.orm import Session
-from app.core.database import get_db
+from fastapi import APIRouter, BackgroundTasks, Request, HTTPException, Depends, Response
+from fastapi.responses import PlainTextResponse, RedirectResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_async_db
+from app.core.http_cache import etag_for_bytes, etag_matches, not_modified, set_cache_headers
 from app.models.order import Order, OrderStatus
 from app.services.robokassa import robokassa_service
-from app.services.telegram import notify_payment_sync
-from app.services.mailer import send_email, render_template
+from app.services.order_events import publish_order_status_by_id
+from app.services.payments import (
+    PAYMENT_DUPLICATE,
+    PAYMENT_IGNORED,
+    PAYMENT_ORDER_MISSING,
+    apply_payment_notification,
+)
 from loguru import logger
 from fastapi.responses import RedirectResponse
 from typing import Dict
-from sqlalchemy.orm import joinedload
+import json
 
 router = APIRouter()
 
 
-def extract_user_data_from_comment(comment: str) -> str:
-    """Извлекает и форматирует пользовательские данные из комментария заказа"""
-    if not comment:
-        return ""
-
-    user_data_text = ""
-
-    try:
-        import json
-        import re
-
-        # Проверяем, есть ли секция "Данные форм" (для гостевых заказов)
-        if "Данные форм:" in comment:
-            # Извлекаем данные форм
-            forms_section = comment.split("Данные форм:\n")[1] if "Данные форм:\n" in comment else ""
-            if forms_section:
-                # Парсим каждую строку с данными
-                form_lines = forms_section.strip().split('\n')
-                user_fields = []
-
-                for line in form_lines:
-                    if '[Товар #' in line and ']' in line:
-                        # Извлекаем JSON данные после ]
-                        json_part = line.split('] ', 1)[1] if '] ' in line else line
-                        try:
-                            form_data = json.loads(json_part)
-                            for key, value in form_data.items():
-                                if value:  # Показываем только заполненные поля
-                                    user_fields.append(f"• {key}: <code>{value}</code>")
-                        except:
-                            # Если не JSON, показываем как есть
-                            clean_line = line.replace('[Товар #', '').split('] ', 1)
-                            if len(clean_line) > 1:
-                                user_fields.append(f"• {clean_line[1]}")
-
-                if user_fields:
-                    user_data_text = "\n\n🔧 <b>Данные пользователя:</b>\n" + "\n".join(user_fields[:8])
-
-        else:
-            # Пытаемся парсить весь комментарий как JSON (для ручных заказов)
-            try:
-                comment_data = json.loads(comment)
-                if isinstance(comment_data, dict):
-                    user_fields = []
-                    for key, value in comment_data.items():
-                        if key not in ['guest_email', 'guest_name', 'items'] and value:
-                            user_fields.append(f"• {key}: <code>{value}</code>")
-
-                    if user_fields:
-                        user_data_text = "\n\n🔧 <b>Данные пользователя:</b>\n" + "\n".join(user_fields[:8])
-            except:
-                # Если комментарий не JSON, проверяем наличие структурированных данных
-                if '=' in comment or ':' in comment:
-                    # Простой парсинг key=value или key: value
-                    lines = comment.replace('\r\n', '\n').split('\n')
-                    user_fields = []
-
-                    for line in lines:
-                        if '=' in line:
-                            key, value = line.split('=', 1)
-                            user_fields.append(f"• {key.strip()}: <code>{value.strip()}</code>")
-                        elif ':' in line and not line.startswith('http'):
-                            key, value = line.split(':', 1)
-                            user_fields.append(f"• {key.strip()}: <code>{value.strip()}</code>")
-
-                    if user_fields:
-                        user_data_text = "\n\n🔧 <b>Данные пользователя:</b>\n" + "\n".join(user_fields[:8])
-
-    except Exception as e:
-        logger.warning(f"Ошибка извлечения данных пользователя: {e}")
-
-    return user_data_text
-
 @router.post("/result")
-async def robokassa_result(request: Request, db: Session = Depends(get_db)):
+async def robokassa_result(
+        request: Request,
+        background_tasks: BackgroundTasks,
+        db: AsyncSession = Depends(get_async_db),
+):
     """
     Webhook для уведомлений от RoboKassa о статусе платежа (Result URL)
     Этот endpoint вызывается RoboKassa для уведомления о результате оплаты
@@ -171,83 +108,41 @@ async def robokassa_result(request: Request, db: Session = Depends(get_db)):
         logger.error("❌ Неверная подпись от RoboKassa")
         raise HTTPException(status_code=403, detail="Invalid signature")
 
-    # Находим заказ С ПОЛЬЗОВАТЕЛЕМ
-    order = db.query(Order).options(
-        joinedload(Order.user),
-        joinedload(Order.game),
-        joinedload(Order.product)
-    ).filter(Order.id == int(inv_id)).first()
-
-    if not order:
-        logger.error(f"❌ Заказ #{inv_id} не найден")
-        raise HTTPException(status_code=404, detail="Order not found")
-
-    logger.info(f"📋 Найден заказ #{order.id}, текущий статус: {order.status}")
+    try:
+        order_id = int(inv_id)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid InvId")
 
-    # Проверяем, что заказ еще не оплачен
-    if order.status != OrderStatus.pending:
-        logger.warning(f"⚠️ Заказ #{order.id} уже имеет статус {order.status}")
-        return {"status": "OK"}
+    # RoboKassa ждет ответ "OK<InvId>", иначе повторяет уведомление
+    ok_response = PlainTextResponse(f"OK{inv_id}", status_code=200)
 
-    # Обновляем заказ
     try:
-        order.status = OrderStatus.processing
-        order.transaction_id = f"robokassa_{inv_id}_{out_sum}"
-
-        db.commit()
-        db.refresh(order)
-
-        logger.info(f"✅ Заказ #{order.id} помечен как оплаченный и отправлен в обработку")
-
-        # ИСПРАВЛЕНО: Улучшенное уведомление админам в Telegram
-        user_info = "👤 Гость"
-        if order.user:
-            user_info = f"👤 {order.user.username or 'Без имени'}"
-            if order.user.email:
-                user_info += f" ({order.user.email})"
-            user_info += f" [ID: {order.user.id}]"
-
-        game_info = f"🎮 {order.game.name}" if order.game else "🎮 Неизвестная игра"
-        product_info = f"📦 {order.product.name}" if order.product else "📦 Неизвестный товар"
-
-        # Парсим пользовательские данные из comment
-        user_data_info = extract_user_data_from_comment(order.comment or "")
-
-        notify_payment_sync(
-            f"💰 <b>Успешная оплата через RoboKassa!</b>\n\n"
-            f"🔢 Заказ: <code>#{order.id}</code>\n"
-            f"{user_info}\n"
-            f"{game_info}\n"
-            f"{product_info}\n"
-            f"💵 Сумма: <b>{order.amount} {order.currency}</b>\n"
-            f"💳 Способ: RoboKassa\n"
-            f"🆔 Транзакция: <code>{order.transaction_id}</code>"
-            f"{user_data_info}",
-            order_id=order.id
-        )
-
-        # Отправляем email пользователю если есть
-        if order.user and order.user.email:
-            html = render_template("order_paid.html", {
-                "order_id": order.id,
-                "amount": order.amount,
-                "currency": order.currency,
-                "username": order.user.username,
-                "transaction_id": order.transaction_id
-            })
-            send_email(
-                to=order.user.email,
-                subject="💳 Заказ оплачен | Donate Raid",
-                body=html
-            )
-            logger.info(f"📧 Отправлено уведомление на {order.user.email}")
-
-        from fastapi.responses import PlainTextResponse
-        return PlainTextResponse("OK", status_code=200)
+        # Уведомления и письма разворачивает воркер из одного события outbox,
+        # поэтому ответ RoboKassa не зависит от Telegram и SMTP
+        result = await apply_payment_notification(db, "robokassa", order_id, out_sum, signature_value, data)
+        if result == PAYMENT_DUPLICATE:
+            return ok_response
+        if result == PAYMENT_ORDER_MISSING:
+            await db.rollback()
+            logger.error(f"❌ Заказ #{inv_id} не найден")
+            raise HTTPException(status_code=404, detail="Order not found")
+
+        await db.commit()
+        if result == PAYMENT_IGNORED:
+            logger.warning(f"⚠️ Заказ #{inv_id} уже не в статусе pending - уведомление записано без обработки")
+            return ok_response
+
+        # Статус для SSE публикуется уже после ответа
+        background_tasks.add_task(publish_order_status_by_id, order_id)
+
+        logger.info(f"✅ Заказ #{order_id} помечен как оплаченный и отправлен в обработку")
+        return ok_response
 
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"❌ Ошибка обновления заказа #{order.id}: {e}")
-        db.rollback()
+        logger.error(f"❌ Ошибка обновления заказа #{inv_id}: {e}")
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Database error")
 
 
@@ -260,7 +155,7 @@ async def robokassa_success(
         OutSum: str = None,
         InvId: str = None,
         SignatureValue: str = None,
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
     """
     Success URL - пользователь попадает сюда после успешной оплаты
@@ -285,7 +180,7 @@ async def robokassa_success(
     if InvId:
         try:
             order_id = int(InvId)
-            order = db.query(Order).filter(Order.id == order_id).first()
+            order = await db.get(Order, order_id)
             if order:
                 logger.info(f"📋 Заказ #{order_id} найден, статус: {order.status}")
 
@@ -310,7 +205,7 @@ async def robokassa_fail(
         OutSum: str = None,
         InvId: str = None,
         SignatureValue: str = None,
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
     """
     Fail URL - пользователь попадает сюда при неудачной оплате
@@ -335,7 +230,7 @@ async def robokassa_fail(
     if InvId:
         try:
             order_id = int(InvId)
-            order = db.query(Order).filter(Order.id == order_id).first()
+            order = await db.get(Order, order_id)
             if order:
                 logger.info(f"📋 Заказ #{order_id} найден, статус: {order.status}")
 
@@ -353,7 +248,16 @@ async def robokassa_fail(
     return RedirectResponse(url="https://donateraid.ru/", status_code=302)
 
 
+# Способы оплаты статичны - ETag считаем один раз при импорте
+PAYMENT_METHODS_ETAG = etag_for_bytes(
+    json.dumps(robokassa_service.get_payment_methods(), ensure_ascii=False, sort_keys=True).encode("utf-8")
+)
+
+
 @router.get("/payment-methods")
-async def get_payment_methods():
+async def get_payment_methods(request: Request, response: Response):
     """Получить информацию о способах оплаты через RoboKassa"""
+    if etag_matches(request, PAYMENT_METHODS_ETAG):
+        return not_modified(PAYMENT_METHODS_ETAG)
+    set_cache_headers(response, PAYMENT_METHODS_ETAG)
     return robokassa_service.get_payment_methods()
\ No newline at end of file
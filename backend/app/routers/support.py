@@ -1,9 +1,12 @@
 # backend/app/routers/support.py - ПОЛНОСТЬЮ ИСПРАВЛЕННАЯ ВЕРСИЯ
-from fastapi import APIRouter, Depends, Request, Query, BackgroundTasks
-from sqlalchemy.orm import Session
-from app.core.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Request, Query, BackgroundTasks
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.database import get_async_db
 from app.models.support import SupportMessage, SupportStatus
-from app.services.auth import get_current_user_from_request_sync
+from app.services.auth import get_current_user_from_request_async
+from app.services.support_history import InvalidCursor, load_support_page
+from app.services.support_realtime import publish_support_message, serialize_support_message
 from app.models.user import User
 from datetime import datetime
 from typing import Optional
@@ -37,11 +40,14 @@ async def send_telegram_notification(user_id: int = None, text: str = None, gues
     """Фоновая задача для отправки уведомления в Telegram"""
     try:
         from bot.handlers.support import notify_new_support_message
-        await notify_new_support_message(
+        from bot.notify import notification_dispatcher
+
+        # Сессия aiogram bot живет в loop диспетчера уведомлений
+        await notification_dispatcher.run_async(notify_new_support_message(
             user_id=user_id,
             text=text,
             guest_id=guest_id
-        )
+        ))
         logger.info("✅ Telegram уведомление отправлено")
     except Exception as e:
         logger.warning(f"⚠️ Ошибка уведомления в Telegram: {e}")
@@ -52,7 +58,7 @@ async def create_support_message(
         data: SupportMessageCreate,
         background_tasks: BackgroundTasks,
         request: Request,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_async_db),
 ):
     """Создать сообщение в поддержку"""
     user = None
@@ -61,7 +67,7 @@ async def create_support_message(
     try:
         auth_header = request.headers.get("Authorization")
         if auth_header and auth_header.startswith("Bearer "):
-            user = get_current_user_from_request_sync(request, db)
+            user = await get_current_user_from_request_async(request, db)
             logger.info(f"✅ Авторизованный пользователь найден: ID={user.id}, email={user.email}")
         else:
             logger.info("ℹ️ Токен авторизации не найден, работаем как гость")
@@ -74,7 +80,6 @@ async def create_support_message(
     if not user:
         if not data.guest_id:
             logger.error("❌ Для неавторизованного пользователя требуется guest_id")
-            from fastapi import HTTPException
             raise HTTPException(status_code=400, detail="guest_id is required for unauthenticated users")
         guest_id = data.guest_id
         logger.info(f"🆔 Используем guest_id: {guest_id}")
@@ -90,12 +95,20 @@ async def create_support_message(
     )
 
     db.add(message)
-    db.commit()
-    db.refresh(message)
+    await db.commit()
+    await db.refresh(message)
 
     logger.info(
         f"📝 Создано сообщение: ID={message.id}, user_id={message.user_id}, guest_id={message.guest_id}, message='{message.message}'")
 
+    # Пушим сообщение в другие открытые вкладки этого чата
+    background_tasks.add_task(
+        publish_support_message,
+        user_id=message.user_id,
+        guest_id=message.guest_id,
+        message_data=serialize_support_message(message)
+    )
+
     # Запускаем уведомление в фоне
     background_tasks.add_task(
         send_telegram_notification,
@@ -107,54 +120,79 @@ async def create_support_message(
     return message
 
 
-@router.get("/my")
-async def get_my_support_messages(
-        request: Request,
-        guest_id: Optional[str] = Query(None),
-        db: Session = Depends(get_db),
-):
-    """Получить сообщения поддержки текущего пользователя"""
-    user = None
-
-    # Пытаемся получить авторизованного пользователя
+async def _resolve_support_owner(request: Request, db: AsyncSession):
+    """Авторизованный пользователь по Bearer токену или None (тогда работаем по guest_id)"""
     try:
         auth_header = request.headers.get("Authorization")
         if auth_header and auth_header.startswith("Bearer "):
-            user = get_current_user_from_request_sync(request, db)
-            logger.info(f"📨 Загружаем сообщения для авторизованного пользователя ID={user.id}")
+            return await get_current_user_from_request_async(request, db)
     except Exception as e:
         logger.info(f"ℹ️ Не удалось получить пользователя: {e}")
-        pass
-
-    messages = []
-
-    if user:
-        # Для авторизованного пользователя
-        messages = db.query(SupportMessage).filter_by(user_id=user.id).order_by(SupportMessage.created_at).all()
-        logger.info(f"📨 Найдено {len(messages)} сообщений для пользователя ID={user.id}")
-    elif guest_id:
-        # Для гостя
-        messages = db.query(SupportMessage).filter_by(guest_id=guest_id).order_by(SupportMessage.created_at).all()
-        logger.info(f"📨 Найдено {len(messages)} сообщений для гостя {guest_id}")
-    else:
+    return None
+
+
+@router.get("/my")
+async def get_my_support_messages(
+        request: Request,
+        guest_id: Optional[str] = Query(None),
+        db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Получить сообщения поддержки текущего пользователя.
+    Отдает последние SUPPORT_MY_LIMIT сообщений; более старые - через /history?before_id=
+    """
+    user = await _resolve_support_owner(request, db)
+    if not user and not guest_id:
         logger.warning("⚠️ Не удалось определить пользователя или guest_id")
         return []
 
-    # Преобразуем в список словарей для лучшей совместимости
-    result = []
-    for msg in messages:
-        result.append({
-            "id": msg.id,
-            "user_id": msg.user_id,
-            "guest_id": msg.guest_id,
-            "message": msg.message,
-            "is_from_user": msg.is_from_user,
-            "created_at": msg.created_at.isoformat(),
-            "status": msg.status.value if hasattr(msg.status, 'value') else str(msg.status)
-        })
+    page = await load_support_page(
+        db,
+        user_id=user.id if user else None,
+        guest_id=guest_id if not user else None,
+        limit=settings.SUPPORT_MY_LIMIT,
+    )
+    owner_label = f"пользователя ID={user.id}" if user else f"гостя {guest_id}"
+    logger.info(f"📨 Найдено {len(page.messages)} сообщений для {owner_label}")
+
+    return [serialize_support_message(msg) for msg in page.messages]
+
+
+@router.get("/history")
+async def get_support_history(
+        request: Request,
+        guest_id: Optional[str] = Query(None),
+        before_id: Optional[int] = Query(None, description="Сообщения старше этого id"),
+        after_id: Optional[int] = Query(None, description="Сообщения новее этого id"),
+        limit: int = Query(settings.SUPPORT_HISTORY_PAGE_SIZE, ge=1, le=settings.SUPPORT_HISTORY_MAX_PAGE),
+        db: AsyncSession = Depends(get_async_db),
+):
+    """История диалога страницами по курсору (без курсоров - последние сообщения)"""
+    if before_id is not None and after_id is not None:
+        raise HTTPException(status_code=400, detail="Use either before_id or after_id")
+
+    user = await _resolve_support_owner(request, db)
+    if not user and not guest_id:
+        raise HTTPException(status_code=400, detail="guest_id is required for unauthenticated users")
+
+    try:
+        page = await load_support_page(
+            db,
+            user_id=user.id if user else None,
+            guest_id=guest_id if not user else None,
+            before_id=before_id,
+            after_id=after_id,
+            limit=limit,
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    logger.info(f"📤 Возвращаем {len(result)} сообщений")
-    return result
+    return {
+        "messages": [serialize_support_message(msg) for msg in page.messages],
+        "has_more": page.has_more,
+        "first_id": page.first_id,
+        "last_id": page.last_id,
+    }
 
 
 # ДОБАВЛЕННЫЙ endpoint для совместимости (если используется где-то)
@@ -162,10 +200,10 @@ async def get_my_support_messages(
 async def get_support_messages_post(
         data: dict,
         request: Request,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_async_db),
 ):
     """Получить сообщения поддержки (POST версия для совместимости)"""
     guest_id = data.get('guest_id')
 
     # Переадресовываем на GET endpoint
-    return await get_my_support_messages(request, guest_id, db)
\ No newline at end of file
+    return await get_my_support_messages(request, guest_id, db)
@@ -1,9 +1,7 @@
 # backend/app/routers/upload.py - ПОЛНОСТЬЮ ИСПРАВЛЕННАЯ ВЕРСИЯ
 from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
 from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
-from app.core.database import get_db
-from app.services.auth import get_current_user, admin_required
+from app.services.auth import get_current_user_async, admin_required_async
 from app.models.user import User
 from app.services.file_upload import FileUploadService
 import os
@@ -15,7 +13,7 @@ router = APIRouter()
 async def upload_image(
         file: UploadFile = File(...),
         subfolder: str = "images",
-        current_user: User = Depends(get_current_user)
+        current_user: User = Depends(get_current_user_async)
 ):
     """Загрузка изображения (доступно авторизованным пользователям)"""
 
@@ -53,7 +51,7 @@ async def upload_image(
 async def admin_upload_image(
         file: UploadFile = File(...),
         subfolder: str = "admin",
-        admin: User = Depends(admin_required)
+        admin: User = Depends(admin_required_async)
 ):
     """Загрузка изображения для администраторов (расширенные права)"""
 
@@ -82,7 +80,7 @@ async def admin_upload_image(
 @router.delete("/file/{file_path:path}")
 async def delete_file(
         file_path: str,
-        admin: User = Depends(admin_required)
+        admin: User = Depends(admin_required_async)
 ):
     """Удаление файла (только для администраторов)"""
 
@@ -94,7 +92,7 @@ async def delete_file(
 
 
 @router.get("/test")
-async def test_upload_system(current_user: User = Depends(get_current_user)):
+async def test_upload_system(current_user: User = Depends(get_current_user_async)):
     """Тестирование системы загрузки файлов"""
 
     from app.services.file_upload import UPLOAD_DIR
@@ -1,108 +1,369 @@
 # backend/app/routers/websocket_support.py
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from typing import Dict, List
+import asyncio
+import hmac
 import json
+import time
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect
 from loguru import logger
 
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.user import UserRole
+from app.services.auth import get_user_from_token_async
+from app.services.pubsub import pubsub, support_room_channel
+from app.services.support_realtime import (
+    load_support_messages_after, parse_support_room_id, publish_support_message,
+)
+
 router = APIRouter()
 
+# Коды закрытия WebSocket по аналогии с HTTP 401/403
+WS_CLOSE_UNAUTHORIZED = 4401
+WS_CLOSE_FORBIDDEN = 4403
+
+
+class SupportConnection:
+    """Сокет клиента с собственной ограниченной очередью отправки и задачей-отправителем"""
+
+    def __init__(self, websocket: WebSocket, room_id: str, queue_size: int):
+        self.websocket = websocket
+        self.room_id = room_id
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue(maxsize=queue_size)
+        self.last_seen = time.monotonic()
+        self.sender: Optional[asyncio.Task] = None
+        self.closed = False
+        # Пока идет догрузка пропущенного, живые сообщения копятся здесь
+        self.pending: Optional[List[Tuple[Optional[int], str]]] = None
+        self.last_sent_id = 0
+
+    def offer(self, text: str) -> bool:
+        """Кладет готовый текст в очередь, False - клиент не успевает читать"""
+        try:
+            self.queue.put_nowait(text)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def offer_message(self, message_id: Optional[int], text: str) -> bool:
+        """Как offer, но пока идет догрузка - придерживает сообщение (дубли отсеет replay)"""
+        if self.pending is not None:
+            self.pending.append((message_id, text))
+            return True
+        if message_id is not None:
+            # Брокер доставляет каждое сообщение один раз, но не обязательно по порядку id
+            self.last_sent_id = max(self.last_sent_id, message_id)
+        return self.offer(text)
+
+    async def run_sender(self, manager: "SupportWebSocketManager"):
+        try:
+            while True:
+                text = await self.queue.get()
+                await self.websocket.send_text(text)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.debug(f"WebSocket send error в комнате {self.room_id}: {e}")
+            await manager.evict(self, reason="ошибка отправки")
+
 
 class SupportWebSocketManager:
-    def __init__(self):
-        self.active_connections: Dict[str, List[WebSocket]] = {}
+    """
+    Шлюз WebSocket чата поддержки в рамках одного процесса.
+
+    Каждый воркер uvicorn держит только свои сокеты, а сообщения приходят через
+    брокер (pub/sub) во все процессы - доставляет тот, у кого есть сокеты комнаты.
+    Сообщение сериализуется один раз на рассылку, каждому сокету кладется в его
+    ограниченную очередь; медленный или мертвый клиент отключается, не тормозя остальных.
+
+    Последние сообщения каждой комнаты хранятся в кольцевом буфере (брокер доставляет
+    их во все процессы, поэтому буфер есть у каждого воркера). Клиент передает
+    last_id при подключении и получает только новые сообщения - из буфера или из БД.
+    """
 
-    async def connect(self, websocket: WebSocket, room_id: str):
-        """Подключение к комнате чата"""
-        await websocket.accept()
+    def __init__(self, queue_size: int = 100, heartbeat_interval: int = 25, heartbeat_timeout: int = 60,
+                 replay_size: int = 50, replay_rooms: int = 1000, replay_limit: int = 200):
+        self.active_connections: Dict[str, Set[SupportConnection]] = {}
+        self.queue_size = queue_size
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.replay_size = replay_size
+        self.replay_rooms = replay_rooms
+        self.replay_limit = replay_limit
+        # room_id -> последние (id, JSON) сообщения; буфер полон начиная со своего первого id
+        self._history: "OrderedDict[str, Deque[Tuple[int, str]]]" = OrderedDict()
+        self._heartbeat: Optional[asyncio.Task] = None
 
-        if room_id not in self.active_connections:
-            self.active_connections[room_id] = []
+    async def connect(self, websocket: WebSocket, room_id: str, last_id: Optional[int] = None) -> SupportConnection:
+        """
+        Подключение уже принятого и авторизованного сокета к комнате.
+        С last_id живые сообщения придерживаются до replay()
+        """
+        connection = SupportConnection(websocket, room_id, self.queue_size)
+        if last_id is not None:
+            connection.pending = []
+            connection.last_sent_id = last_id
+        connection.sender = asyncio.create_task(connection.run_sender(self))
+        self.active_connections.setdefault(room_id, set()).add(connection)
+        self._ensure_heartbeat()
 
-        self.active_connections[room_id].append(websocket)
         logger.info(f"✅ WebSocket подключен к комнате {room_id}")
+        return connection
 
-    def disconnect(self, websocket: WebSocket, room_id: str):
+    def disconnect(self, connection: SupportConnection):
         """Отключение от комнаты"""
-        if room_id in self.active_connections:
-            if websocket in self.active_connections[room_id]:
-                self.active_connections[room_id].remove(websocket)
+        if connection.closed:
+            return
+        connection.closed = True
 
+        room = self.active_connections.get(connection.room_id)
+        if room is not None:
+            room.discard(connection)
             # Удаляем пустые комнаты
-            if not self.active_connections[room_id]:
-                del self.active_connections[room_id]
+            if not room:
+                del self.active_connections[connection.room_id]
 
-        logger.info(f"🔌 WebSocket отключен от комнаты {room_id}")
+        if connection.sender is not None and connection.sender is not asyncio.current_task():
+            connection.sender.cancel()
 
-    async def send_message_to_room(self, room_id: str, message: dict):
-        """Отправка сообщения всем в комнате"""
-        if room_id not in self.active_connections:
-            logger.warning(f"⚠️ Комната {room_id} не найдена")
+        logger.info(f"🔌 WebSocket отключен от комнаты {connection.room_id}")
+
+    async def evict(self, connection: SupportConnection, reason: str, code: int = 1011):
+        """Принудительно закрывает сокет (нет heartbeat, переполнен буфер, ошибка отправки)"""
+        if connection.closed:
             return
+        logger.warning(f"⚠️ WebSocket в комнате {connection.room_id} отключен: {reason}")
+        self.disconnect(connection)
+        try:
+            await connection.websocket.close(code=code)
+        except Exception:
+            pass
 
-        # Создаем копию списка соединений
-        connections = self.active_connections[room_id].copy()
-        sent_count = 0
+    @staticmethod
+    def _message_id(message: dict) -> Optional[int]:
+        data = message.get("data")
+        if message.get("type") == "new_message" and isinstance(data, dict) and isinstance(data.get("id"), int):
+            return data["id"]
+        return None
 
-        for connection in connections:
+    def remember(self, room_id: str, message_id: int, text: str):
+        """Кладет сообщение в кольцевой буфер комнаты"""
+        history = self._history.get(room_id)
+        if history is None:
+            history = self._history[room_id] = deque(maxlen=self.replay_size)
+            while len(self._history) > self.replay_rooms:
+                self._history.popitem(last=False)
+        else:
+            self._history.move_to_end(room_id)
+        if not history or message_id > history[-1][0]:
+            history.append((message_id, text))
+            return
+        # Бот и API коммитят параллельно - сообщения приходят не по порядку id.
+        # Более старое, чем начало буфера, не вставляем: такой last_id догружается из БД
+        if message_id < history[0][0]:
+            return
+        ids = [item[0] for item in history]
+        index = bisect_left(ids, message_id)
+        if ids[index] == message_id:
+            return
+        if len(history) == history.maxlen:
+            history.popleft()
+            index -= 1
+        history.insert(index, (message_id, text))
+
+    async def replay(self, connection: SupportConnection, last_id: int):
+        """Отправляет сообщения комнаты с id > last_id, затем придержанные живые"""
+        history = self._history.get(connection.room_id)
+        truncated = False
+        if history and last_id >= history[0][0]:
+            # Буфер покрывает все, что новее last_id
+            missed = [(message_id, text) for message_id, text in history if message_id > last_id]
+            source = "буфер"
+        else:
             try:
-                await connection.send_text(json.dumps(message))
-                sent_count += 1
-                logger.debug(f"📤 Сообщение отправлено в комнату {room_id}")
+                rows = await load_support_messages_after(connection.room_id, last_id, self.replay_limit + 1)
             except Exception as e:
-                logger.error(f"❌ Ошибка отправки WebSocket сообщения: {e}")
-                # Удаляем битое соединение
-                self.disconnect(connection, room_id)
+                logger.error(f"❌ Не удалось догрузить сообщения комнаты {connection.room_id}: {e}")
+                rows, truncated = [], True
+            truncated = truncated or len(rows) > self.replay_limit
+            missed = [
+                (row["id"], json.dumps({"type": "new_message", "data": row}, ensure_ascii=False, default=str))
+                for row in rows[:self.replay_limit]
+            ]
+            source = "БД"
+
+        pending, connection.pending = connection.pending or [], None
+        sent = set()
+        for message_id, text in missed + pending:
+            if message_id is not None:
+                # Придержанное живое сообщение могло уже попасть в догрузку
+                if message_id <= last_id or message_id in sent:
+                    continue
+                sent.add(message_id)
+            if not connection.offer_message(message_id, text):
+                await self.evict(connection, reason="переполнен буфер отправки", code=1013)
+                return
+
+        # Клиент узнает, докуда догружено; при обрезке - дочитать историю через API
+        connection.offer(json.dumps({
+            "type": "replay_done",
+            "last_id": connection.last_sent_id,
+            "truncated": truncated,
+        }))
+        logger.info(f"🔁 Догружено {len(missed)} сообщений в комнату {connection.room_id} ({source}, после #{last_id})")
+
+    async def send_message_to_room(self, room_id: str, message: dict):
+        """Отправка сообщения всем в комнате"""
+        text = json.dumps(message, ensure_ascii=False, default=str)
+        message_id = self._message_id(message)
+        if message_id is not None:
+            self.remember(room_id, message_id, text)
+
+        connections = self.active_connections.get(room_id)
+        if not connections:
+            logger.debug(f"Комната {room_id} не найдена в этом процессе")
+            return
+
+        queued = 0
+        for connection in list(connections):
+            if connection.offer_message(message_id, text):
+                queued += 1
+            else:
+                await self.evict(connection, reason="переполнен буфер отправки", code=1013)
 
-        logger.info(f"📨 Отправлено {sent_count} WebSocket уведомлений в комнату {room_id}")
+        logger.info(f"📨 Поставлено {queued} WebSocket уведомлений в комнату {room_id}")
+
+    def _ensure_heartbeat(self):
+        if self._heartbeat is None or self._heartbeat.done():
+            self._heartbeat = asyncio.create_task(self._run_heartbeat())
+
+    async def _run_heartbeat(self):
+        """Шлет ping и отключает сокеты, от которых давно ничего не было"""
+        ping = json.dumps({"type": "ping"})
+        while self.active_connections:
+            await asyncio.sleep(self.heartbeat_interval)
+            deadline = time.monotonic() - self.heartbeat_timeout
+            for room in list(self.active_connections.values()):
+                for connection in list(room):
+                    if connection.last_seen < deadline:
+                        await self.evict(connection, reason="нет ответа на heartbeat", code=1001)
+                    elif not connection.offer(ping):
+                        await self.evict(connection, reason="переполнен буфер отправки", code=1013)
+
+    def stats(self) -> dict:
+        return {
+            "rooms": len(self.active_connections),
+            "connections": sum(len(room) for room in self.active_connections.values()),
+        }
 
 
 # Глобальный менеджер
-ws_manager = SupportWebSocketManager()
+ws_manager = SupportWebSocketManager(
+    queue_size=settings.WS_SEND_QUEUE_SIZE,
+    heartbeat_interval=settings.WS_HEARTBEAT_INTERVAL,
+    heartbeat_timeout=settings.WS_HEARTBEAT_TIMEOUT,
+    replay_size=settings.WS_REPLAY_BUFFER_SIZE,
+    replay_rooms=settings.WS_REPLAY_MAX_ROOMS,
+    replay_limit=settings.WS_REPLAY_MAX_MESSAGES,
+)
+
+
+async def route_support_message(channel: str, message: dict):
+    """Сообщение из брокера -> буфер комнаты и сокеты комнаты в этом процессе"""
+    room_id = channel.split(":", 2)[2]
+    await ws_manager.send_message_to_room(room_id, message)
+
+
+pubsub.subscribe(support_room_channel("*"), route_support_message)
+
+
+async def read_socket_credentials(websocket: WebSocket, token: Optional[str], guest_id: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """Токен/guest_id из query, иначе из первого кадра {"type": "auth", "token": ..., "guest_id": ...}"""
+    if token or guest_id:
+        return token, guest_id
+    try:
+        data = json.loads(await asyncio.wait_for(websocket.receive_text(), timeout=settings.WS_AUTH_TIMEOUT))
+    except (asyncio.TimeoutError, ValueError):
+        return None, None
+    if not isinstance(data, dict) or data.get("type") != "auth":
+        return None, None
+    return data.get("token") or None, data.get("guest_id") or None
+
+
+async def authorize_support_room(room_id: str, token: Optional[str], guest_id: Optional[str]) -> Optional[int]:
+    """
+    Доступ к комнате: user_N - пользователь N или админ по JWT,
+    guest_X - владелец guest_id X (как у /api/support/my). None - доступ есть, иначе код закрытия.
+    """
+    room_user_id, room_guest_id = parse_support_room_id(room_id)
+
+    if token:
+        try:
+            async with AsyncSessionLocal() as db:
+                user = await get_user_from_token_async(db, token)
+        except HTTPException:
+            return WS_CLOSE_UNAUTHORIZED
+        if user.role == UserRole.admin:
+            return None
+        if room_user_id is not None:
+            return None if user.id == room_user_id else WS_CLOSE_FORBIDDEN
+
+    if room_guest_id is not None:
+        if not guest_id:
+            return WS_CLOSE_UNAUTHORIZED
+        return None if hmac.compare_digest(str(guest_id), room_guest_id) else WS_CLOSE_FORBIDDEN
+
+    return WS_CLOSE_FORBIDDEN if token else WS_CLOSE_UNAUTHORIZED
 
 
 @router.websocket("/ws/{room_id}")
-async def websocket_endpoint(websocket: WebSocket, room_id: str):
+async def websocket_endpoint(
+    websocket: WebSocket,
+    room_id: str,
+    last_id: Optional[int] = Query(None, ge=0, description="id последнего полученного сообщения"),
+    token: Optional[str] = Query(None, description="JWT пользователя (или кадр auth после подключения)"),
+    guest_id: Optional[str] = Query(None, description="guest_id гостя (или кадр auth после подключения)"),
+):
     """WebSocket endpoint для real-time чата"""
     logger.info(f"🔌 Попытка подключения WebSocket к комнате: {room_id}")
 
-    await ws_manager.connect(websocket, room_id)
+    # Принимаем до проверки: иначе клиент не получит код закрытия 4401/4403
+    await websocket.accept()
+    try:
+        token, guest_id = await read_socket_credentials(websocket, token, guest_id)
+        close_code = await authorize_support_room(room_id, token, guest_id)
+    except WebSocketDisconnect:
+        return
+    if close_code is not None:
+        logger.warning(f"🚫 WebSocket в комнату {room_id} отклонен ({close_code})")
+        await websocket.close(code=close_code)
+        return
+
+    connection = await ws_manager.connect(websocket, room_id, last_id)
 
     try:
+        if last_id is not None:
+            await ws_manager.replay(connection, last_id)
+
         while True:
-            # Ждем сообщения от клиента (для keep-alive или ping/pong)
-            try:
-                data = await websocket.receive_text()
-                # Можно добавить обработку входящих сообщений если нужно
+            # Любое сообщение клиента (ping/pong) подтверждает, что сокет жив
+            data = await websocket.receive_text()
+            connection.last_seen = time.monotonic()
+            if data == "ping" or data == '{"type":"ping"}':
+                connection.offer(json.dumps({"type": "pong"}))
+            else:
                 logger.debug(f"📥 Получено сообщение от клиента в комнате {room_id}: {data}")
-            except Exception as e:
-                logger.debug(f"WebSocket receive error: {e}")
-                break
 
     except WebSocketDisconnect:
         logger.info(f"🔌 WebSocket отключен от комнаты {room_id}")
-        ws_manager.disconnect(websocket, room_id)
     except Exception as e:
-        logger.error(f"❌ WebSocket error: {e}")
-        ws_manager.disconnect(websocket, room_id)
-
-
-# Функция для уведомления через WebSocket (используется в bot handlers)
-async def notify_support_websocket(user_id: int = None, guest_id: str = None, message_data: dict = None):
-    """Уведомление через WebSocket о новом сообщении"""
-
-    # Определяем room_id (комнату чата)
-    if user_id:
-        room_id = f"user_{user_id}"
-    elif guest_id:
-        room_id = f"guest_{guest_id}"
-    else:
-        logger.warning("⚠️ Не указан user_id или guest_id для WebSocket уведомления")
-        return
+        logger.debug(f"WebSocket receive error: {e}")
+    finally:
+        ws_manager.disconnect(connection)
 
-    # Отправляем уведомление в комнату
-    await ws_manager.send_message_to_room(room_id, {
-        "type": "new_message",
-        "data": message_data
-    })
 
-    logger.info(f"✅ WebSocket уведомление отправлено в комнату {room_id}")
\ No newline at end of file
+# Функция для уведомления через WebSocket (используется в bot handlers и API)
+notify_support_websocket = publish_support_message
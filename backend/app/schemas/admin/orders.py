@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from enum import Enum
 
@@ -36,3 +36,9 @@ class OrderRead(OrderBase):
 class OrderUpdate(BaseModel):
     status: Optional[OrderStatus] = None
     amount: Optional[float] = None
+
+
+class PaymentLinksReissue(BaseModel):
+    order_ids: Optional[List[int]] = None  # None - все ожидающие оплаты заказы RoboKassa
+    older_than_minutes: Optional[int] = None  # только ссылки старше N минут
+    limit: int = 500
@@ -1,6 +1,6 @@
 # backend/app/schemas/admin/products.py - ОБНОВЛЕННАЯ ВЕРСИЯ С SUBCATEGORY_ID
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Any, Dict, List, Literal, Optional
 from decimal import Decimal
 from enum import Enum
 
@@ -52,4 +52,58 @@ class ProductRead(ProductBase):
 
 # Схема для отображения продукта с полной информацией о подкатегории
 class ProductReadDetailed(ProductRead):
-    subcategory_obj: Optional[dict] = None  # Полная информация о подкатегории
\ No newline at end of file
+    subcategory_obj: Optional[dict] = None  # Полная информация о подкатегории
+
+# Массовый импорт и изменение цен
+class ProductImportChange(BaseModel):
+    row: int
+    id: Optional[int] = None
+    action: str  # create / update
+    fields: Dict[str, List[Any]]  # колонка -> [было, стало]
+
+
+class ProductImportRowError(BaseModel):
+    row: int
+    id: Optional[int] = None
+    error: str
+
+
+class ProductImportReport(BaseModel):
+    dry_run: bool
+    rows: int
+    created: int
+    updated: int
+    unchanged: int
+    failed: int
+    chunks_committed: int
+    truncated: bool
+    changes: List[ProductImportChange]
+    errors: List[ProductImportRowError]
+    error: Optional[str] = None  # импорт прерван, записаны только chunks_committed пачек
+
+
+class BulkPriceUpdate(BaseModel):
+    percent: Decimal  # +10 - поднять на 10%, -5 - снизить на 5%
+    game_id: Optional[int] = None
+    subcategory_id: Optional[int] = None
+    product_ids: Optional[List[int]] = None
+    round_to: Decimal = Decimal("1")  # шаг округления: 1 - до рубля, 0.01 - до копейки
+    old_price: Literal["keep", "previous", "clear"] = "keep"
+    dry_run: bool = False
+
+
+class BulkPriceChange(BaseModel):
+    id: int
+    name: str
+    price_rub: List[Optional[str]]  # [было, стало]
+    old_price_rub: List[Optional[str]]
+
+
+class BulkPriceUpdateReport(BaseModel):
+    dry_run: bool
+    matched: int
+    updated: int
+    chunks_committed: int
+    truncated: bool
+    changes: List[BulkPriceChange]
+    error: Optional[str] = None  # запись прервана, применено updated товаров
@@ -50,6 +50,7 @@ class OrderCreate(BaseModel):
     manual_game_name: str | None = None
     comment: Optional[str] = None
     auto_processed: Optional[bool] = True
+    quantity: Optional[int] = Field(None, gt=0)  # если передано - сумма считается по каталогу
 
 
 class OrderBulkItem(BaseModel):
@@ -59,6 +60,7 @@ class OrderBulkItem(BaseModel):
     currency: str
     payment_method: PaymentMethod
     comment: str | None = None
+    quantity: Optional[int] = Field(None, gt=0)
 
 
 class OrderBulkCreate(BaseModel):
@@ -87,6 +89,25 @@ class OrderRead(BaseModel):
     }
 
 
+class OrderItemRead(BaseModel):
+    id: int
+    product_id: Optional[int] = None
+    product_name: Optional[str] = None
+    quantity: int
+    price: Decimal
+    amount: Decimal
+    currency: str
+    form_data: Optional[dict] = None
+
+    class Config:
+        from_attributes = True
+
+
+class OrderDetailRead(OrderRead):
+    """Заказ с позициями (страница заказа)"""
+    items: List[OrderItemRead] = []
+
+
 class OrderUpdate(BaseModel):
     status: Optional[OrderStatus] = None
     transaction_id: Optional[str] = None
@@ -0,0 +1,84 @@
+# backend/app/scripts/mock_robokassa.py - ЛОКАЛЬНЫЙ МОК OpStateExt ДЛЯ ПРОВЕРКИ СВЕРКИ
+#
+# Запуск:
+#   python -m app.scripts.mock_robokassa --port 8099 --paid 12:150.00 --paid 15:99 --state 14=10
+# и в окружении воркера/скрипта сверки:
+#   ROBOKASSA_OPSTATE_URL=http://127.0.0.1:8099/Merchant/WebService/Service.asmx/OpStateExt
+#
+# Остальные счета отвечают состоянием 5 (выставлен, не оплачен),
+# с --missing - кодом 3 (счет не найден).
+import argparse
+import hashlib
+import uuid
+
+from aiohttp import web
+
+from app.services.robokassa import (
+    OP_RESULT_INVOICE_NOT_FOUND,
+    OP_RESULT_OK,
+    OP_STATE_INITIATED,
+    OP_STATE_PAID,
+    robokassa_service,
+)
+
+OPSTATE_PATH = "/Merchant/WebService/Service.asmx/OpStateExt"
+
+
+def _response(result_code: int, state_code: int = None, out_sum: str = None) -> str:
+    state = info = ""
+    if state_code is not None:
+        state = f"<State><Code>{state_code}</Code></State>"
+    if out_sum is not None:
+        info = (
+            f"<Info><IncCurrLabel>BankCard</IncCurrLabel><IncSum>{out_sum}</IncSum>"
+            f"<OutCurrLabel>RUR</OutCurrLabel><OutSum>{out_sum}</OutSum>"
+            f"<OpKey>{uuid.uuid4().hex}</OpKey></Info>"
+        )
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>'
+        '<OperationStateResponse xmlns="http://merchant.roboxchange.com/WebService/">'
+        f"<Result><Code>{result_code}</Code></Result>{state}{info}"
+        "</OperationStateResponse>"
+    )
+
+
+def make_app(paid: dict, states: dict, missing: bool) -> web.Application:
+    async def op_state(request: web.Request) -> web.Response:
+        login = request.query.get("MerchantLogin", "")
+        inv_id = request.query.get("InvoiceID", "")
+        signature = request.query.get("Signature", "").lower()
+        expected = hashlib.md5(f"{login}:{inv_id}:{robokassa_service.password2}".encode("utf-8")).hexdigest()
+        if signature != expected:
+            body = _response(1)
+        elif inv_id in paid:
+            body = _response(OP_RESULT_OK, OP_STATE_PAID, paid[inv_id])
+        elif inv_id in states:
+            body = _response(OP_RESULT_OK, states[inv_id])
+        elif missing:
+            body = _response(OP_RESULT_INVOICE_NOT_FOUND)
+        else:
+            body = _response(OP_RESULT_OK, OP_STATE_INITIATED)
+        print(f"OpStateExt InvoiceID={inv_id} -> {body}")
+        return web.Response(text=body, content_type="text/xml")
+
+    app = web.Application()
+    app.router.add_get(OPSTATE_PATH, op_state)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Мок RoboKassa OpStateExt")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--paid", action="append", default=[], help="ID:СУММА - оплаченный счет")
+    parser.add_argument("--state", action="append", default=[], help="ID=КОД - произвольное состояние")
+    parser.add_argument("--missing", action="store_true", help="неизвестные счета - код 3")
+    args = parser.parse_args()
+
+    paid = dict(item.split(":", 1) for item in args.paid)
+    states = {inv_id: int(code) for inv_id, code in (item.split("=", 1) for item in args.state)}
+    print(f"Мок RoboKassa: http://127.0.0.1:{args.port}{OPSTATE_PATH}")
+    web.run_app(make_app(paid, states, args.missing), port=args.port)
+
+
+if __name__ == "__main__":
+    main()
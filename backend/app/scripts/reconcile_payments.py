@@ -0,0 +1,8 @@
+# backend/app/scripts/reconcile_payments.py - РАЗОВАЯ СВЕРКА PENDING ЗАКАЗОВ С ROBOKASSA
+# python -m app.scripts.reconcile_payments
+import asyncio
+
+from app.services.reconciliation import payment_reconciler
+
+stats = asyncio.run(payment_reconciler.run_once())
+print(f"Итог сверки: {stats or 'зависших заказов нет'}")
@@ -2,9 +2,11 @@
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.core.config import settings
-from app.core.database import get_db
+from app.core.database import get_db, get_async_db
 from app.models.user import User, UserRole
 from typing import Optional
 
@@ -96,6 +98,53 @@ def get_current_user_from_request_sync(request: Request, db: Session) -> User:
 
 
 def admin_required(user: User = Depends(get_current_user)) -> User:
+    if user.role != UserRole.admin:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return user
+
+
+# АСИНХРОННЫЕ ВЕРСИИ ДЛЯ async def ЭНДПОИНТОВ (AsyncSession)
+def _decode_user_id(token: str) -> int:
+    try:
+        payload = jwt.decode(token, settings.JWT_SECRET, algorithms=["HS256"])
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+    user_id = payload.get("sub")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Invalid token payload")
+    return int(user_id)
+
+
+async def _get_user_async(db: AsyncSession, user_id: int) -> User:
+    user = (await db.execute(select(User).filter_by(id=user_id))).scalars().first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
+
+
+async def get_current_user_async(
+        credentials: HTTPAuthorizationCredentials = Depends(security),
+        db: AsyncSession = Depends(get_async_db),
+) -> User:
+    return await _get_user_async(db, _decode_user_id(credentials.credentials))
+
+
+async def get_user_from_token_async(db: AsyncSession, token: str) -> User:
+    """Пользователь по JWT без заголовка Authorization (WebSocket: токен в query или первом кадре)"""
+    return await _get_user_async(db, _decode_user_id(token))
+
+
+async def get_current_user_from_request_async(request: Request, db: AsyncSession) -> User:
+    """Асинхронная версия получения пользователя из токена в запросе"""
+    auth_header = request.headers.get("Authorization")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Not authenticated")
+
+    return await _get_user_async(db, _decode_user_id(auth_header.split(" ")[1]))
+
+
+async def admin_required_async(user: User = Depends(get_current_user_async)) -> User:
     if user.role != UserRole.admin:
         raise HTTPException(status_code=403, detail="Forbidden")
     return user
\ No newline at end of file
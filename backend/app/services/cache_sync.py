@@ -0,0 +1,30 @@
+# backend/app/services/cache_sync.py - ИНВАЛИДАЦИЯ КЭШЕЙ КОНТЕНТА ВО ВСЕХ ПРОЦЕССАХ API
+import uuid
+
+from loguru import logger
+
+from app.core.http_cache import content_versions
+from app.services.pubsub import pubsub
+
+# Канал версий контента ("articles", "payment_terms") между процессами API
+CONTENT_CHANNEL = "cache:content"
+
+# Процесс-отправитель получает свое же сообщение из Redis - повторно его не применяем
+PROCESS_ORIGIN = uuid.uuid4().hex
+
+
+def invalidate_content(scope: str):
+    """Новая версия области контента здесь и (через pub/sub) в остальных воркерах uvicorn"""
+    content_versions.bump(scope)
+    pubsub.publish_sync(CONTENT_CHANNEL, {"scope": scope, "origin": PROCESS_ORIGIN})
+
+
+async def on_content_message(channel: str, message: dict):
+    scope = message.get("scope")
+    if message.get("origin") == PROCESS_ORIGIN or not isinstance(scope, str):
+        return
+    content_versions.bump(scope)
+    logger.debug(f"🧹 Версия {scope} обновлена по сообщению другого процесса")
+
+
+pubsub.subscribe(CONTENT_CHANNEL, on_content_message)
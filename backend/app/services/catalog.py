@@ -0,0 +1,151 @@
+# backend/app/services/catalog.py - СНИМОК КАТАЛОГА ИГР В ПАМЯТИ ПРОЦЕССА
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy.orm import Session, selectinload
+
+from app.core.config import settings
+from app.core.http_cache import content_versions, etag_for_bytes
+from app.models.game import Game
+from app.schemas.game import GameRead
+from app.services.cache_sync import PROCESS_ORIGIN
+from app.services.pubsub import pubsub
+
+# Канал инвалидации снимка каталога между процессами API
+CATALOG_CHANNEL = "catalog:snapshot"
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """Предсобранный каталог: JSON каждой игры и JSON всего списка"""
+    version: int
+    built_at: float
+    # (game_id, name в нижнем регистре, JSON игры) в порядке sort_order
+    games: Tuple[Tuple[int, str, bytes], ...] = ()
+    game_blobs: Dict[int, bytes] = field(default_factory=dict)
+    game_etags: Dict[int, str] = field(default_factory=dict)
+    list_blob: bytes = b"[]"
+    list_etag: str = ""
+
+    def is_expired(self, ttl: int) -> bool:
+        return ttl > 0 and time.monotonic() - self.built_at > ttl
+
+
+class CatalogService:
+    """
+    Держит в памяти процесса сериализованный каталог игр для публичного API.
+
+    Снимок собирается лениво при первом чтении и пересобирается только после
+    invalidate(), который вызывают админские роутеры после коммита изменений.
+    Другие процессы API узнают об изменениях через pub/sub, TTL (CATALOG_SNAPSHOT_TTL)
+    страхует пропущенные сообщения.
+    """
+
+    def __init__(self, ttl: int = 300):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._version = 0
+        self._snapshot: Optional[CatalogSnapshot] = None
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def invalidate(self, reason: str = "", publish: bool = True):
+        """Помечает снимок устаревшим, следующий запрос соберет новый; publish - и в других процессах API"""
+        with self._lock:
+            self._version += 1
+            self._snapshot = None
+        content_versions.bump("catalog")
+        logger.info(f"🗂️ Каталог инвалидирован (v{self._version}) {reason}".rstrip())
+        if publish:
+            pubsub.publish_sync(CATALOG_CHANNEL, {"reason": reason, "origin": PROCESS_ORIGIN})
+
+    async def on_message(self, channel: str, message: dict):
+        if message.get("origin") != PROCESS_ORIGIN:
+            self.invalidate(f"{message.get('reason') or ''} (другой процесс)".strip(), publish=False)
+
+    def get_snapshot(self, db: Session) -> CatalogSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and not snapshot.is_expired(self.ttl):
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and not snapshot.is_expired(self.ttl):
+                return snapshot
+
+            version = self._version
+            snapshot = self._build(db, version)
+            # Если во время сборки каталог успели изменить - снимок не сохраняем
+            if version == self._version:
+                self._snapshot = snapshot
+            return snapshot
+
+    def _build(self, db: Session, version: int) -> CatalogSnapshot:
+        started = time.perf_counter()
+
+        games = (
+            db.query(Game)
+            .options(
+                selectinload(Game.products),
+                selectinload(Game.subcategories),
+                selectinload(Game.input_fields),
+            )
+            .filter(
+                Game.enabled == True,
+                Game.is_deleted == False
+            )
+            .order_by(Game.sort_order.asc())
+            .all()
+        )
+
+        entries: List[Tuple[int, str, bytes]] = []
+        for game in games:
+            blob = GameRead.model_validate(game, from_attributes=True).model_dump_json().encode("utf-8")
+            entries.append((game.id, (game.name or "").lower(), blob))
+
+        list_blob = self._join(blob for _, _, blob in entries)
+        snapshot = CatalogSnapshot(
+            version=version,
+            built_at=time.monotonic(),
+            games=tuple(entries),
+            game_blobs={game_id: blob for game_id, _, blob in entries},
+            game_etags={game_id: etag_for_bytes(blob) for game_id, _, blob in entries},
+            list_blob=list_blob,
+            list_etag=etag_for_bytes(list_blob),
+        )
+
+        logger.info(
+            f"🗂️ Каталог собран: v{version}, игр: {len(entries)}, "
+            f"{len(snapshot.list_blob)} байт за {(time.perf_counter() - started) * 1000:.1f} мс"
+        )
+        return snapshot
+
+    @staticmethod
+    def _join(blobs) -> bytes:
+        return b"[" + b",".join(blobs) + b"]"
+
+    def list_games_json(self, db: Session, q: str = "") -> Tuple[bytes, str]:
+        """JSON списка игр и его ETag, при q - фильтр по подстроке названия без учета регистра"""
+        snapshot = self.get_snapshot(db)
+        if not q:
+            return snapshot.list_blob, snapshot.list_etag
+
+        needle = q.lower()
+        content = self._join(blob for _, name, blob in snapshot.games if needle in name)
+        return content, etag_for_bytes(content)
+
+    def get_game_json(self, db: Session, game_id: int) -> Optional[Tuple[bytes, str]]:
+        snapshot = self.get_snapshot(db)
+        if game_id not in snapshot.game_blobs:
+            return None
+        return snapshot.game_blobs[game_id], snapshot.game_etags[game_id]
+
+
+# Глобальный экземпляр сервиса
+catalog_service = CatalogService(ttl=settings.CATALOG_SNAPSHOT_TTL)
+pubsub.subscribe(CATALOG_CHANNEL, catalog_service.on_message)
@@ -0,0 +1,68 @@
+# backend/app/services/email_templates.py - РЕНДЕР EMAIL ШАБЛОНОВ С ПРЕДКОМПИЛЯЦИЕЙ
+import time
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+from loguru import logger
+
+from app.core.config import settings
+
+# Путь от расположения модуля, а не от текущей директории процесса
+TEMPLATES_DIR = Path(__file__).resolve().parent.parent / "templates" / "emails"
+
+
+class EmailTemplates:
+    """
+    Jinja окружение для писем.
+
+    Все шаблоны компилируются один раз при старте (precompile), байткод
+    складывается в FileSystemBytecodeCache и переиспользуется следующими
+    процессами (API, воркер, бот). Проверка изменений файлов выключена,
+    пока не задан EMAIL_TEMPLATES_AUTO_RELOAD.
+    """
+
+    def __init__(self, directory: Path = TEMPLATES_DIR, cache_dir: Optional[str] = None,
+                 auto_reload: bool = False):
+        self.directory = directory
+        if cache_dir:
+            Path(cache_dir).mkdir(parents=True, exist_ok=True)
+        self.env = Environment(
+            loader=FileSystemLoader(str(directory)),
+            bytecode_cache=FileSystemBytecodeCache(cache_dir) if cache_dir else FileSystemBytecodeCache(),
+            auto_reload=auto_reload,
+            cache_size=-1,  # шаблонов немного - держим все
+        )
+
+    def template_names(self) -> List[str]:
+        return self.env.list_templates(extensions=["html"])
+
+    def precompile(self) -> int:
+        """Компилирует все шаблоны в кеш окружения и байткод на диске"""
+        started = time.perf_counter()
+        names = self.template_names()
+        for name in names:
+            self.env.get_template(name)
+        logger.info(
+            f"📨 Email шаблоны скомпилированы: {len(names)} за {(time.perf_counter() - started) * 1000:.1f} мс"
+        )
+        return len(names)
+
+    def render(self, template_name: str, context: dict) -> str:
+        return self.env.get_template(template_name).render(context)
+
+    def render_many(self, template_name: str, contexts: Iterable[dict]) -> List[str]:
+        """Рендерит один шаблон для множества контекстов (массовые рассылки)"""
+        template = self.env.get_template(template_name)
+        return [template.render(context) for context in contexts]
+
+
+# Глобальный экземпляр
+email_templates = EmailTemplates(
+    cache_dir=settings.EMAIL_TEMPLATE_CACHE_DIR,
+    auto_reload=settings.EMAIL_TEMPLATES_AUTO_RELOAD,
+)
+
+
+def render_template(template_name: str, context: dict) -> str:
+    return email_templates.render(template_name, context)
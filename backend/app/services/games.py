@@ -1,5 +1,13 @@
+# backend/app/services/games.py
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from loguru import logger
+from sqlalchemy import delete, insert, update
 from sqlalchemy.orm import Session
+
 from app.models.game import Game
+from app.models.game_input_field import GameInputField
 
 
 def get_all_games(db: Session, query: str = ""):
@@ -11,3 +19,120 @@ def get_all_games(db: Session, query: str = ""):
 
 def get_game_by_id(db: Session, game_id: int):
     return db.query(Game).filter(Game.id == game_id).first()
+
+
+# ------------------------------------------------------------
+# Поля ввода игры: обновление по разнице вместо удаления и вставки заново
+# ------------------------------------------------------------
+# Колонки, которые задаются из админки и сравниваются при обновлении
+INPUT_FIELD_COLUMNS = (
+    "label", "field_type", "required", "placeholder", "help_text", "options",
+    "min_length", "max_length", "validation_regex", "sort_order", "enabled",
+)
+
+
+@dataclass
+class InputFieldChangeSet:
+    """Что реально изменилось в полях игры (для логов и инвалидации кэшей)"""
+    game_id: int
+    inserted: List[Tuple[str, Optional[int]]] = field(default_factory=list)  # (name, subcategory_id)
+    updated: List[Tuple[str, Optional[int]]] = field(default_factory=list)
+    deleted: List[Tuple[str, Optional[int]]] = field(default_factory=list)
+    unchanged: int = 0
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.inserted or self.updated or self.deleted)
+
+    @property
+    def subcategory_ids(self) -> Set[Optional[int]]:
+        """Затронутые подкатегории (None - общие поля игры)"""
+        return {subcategory_id for _, subcategory_id in self.inserted + self.updated + self.deleted}
+
+    def __str__(self):
+        return (
+            f"+{len(self.inserted)} ~{len(self.updated)} -{len(self.deleted)} "
+            f"(без изменений: {self.unchanged})"
+        )
+
+
+def _input_field_values(field_data: dict, sort_order: int) -> dict:
+    """Значения колонок из данных админки (как их раньше заполнял роутер)"""
+    return {
+        "label": field_data["label"],
+        "field_type": field_data.get("type", "text"),
+        "required": field_data.get("required", True),
+        "placeholder": field_data.get("placeholder"),
+        "help_text": field_data.get("help_text"),
+        "options": field_data.get("options"),
+        "min_length": field_data.get("min_length"),
+        "max_length": field_data.get("max_length"),
+        "validation_regex": field_data.get("validation_regex"),
+        "sort_order": sort_order,
+        "enabled": True,
+    }
+
+
+def sync_input_fields(db: Session, game_id: int, fields_data: List[dict]) -> InputFieldChangeSet:
+    """
+    Приводит поля игры к списку из админки. Поля сопоставляются по (name, subcategory_id):
+    новые вставляются, отличающиеся обновляются, пропавшие удаляются - каждое одним
+    bulk-запросом и только при наличии изменений. Без коммита.
+    """
+    changes = InputFieldChangeSet(game_id=game_id)
+
+    existing: Dict[Tuple[str, Optional[int]], GameInputField] = {}
+    duplicates: List[GameInputField] = []  # лишние строки с тем же (name, subcategory_id)
+    for input_field in db.query(GameInputField).filter(GameInputField.game_id == game_id).all():
+        key = (input_field.name, input_field.subcategory_id)
+        if key in existing:
+            duplicates.append(input_field)
+        else:
+            existing[key] = input_field
+
+    inserts, updates, seen = [], [], set()
+    for idx, field_data in enumerate(fields_data):
+        # Пропускаем поля без названия
+        if not field_data.get("name") or not field_data.get("label"):
+            logger.warning(f"🎮 Skipping field {idx}: missing name or label")
+            continue
+
+        subcategory_id = field_data.get("subcategory_id")
+        if subcategory_id == 0:  # Если выбрано "Для всех подкатегорий"
+            subcategory_id = None
+        key = (field_data["name"], subcategory_id)
+        if key in seen:
+            logger.warning(f"🎮 Skipping field {idx}: duplicate {key}")
+            continue
+        seen.add(key)
+
+        values = _input_field_values(field_data, idx)
+        current = existing.get(key)
+        if current is None:
+            inserts.append({"game_id": game_id, "name": key[0], "subcategory_id": subcategory_id, **values})
+            changes.inserted.append(key)
+        elif any(getattr(current, column) != value for column, value in values.items()):
+            updates.append({"id": current.id, **values})
+            changes.updated.append(key)
+        else:
+            changes.unchanged += 1
+
+    removed = [key for key in existing if key not in seen]
+    changes.deleted.extend(removed)
+    # Дубли тоже удаляются - это изменение, иначе кэш схем полей не сбросится
+    changes.deleted.extend((duplicate.name, duplicate.subcategory_id) for duplicate in duplicates)
+    delete_ids = [existing[key].id for key in removed] + [duplicate.id for duplicate in duplicates]
+
+    if inserts:
+        db.execute(insert(GameInputField), inserts)
+    if updates:
+        db.execute(update(GameInputField), updates)
+    if delete_ids:
+        db.execute(
+            delete(GameInputField)
+            .where(GameInputField.id.in_(delete_ids))
+            .execution_options(synchronize_session=False)
+        )
+
+    logger.info(f"🎮 Input fields of game {game_id}: {changes}")
+    return changes
@@ -0,0 +1,194 @@
+# backend/app/services/input_validation.py - ПРОВЕРКА ДАННЫХ ФОРМ КОРЗИНЫ ПО ПОЛЯМ ВВОДА ИГРЫ
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Pattern, Tuple
+
+from loguru import logger
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.game_input_field import GameInputField
+from app.services.pubsub import pubsub
+
+# Канал инвалидации между процессами API
+INPUT_FIELDS_CHANNEL = "catalog:input_fields"
+
+_EMAIL = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+_NUMBER = re.compile(r"^-?\d+(?:[.,]\d+)?$")
+
+# Сколько ошибок показывать покупателю в одном ответе
+MAX_REPORTED_ERRORS = 5
+
+
+@dataclass(frozen=True)
+class CompiledField:
+    name: str
+    label: str
+    field_type: str
+    required: bool
+    min_length: Optional[int]
+    max_length: Optional[int]
+    regex: Optional[Pattern]
+    options: Optional[frozenset]
+
+    def check(self, value) -> Optional[str]:
+        """Текст ошибки или None"""
+        value = "" if value is None else str(value).strip()
+        if not value:
+            return f"поле «{self.label}» обязательно" if self.required else None
+        if self.min_length is not None and len(value) < self.min_length:
+            return f"«{self.label}»: минимум {self.min_length} символов"
+        if self.max_length is not None and len(value) > self.max_length:
+            return f"«{self.label}»: максимум {self.max_length} символов"
+        if self.options and value not in self.options:
+            return f"«{self.label}»: недопустимое значение"
+        if self.field_type == "email" and not _EMAIL.match(value):
+            return f"«{self.label}»: неверный email"
+        if self.field_type == "number" and not _NUMBER.match(value):
+            return f"«{self.label}»: ожидается число"
+        if self.regex is not None and not self.regex.search(value):
+            return f"«{self.label}»: неверный формат"
+        return None
+
+
+@dataclass(frozen=True)
+class GameFieldSchema:
+    """Скомпилированные поля одной игры: общие и по подкатегориям"""
+    game_id: int
+    version: int
+    built_at: float
+    common: Tuple[CompiledField, ...]
+    by_subcategory: Dict[int, Tuple[CompiledField, ...]]
+
+    def fields_for(self, subcategory_id: Optional[int]) -> Tuple[CompiledField, ...]:
+        if subcategory_id is None:
+            return self.common
+        return self.common + self.by_subcategory.get(subcategory_id, ())
+
+
+def _compile_field(field: GameInputField) -> CompiledField:
+    regex = None
+    if field.validation_regex:
+        try:
+            regex = re.compile(field.validation_regex)
+        except re.error as e:
+            # Кривое выражение из админки не должно блокировать продажи
+            logger.warning(f"⚠️ Поле {field.name} игры #{field.game_id}: неверный regex ({e}) - проверка пропущена")
+    options = None
+    if field.field_type == "select" and field.options:
+        options = frozenset(str(option) for option in field.options)
+    return CompiledField(
+        name=field.name,
+        label=field.label or field.name,
+        field_type=field.field_type or "text",
+        required=bool(field.required),
+        min_length=field.min_length,
+        max_length=field.max_length,
+        regex=regex,
+        options=options,
+    )
+
+
+class InputFieldValidator:
+    """
+    Кэш скомпилированных схем полей по (game_id, версия).
+
+    Версия игры увеличивается через invalidate() после изменения полей в админке;
+    другим процессам API об этом сообщает pub/sub, TTL страхует пропущенные сообщения.
+    Промахи кэша по всем играм корзины загружаются одним запросом.
+    """
+
+    def __init__(self, ttl: int = 300):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._versions: Dict[int, int] = {}
+        self._schemas: Dict[int, GameFieldSchema] = {}
+
+    def invalidate(self, game_id: int, publish: bool = True):
+        with self._lock:
+            self._versions[game_id] = self._versions.get(game_id, 0) + 1
+            self._schemas.pop(game_id, None)
+        logger.debug(f"🧩 Схема полей игры #{game_id} инвалидирована")
+        if publish:
+            pubsub.publish_sync(INPUT_FIELDS_CHANNEL, {"game_id": game_id})
+
+    async def on_message(self, channel: str, message: dict):
+        game_id = message.get("game_id")
+        if isinstance(game_id, int):
+            self.invalidate(game_id, publish=False)
+
+    def _cached(self, game_id: int) -> Optional[GameFieldSchema]:
+        schema = self._schemas.get(game_id)
+        if schema is None or schema.version != self._versions.get(game_id, 0):
+            return None
+        if self.ttl > 0 and time.monotonic() - schema.built_at > self.ttl:
+            return None
+        return schema
+
+    def get_schemas(self, db: Session, game_ids: Iterable[int]) -> Dict[int, GameFieldSchema]:
+        game_ids = set(game_ids)
+        schemas = {}
+        missing = []
+        for game_id in game_ids:
+            schema = self._cached(game_id)
+            if schema is None:
+                missing.append(game_id)
+            else:
+                schemas[game_id] = schema
+        if not missing:
+            return schemas
+
+        versions = {game_id: self._versions.get(game_id, 0) for game_id in missing}
+        fields = (
+            db.query(GameInputField)
+            .filter(GameInputField.game_id.in_(missing), GameInputField.enabled == True)
+            .order_by(GameInputField.game_id, GameInputField.sort_order)
+            .all()
+        )
+        grouped: Dict[int, List[GameInputField]] = {game_id: [] for game_id in missing}
+        for field in fields:
+            grouped[field.game_id].append(field)
+
+        now = time.monotonic()
+        with self._lock:
+            for game_id, game_fields in grouped.items():
+                common, by_subcategory = [], {}
+                for field in game_fields:
+                    compiled = _compile_field(field)
+                    if field.subcategory_id is None:
+                        common.append(compiled)
+                    else:
+                        by_subcategory.setdefault(field.subcategory_id, []).append(compiled)
+                schema = GameFieldSchema(
+                    game_id=game_id,
+                    version=versions[game_id],
+                    built_at=now,
+                    common=tuple(common),
+                    by_subcategory={key: tuple(value) for key, value in by_subcategory.items()},
+                )
+                schemas[game_id] = schema
+                # Поля успели поменять во время загрузки - в кэш не кладем
+                if versions[game_id] == self._versions.get(game_id, 0):
+                    self._schemas[game_id] = schema
+        return schemas
+
+    def validate(self, db: Session, entries: List[Tuple[str, int, Optional[int], Optional[dict]]]) -> List[str]:
+        """
+        Один проход по всей корзине. entries: (название позиции, game_id, subcategory_id, данные формы).
+        Возвращает список ошибок (пустой - все в порядке).
+        """
+        schemas = self.get_schemas(db, (game_id for _, game_id, _, _ in entries))
+        errors = []
+        for title, game_id, subcategory_id, form_data in entries:
+            form_data = form_data or {}
+            for field in schemas[game_id].fields_for(subcategory_id):
+                error = field.check(form_data.get(field.name))
+                if error:
+                    errors.append(f"{title}: {error}")
+        return errors
+
+
+input_field_validator = InputFieldValidator(ttl=settings.CATALOG_SNAPSHOT_TTL)
+pubsub.subscribe(INPUT_FIELDS_CHANNEL, input_field_validator.on_message)
@@ -1,22 +1,205 @@
+# backend/app/services/mailer.py - ОТПРАВКА ПИСЕМ ЧЕРЕЗ ПУЛ SMTP СОЕДИНЕНИЙ
+import asyncio
+import atexit
+import queue
 import smtplib
+import threading
+import time
+from contextlib import contextmanager
 from email.message import EmailMessage
-from jinja2 import Environment, FileSystemLoader
-from app.core.config import settings
+from typing import List, Optional
 
-env = Environment(loader=FileSystemLoader("app/templates/emails"))
+from loguru import logger
 
-def render_template(template_name: str, context: dict) -> str:
-    template = env.get_template(template_name)
-    return template.render(context)
+from app.core.config import settings
+from app.services.email_templates import render_template  # noqa: F401 - старый импорт из mailer
 
-def send_email(to: str, subject: str, body: str):
+
+def build_message(to: str, subject: str, body: str) -> EmailMessage:
     msg = EmailMessage()
     msg["Subject"] = subject
     msg["From"] = settings.MAIL_FROM
     msg["To"] = to
     msg.set_content("Ваш клиент не поддерживает HTML.")
     msg.add_alternative(body, subtype="html")
+    return msg
+
 
-    with smtplib.SMTP_SSL(settings.MAIL_SERVER, settings.MAIL_PORT) as smtp:
+class SMTPPool:
+    """
+    Пул авторизованных SMTP_SSL соединений.
+
+    Соединение берется из пула, после отправки возвращается обратно. Простоявшее
+    дольше SMTP_IDLE_CHECK секунд проверяется NOOP, мертвое - пересоздается.
+    Одновременно открыто не больше SMTP_POOL_SIZE соединений.
+    """
+
+    def __init__(self, size: int = 2, idle_check: int = 30, timeout: int = 30):
+        self.size = size
+        self.idle_check = idle_check
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[tuple[smtplib.SMTP_SSL, float]]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _connect(self) -> smtplib.SMTP_SSL:
+        smtp = smtplib.SMTP_SSL(settings.MAIL_SERVER, settings.MAIL_PORT, timeout=self.timeout)
         smtp.login(settings.MAIL_USERNAME, settings.MAIL_PASSWORD)
-        smtp.send_message(msg)
+        logger.debug(f"📧 Открыто SMTP соединение с {settings.MAIL_SERVER}")
+        return smtp
+
+    @staticmethod
+    def _close(smtp: smtplib.SMTP_SSL):
+        try:
+            smtp.quit()
+        except Exception:
+            try:
+                smtp.close()
+            except Exception:
+                pass
+
+    def _is_alive(self, smtp: smtplib.SMTP_SSL) -> bool:
+        try:
+            return smtp.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _take(self) -> smtplib.SMTP_SSL:
+        while True:
+            try:
+                smtp, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if time.monotonic() - last_used < self.idle_check or self._is_alive(smtp):
+                return smtp
+            self._close(smtp)
+
+    @contextmanager
+    def connection(self):
+        """Выдает живое соединение. При ошибке SMTP соединение закрывается, а не возвращается в пул"""
+        with self._slots:
+            smtp = self._take()
+            try:
+                yield smtp
+            except (smtplib.SMTPException, OSError):
+                self._close(smtp)
+                raise
+            else:
+                self._idle.put((smtp, time.monotonic()))
+
+    def send(self, messages: List[EmailMessage]) -> List[Optional[Exception]]:
+        """
+        Отправляет пачку писем через одно соединение.
+        Обрыв соединения - переподключаемся и продолжаем с того же письма (одна попытка на письмо).
+        Возвращает ошибку (или None) по каждому письму.
+        """
+        results: List[Optional[Exception]] = [None] * len(messages)
+        index = 0
+        retried = set()
+        while index < len(messages):
+            try:
+                with self.connection() as smtp:
+                    while index < len(messages):
+                        try:
+                            smtp.send_message(messages[index])
+                        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError,
+                                smtplib.SMTPSenderRefused) as e:
+                            # Проблема конкретного письма, соединение живое
+                            results[index] = e
+                        index += 1
+            except (smtplib.SMTPException, OSError) as e:
+                if index in retried:
+                    results[index] = e
+                    index += 1
+                else:
+                    retried.add(index)
+                    logger.warning(f"⚠️ SMTP соединение оборвалось, переподключаемся: {e}")
+        return results
+
+    def close_all(self):
+        while True:
+            try:
+                smtp, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(smtp)
+
+
+class MailQueue:
+    """
+    Фоновая очередь писем: запрос только кладет письмо в очередь, отдельный поток
+    забирает накопившиеся письма пачкой и отправляет их через одно SMTP соединение.
+    """
+
+    def __init__(self, pool: SMTPPool, batch_size: int = 20):
+        self.pool = pool
+        self.batch_size = batch_size
+        self._queue: "queue.Queue[EmailMessage]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def put(self, message: EmailMessage):
+        self._ensure_started()
+        self._queue.put(message)
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="mail-queue", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                results = self.pool.send(batch)
+            except Exception as e:
+                results = [e] * len(batch)
+
+            for message, error in zip(batch, results):
+                if error:
+                    logger.error(f"❌ Письмо на {message['To']} не отправлено: {error}")
+                else:
+                    logger.info(f"📧 Письмо отправлено на {message['To']}")
+            for _ in batch:
+                self._queue.task_done()
+
+    def flush(self, timeout: float = 10):
+        """Ждет отправки уже поставленных писем (при остановке процесса)"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.1)
+
+
+smtp_pool = SMTPPool(size=settings.SMTP_POOL_SIZE, idle_check=settings.SMTP_IDLE_CHECK)
+mail_queue = MailQueue(smtp_pool, batch_size=settings.SMTP_BATCH_SIZE)
+
+
+def send_email(to: str, subject: str, body: str):
+    """Синхронная отправка через пул (ошибка пробрасывается вызывающему)"""
+    error = smtp_pool.send([build_message(to, subject, body)])[0]
+    if error:
+        raise error
+
+
+async def send_email_async(to: str, subject: str, body: str):
+    """Отправка из async кода без блокировки event loop"""
+    await asyncio.to_thread(send_email, to, subject, body)
+
+
+def queue_email(to: str, subject: str, body: str):
+    """Отправка в фоне: не ждет SMTP, ошибки только логируются"""
+    mail_queue.put(build_message(to, subject, body))
+
+
+@atexit.register
+def _shutdown():
+    mail_queue.flush()
+    smtp_pool.close_all()
@@ -0,0 +1,198 @@
+# backend/app/services/notifications.py - УВЕДОМЛЕНИЯ: СЧЕТЧИК, ЛЕНТА И ОТМЕТКИ ПРОЧТЕНИЯ
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+
+from sqlalchemy import String, Numeric, and_, cast, desc, func, literal, null, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.notification import NotificationReadState
+from app.models.order import Order, OrderStatus
+from app.models.support import SupportMessage, SupportStatus
+
+SUPPORT_REPLY = "support_reply"
+ORDER_UPDATE = "order_update"
+CHANNELS = (SUPPORT_REPLY, ORDER_UPDATE)
+
+# Отметка "ничего не прочитано" - сравнение с ней всегда истинно
+_EPOCH = datetime(1970, 1, 1)
+
+_FINAL_ORDER_STATUSES = (OrderStatus.done, OrderStatus.canceled)
+
+
+def notification_owner_key(user_id: Optional[int] = None, guest_id: Optional[str] = None) -> Optional[str]:
+    if user_id is not None:
+        return f"user:{user_id}"
+    if guest_id:
+        return f"guest:{guest_id}"
+    return None
+
+
+def owner_channels(user_id: Optional[int] = None) -> tuple:
+    """У гостей есть только ответы поддержки"""
+    return CHANNELS if user_id is not None else (SUPPORT_REPLY,)
+
+
+def _window_start() -> datetime:
+    return datetime.utcnow() - timedelta(hours=settings.NOTIFICATION_WINDOW_HOURS)
+
+
+def _read_watermark(owner_key: str, channel: str):
+    """Скалярный подзапрос: last_read_at канала или эпоха"""
+    return func.coalesce(
+        select(NotificationReadState.last_read_at)
+        .where(NotificationReadState.owner_key == owner_key, NotificationReadState.channel == channel)
+        .scalar_subquery(),
+        _EPOCH,
+    )
+
+
+def _support_replies(user_id: Optional[int], guest_id: Optional[str], since: datetime):
+    owner = SupportMessage.user_id == user_id if user_id is not None else SupportMessage.guest_id == guest_id
+    return and_(
+        owner,
+        SupportMessage.is_from_user == False,
+        SupportMessage.created_at >= since,
+    )
+
+
+def _order_event_time():
+    return func.coalesce(Order.updated_at, Order.created_at)
+
+
+def _order_updates(user_id: int, since: datetime):
+    return and_(
+        Order.user_id == user_id,
+        Order.status.in_(_FINAL_ORDER_STATUSES),
+        # Без coalesce в условии, чтобы работал индекс (user_id, updated_at)
+        or_(Order.updated_at >= since, and_(Order.updated_at.is_(None), Order.created_at >= since)),
+    )
+
+
+def count_unread(db: Session, user_id: Optional[int] = None, guest_id: Optional[str] = None) -> int:
+    """Непрочитанные уведомления одним запросом: сумма подсчетов по каналам после их отметок"""
+    owner_key = notification_owner_key(user_id, guest_id)
+    if owner_key is None:
+        return 0
+    since = _window_start()
+
+    support_count = (
+        select(func.count(SupportMessage.id))
+        .where(
+            _support_replies(user_id, guest_id, since),
+            SupportMessage.status == SupportStatus.in_progress,
+            SupportMessage.created_at > _read_watermark(owner_key, SUPPORT_REPLY),
+        )
+        .scalar_subquery()
+    )
+    total = support_count
+
+    if user_id is not None:
+        order_count = (
+            select(func.count(Order.id))
+            .where(
+                _order_updates(user_id, since),
+                _order_event_time() > _read_watermark(owner_key, ORDER_UPDATE),
+            )
+            .scalar_subquery()
+        )
+        total = total + order_count
+
+    return db.execute(select(total)).scalar() or 0
+
+
+def list_notifications(db: Session, user_id: Optional[int] = None, guest_id: Optional[str] = None,
+                       limit: int = 10) -> List[dict]:
+    """Лента уведомлений: UNION ALL каналов с сортировкой и лимитом в БД"""
+    owner_key = notification_owner_key(user_id, guest_id)
+    if owner_key is None:
+        return []
+    since = _window_start()
+
+    support_time = SupportMessage.created_at
+    parts = [
+        select(
+            literal(SUPPORT_REPLY).label("type"),
+            SupportMessage.id.label("ref_id"),
+            SupportMessage.message.label("body"),
+            cast(null(), Numeric(10, 2)).label("amount"),
+            cast(null(), String(10)).label("currency"),
+            cast(null(), String(32)).label("status"),
+            support_time.label("event_time"),
+            (support_time <= _read_watermark(owner_key, SUPPORT_REPLY)).label("is_read"),
+        )
+        .where(_support_replies(user_id, guest_id, since))
+    ]
+
+    if user_id is not None:
+        order_time = _order_event_time()
+        parts.append(
+            select(
+                literal(ORDER_UPDATE).label("type"),
+                Order.id.label("ref_id"),
+                cast(null(), SupportMessage.message.type).label("body"),
+                Order.amount.label("amount"),
+                Order.currency.label("currency"),
+                cast(Order.status, String(32)).label("status"),
+                order_time.label("event_time"),
+                (order_time <= _read_watermark(owner_key, ORDER_UPDATE)).label("is_read"),
+            )
+            .where(_order_updates(user_id, since))
+        )
+
+    feed = parts[0] if len(parts) == 1 else parts[0].union_all(*parts[1:])
+    feed = feed.subquery()
+    rows = db.execute(
+        select(feed).order_by(desc(feed.c.event_time)).limit(limit)
+    ).mappings().all()
+
+    notifications = []
+    for row in rows:
+        if row["type"] == SUPPORT_REPLY:
+            body = row["body"] or ""
+            notifications.append({
+                "type": SUPPORT_REPLY,
+                "title": "Ответ от поддержки",
+                "message": body[:100] + "..." if len(body) > 100 else body,
+                "created_at": row["event_time"].isoformat(),
+                "read": bool(row["is_read"]),
+                "data": {"message_id": row["ref_id"]},
+            })
+        else:
+            status = OrderStatus(row["status"])
+            status_text = "выполнен" if status == OrderStatus.done else "отменен"
+            notifications.append({
+                "type": ORDER_UPDATE,
+                "title": f"Заказ #{row['ref_id']} {status_text}",
+                "message": f"Ваш заказ на сумму {row['amount']} {row['currency']} {status_text}",
+                "created_at": row["event_time"].isoformat(),
+                "read": bool(row["is_read"]),
+                "data": {"order_id": row["ref_id"], "status": status.value},
+            })
+    return notifications
+
+
+def mark_read(db: Session, owner_key: str, channels: Iterable[str], until: Optional[datetime] = None) -> datetime:
+    """Сдвигает отметку прочтения каналов вперед (назад - никогда) и коммитит"""
+    until = until or datetime.utcnow()
+    for channel in channels:
+        for attempt in range(2):
+            state = (
+                db.query(NotificationReadState)
+                .filter(NotificationReadState.owner_key == owner_key, NotificationReadState.channel == channel)
+                .first()
+            )
+            if state is None:
+                db.add(NotificationReadState(owner_key=owner_key, channel=channel, last_read_at=until))
+            elif state.last_read_at < until:
+                state.last_read_at = until
+            try:
+                db.commit()
+                break
+            except IntegrityError:
+                # Параллельный запрос успел создать отметку - обновляем ее
+                db.rollback()
+                if attempt:
+                    raise
+    return until
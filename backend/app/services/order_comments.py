@@ -0,0 +1,179 @@
+# backend/app/services/order_comments.py - ДАННЫЕ ПОЛЬЗОВАТЕЛЯ ИЗ ПОЗИЦИЙ И КОММЕНТАРИЯ ЗАКАЗА
+import json
+import re
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from typing import Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+FORMS_SECTION = "Данные форм:"
+GUEST_KEYS = ("guest_email", "guest_name")
+USER_DATA_LIMIT = 8
+
+# "[Товар #12] {...}" (гостевые) и "[12] {...}" (bulk)
+_ITEM_LINE = re.compile(r"^\[(?:Товар #)?(\d+)\]\s?(.*)$")
+
+
+@dataclass
+class CommentItem:
+    """Позиция корзины, восстановленная из старого формата comment"""
+    product_id: Optional[int]
+    product_name: Optional[str] = None
+    amount: Optional[Decimal] = None
+    form_data: Optional[dict] = None
+    text: Optional[str] = None  # данные формы, если это не JSON
+
+
+@dataclass
+class ParsedComment:
+    guest: dict = field(default_factory=dict)  # guest_email, guest_name
+    items: List[CommentItem] = field(default_factory=list)
+    user_data: dict = field(default_factory=dict)  # ручные заказы: JSON или key=value
+    text: List[str] = field(default_factory=list)  # строки без структуры
+
+
+def parse_form_data(value) -> Optional[dict]:
+    """JSON данных формы из позиции корзины (None, если это не JSON-объект)"""
+    if isinstance(value, dict):
+        return value
+    if not value:
+        return None
+    try:
+        data = json.loads(value)
+    except (TypeError, ValueError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _decimal(value) -> Optional[Decimal]:
+    try:
+        return Decimal(str(value)) if value is not None else None
+    except InvalidOperation:
+        return None
+
+
+def _parse_item_lines(lines: Iterable[str]) -> List[CommentItem]:
+    items = []
+    for line in lines:
+        match = _ITEM_LINE.match(line.strip())
+        if not match:
+            continue
+        text = match.group(2).strip()
+        form_data = parse_form_data(text)
+        items.append(CommentItem(
+            product_id=int(match.group(1)),
+            form_data=form_data,
+            text=None if form_data is not None or not text else text,
+        ))
+    return items
+
+
+def _parse_key_values(lines: Iterable[str]) -> Tuple[dict, List[str]]:
+    data, text = {}, []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if "=" in line:
+            key, value = line.split("=", 1)
+            data[key.strip()] = value.strip()
+        elif ":" in line and not line.startswith("http"):
+            key, value = line.split(":", 1)
+            data[key.strip()] = value.strip()
+        else:
+            text.append(line)
+    return data, text
+
+
+def parse_order_comment(comment: Optional[str]) -> ParsedComment:
+    """
+    Разбирает comment в старых форматах:
+    - гостевой: JSON {"guest_email", "guest_name", "items": [...]} + секция "Данные форм:";
+    - bulk: строки "[product_id] данные формы";
+    - ручной/одиночный: JSON-объект или строки key=value / key: value.
+    """
+    parsed = ParsedComment()
+    if not comment:
+        return parsed
+
+    comment = comment.replace("\r\n", "\n")
+    head, _, forms = comment.partition(f"\n\n{FORMS_SECTION}\n")
+    if not forms and head.startswith(FORMS_SECTION):
+        head, forms = "", head[len(FORMS_SECTION):]
+
+    try:
+        data = json.loads(head)
+    except ValueError:
+        data = None
+
+    if isinstance(data, dict) and isinstance(data.get("items"), list):
+        parsed.guest = {key: data.get(key) for key in GUEST_KEYS}
+        for item in data["items"]:
+            if not isinstance(item, dict):
+                continue
+            form_data = parse_form_data(item.get("comment"))
+            parsed.items.append(CommentItem(
+                product_id=item.get("product_id"),
+                product_name=item.get("product_name"),
+                amount=_decimal(item.get("amount")),
+                form_data=form_data,
+                text=item.get("comment") if form_data is None and item.get("comment") else None,
+            ))
+    elif isinstance(data, dict):
+        parsed.guest = {key: data[key] for key in GUEST_KEYS if key in data}
+        parsed.user_data = {key: value for key, value in data.items() if key not in GUEST_KEYS}
+    elif head:
+        lines = head.split("\n")
+        parsed.items = _parse_item_lines(lines)
+        if not parsed.items:
+            parsed.user_data, parsed.text = _parse_key_values(lines)
+
+    # Секция "Данные форм" дополняет позиции из JSON тем, чего в них не было
+    if forms:
+        by_product = {item.product_id: item for item in parsed.items}
+        for form_item in _parse_item_lines(forms.strip().split("\n")):
+            item = by_product.get(form_item.product_id)
+            if item is None:
+                parsed.items.append(form_item)
+            elif item.form_data is None and item.text is None:
+                item.form_data, item.text = form_item.form_data, form_item.text
+    return parsed
+
+
+def format_user_data(form_data: Iterable[Optional[dict]], text: Iterable[Optional[str]] = ()) -> str:
+    """Блок "Данные пользователя" для Telegram: заполненные поля форм, не больше USER_DATA_LIMIT строк"""
+    user_fields = []
+    for data in form_data:
+        for key, value in (data or {}).items():
+            if value:  # Показываем только заполненные поля
+                user_fields.append(f"• {key}: <code>{value}</code>")
+    user_fields.extend(f"• {line}" for line in text if line)
+
+    if not user_fields:
+        return ""
+    return "\n\n🔧 <b>Данные пользователя:</b>\n" + "\n".join(user_fields[:USER_DATA_LIMIT])
+
+
+def extract_user_data_from_comment(comment: str) -> str:
+    """Извлекает и форматирует пользовательские данные из комментария заказа (старый формат)"""
+    try:
+        parsed = parse_order_comment(comment)
+    except Exception as e:
+        logger.warning(f"Ошибка извлечения данных пользователя: {e}")
+        return ""
+
+    if parsed.items:
+        return format_user_data(
+            (item.form_data for item in parsed.items),
+            (item.text for item in parsed.items),
+        )
+    return format_user_data([parsed.user_data])
+
+
+def order_user_data(order) -> str:
+    """Данные пользователя заказа: из order_items, для заказов без позиций - из comment"""
+    items = order.items
+    if any(item.form_data for item in items):
+        return format_user_data(item.form_data for item in items)
+    return extract_user_data_from_comment(order.comment or "")
@@ -0,0 +1,134 @@
+# backend/app/services/order_events.py - СОБЫТИЯ СМЕНЫ СТАТУСА ЗАКАЗА ДЛЯ SSE
+import asyncio
+import json
+from typing import AsyncIterator, Dict, Optional, Set
+
+from loguru import logger
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.order import Order, OrderStatus
+from app.services.pubsub import order_channel, pubsub
+
+FINAL_STATUSES = {OrderStatus.done.value, OrderStatus.canceled.value}
+
+
+def order_status_event(order) -> dict:
+    status = order.status.value if hasattr(order.status, "value") else order.status
+    updated_at = order.updated_at or order.created_at
+    return {
+        "type": "status",
+        "order_id": order.id,
+        "status": status,
+        "updated_at": updated_at.isoformat() if updated_at else None,
+    }
+
+
+def publish_order_status(order):
+    """Публикует текущий статус заказа. Вызывать после db.commit() (из любого процесса)"""
+    pubsub.publish_sync(order_channel(order.id), order_status_event(order))
+    logger.debug(f"📡 Статус заказа #{order.id} опубликован: {order.status}")
+
+
+async def publish_order_status_async(order):
+    await pubsub.publish(order_channel(order.id), order_status_event(order))
+    logger.debug(f"📡 Статус заказа #{order.id} опубликован: {order.status}")
+
+
+async def publish_order_status_by_id(order_id: int):
+    """Перечитывает статус и публикует (когда объекта заказа под рукой нет)"""
+    event = await load_order_status(order_id)
+    if event is not None:
+        await pubsub.publish(order_channel(order_id), event)
+
+
+class OrderEventHub:
+    """
+    Подписчики SSE на заказы в этом процессе API.
+    Брокер доставляет событие во все процессы, каждый раздает его своим потокам.
+    """
+
+    def __init__(self, queue_size: int = 10):
+        self.queue_size = queue_size
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+
+    def subscribe(self, order_id: int) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(order_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, order_id: int, queue: asyncio.Queue):
+        queues = self._subscribers.get(order_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[order_id]
+
+    async def route(self, channel: str, message: dict):
+        """Сообщение из брокера -> очереди подписчиков заказа"""
+        try:
+            order_id = int(channel.split(":", 1)[1])
+        except ValueError:
+            return
+        for queue in list(self._subscribers.get(order_id, ())):
+            if queue.full():
+                # Клиенту важен только последний статус
+                queue.get_nowait()
+            queue.put_nowait(message)
+
+    def stats(self) -> dict:
+        return {
+            "orders": len(self._subscribers),
+            "streams": sum(len(queues) for queues in self._subscribers.values()),
+        }
+
+
+order_event_hub = OrderEventHub()
+pubsub.subscribe(order_channel("*"), order_event_hub.route)
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+async def load_order_status(order_id: int) -> Optional[dict]:
+    """Текущий статус без joinedload - только нужные колонки"""
+    async with AsyncSessionLocal() as db:
+        row = (await db.execute(
+            select(Order.id, Order.status, Order.updated_at, Order.created_at).where(Order.id == order_id)
+        )).first()
+    return order_status_event(row) if row else None
+
+
+async def order_status_stream(order_id: int, request, initial: dict) -> AsyncIterator[str]:
+    """
+    Поток SSE: текущий статус, затем переходы по мере коммитов.
+    Закрывается на финальном статусе или через ORDER_EVENTS_MAX_SECONDS
+    (EventSource сам переподключится и снова получит текущий статус).
+    """
+    queue = order_event_hub.subscribe(order_id)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.ORDER_EVENTS_MAX_SECONDS
+    try:
+        # Статус мог смениться между чтением и подпиской - перечитываем уже после подписки
+        current = await load_order_status(order_id) or initial
+        yield f"retry: {settings.ORDER_EVENTS_RETRY_MS}\n\n"
+        yield _sse("status", current)
+        if current["status"] in FINAL_STATUSES:
+            return
+
+        while loop.time() < deadline:
+            try:
+                message = await asyncio.wait_for(queue.get(), timeout=settings.ORDER_EVENTS_HEARTBEAT)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                yield ": keep-alive\n\n"
+                continue
+
+            yield _sse("status", message)
+            if message.get("status") in FINAL_STATUSES:
+                return
+    finally:
+        order_event_hub.unsubscribe(order_id, queue)
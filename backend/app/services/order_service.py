@@ -0,0 +1,414 @@
+# backend/app/services/order_service.py - СОЗДАНИЕ ЗАКАЗОВ: КОРЗИНА, ЦЕНЫ ИЗ КАТАЛОГА, ОДНА ТРАНЗАКЦИЯ
+import json
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional
+
+from loguru import logger
+from sqlalchemy.orm import Session, joinedload
+
+from app.models.game import Game
+from app.models.order import Order, OrderStatus, PaymentMethod
+from app.models.order_item import OrderItem
+from app.models.product import Product, ProductType
+from app.schemas.order import OrderRead
+from app.services.input_validation import MAX_REPORTED_ERRORS, input_field_validator
+from app.services.order_comments import parse_form_data
+from app.services.outbox import enqueue_email, enqueue_telegram
+from app.services.robokassa import payment_description, robokassa_service
+
+# Валюта, в которой хранятся цены каталога (Product.price_rub)
+CATALOG_CURRENCY = "RUB"
+
+
+class CartError(ValueError):
+    """Позиция корзины не соответствует каталогу (товар, игра или цена)"""
+
+
+@dataclass
+class CartLine:
+    item: object  # позиция запроса: game_id, product_id, amount, currency, comment, quantity
+    product: Product  # с загруженными game и subcategory_obj
+    quantity: Decimal
+    total: Decimal  # сумма позиции по каталогу
+
+    @property
+    def title(self) -> str:
+        subcategory = self.product.subcategory_name
+        return f"{self.product.name} ({subcategory})" if subcategory else self.product.name
+
+
+def load_cart_products(db: Session, product_ids: Iterable[int]) -> Dict[int, Product]:
+    """Все товары корзины вместе с играми и подкатегориями - один SELECT ... WHERE id IN (...)"""
+    ids = set(product_ids)
+    if not ids:
+        return {}
+    products = (
+        db.query(Product)
+        .options(joinedload(Product.game), joinedload(Product.subcategory_obj))
+        .filter(Product.id.in_(ids))
+        .all()
+    )
+    return {product.id: product for product in products}
+
+
+def _cart_quantity(product: Product, amount: Decimal) -> Decimal:
+    """
+    Количество по сумме позиции: сумма равна цене (одна единица) либо цене,
+    умноженной на целое количество в пределах min_amount..max_amount.
+    """
+    price = product.price_rub
+    if amount == price:
+        # Старые клиенты присылают цену одной единицы без количества
+        return Decimal(1)
+    if price is None or price <= 0:
+        raise CartError(f"Неверная сумма для товара #{product.id}")
+    quantity = amount / price
+    if quantity != quantity.to_integral_value():
+        raise CartError(f"Сумма {amount} не соответствует цене товара #{product.id} ({price} {CATALOG_CURRENCY})")
+    _check_quantity(product, quantity)
+    return quantity
+
+
+def _check_quantity(product: Product, quantity: Decimal):
+    min_amount = product.min_amount or 1
+    max_amount = product.max_amount or min_amount
+    if not (min_amount <= quantity <= max_amount):
+        raise CartError(f"Количество товара #{product.id} должно быть от {min_amount} до {max_amount}")
+
+
+def _split_quantity(product: Product, quantity: Decimal) -> List[Decimal]:
+    """
+    Количество из корзины по позициям не больше max_amount: старые корзины склеивали
+    повторные добавления товара в одну строку без ограничения. Делим поровну на
+    минимальное число позиций; если позиция выходит меньше min_amount - отклоняем.
+    """
+    min_amount = product.min_amount or 1
+    max_amount = product.max_amount or min_amount
+    if quantity <= max_amount:
+        _check_quantity(product, quantity)
+        return [quantity]
+    if quantity != quantity.to_integral_value():
+        raise CartError(f"Количество товара #{product.id} должно быть целым")
+    # min_amount/max_amount - Numeric, количество позиций и единицы - целые
+    count = -(-int(quantity) // max(int(max_amount), 1))
+    base, extra = divmod(int(quantity), count)
+    if base < min_amount:
+        raise CartError(
+            f"Количество товара #{product.id} ({quantity}) нельзя разбить на позиции "
+            f"от {min_amount} до {max_amount}"
+        )
+    parts = [Decimal(base + 1)] * extra + [Decimal(base)] * (count - extra)
+    _check_quantity(product, parts[0])
+    return parts
+
+
+def validate_cart(db: Session, items: List) -> List[CartLine]:
+    """
+    Проверяет корзину по каталогу в памяти после одного запроса товаров
+    и данные форм по полям ввода игры (схемы полей кэшируются).
+    Сумма позиции в рублях считается по каталогу: price_rub * quantity, если клиент
+    прислал количество (больше max_amount - несколькими позициями), иначе количество
+    выводится из присланной суммы.
+    """
+    products = load_cart_products(db, (item.product_id for item in items))
+    lines = []
+    for item in items:
+        product = products.get(item.product_id)
+        if product is None or product.is_deleted or not product.enabled:
+            raise CartError(f"Товар #{item.product_id} недоступен")
+        if product.game_id != item.game_id:
+            raise CartError(f"Товар #{item.product_id} не относится к игре #{item.game_id}")
+        if product.game is None or product.game.is_deleted or not product.game.enabled:
+            raise CartError(f"Игра #{item.game_id} недоступна")
+
+        if item.currency != CATALOG_CURRENCY:
+            # Цены каталога только в рублях: сумму в другой валюте проверить нечем
+            raise CartError(f"Валюта {item.currency} не поддерживается, цены каталога в {CATALOG_CURRENCY}")
+
+        requested = getattr(item, "quantity", None)
+        if requested is not None:
+            for quantity in _split_quantity(product, Decimal(requested)):
+                lines.append(CartLine(item=item, product=product, quantity=quantity,
+                                      total=product.price_rub * quantity))
+            continue
+        else:
+            quantity = _cart_quantity(product, Decimal(item.amount))
+            total = product.price_rub * quantity
+        lines.append(CartLine(item=item, product=product, quantity=quantity, total=total))
+
+    # Данные форм всех позиций - по скомпилированным полям ввода игр, за один проход
+    errors = input_field_validator.validate(db, [
+        (line.title, line.product.game_id, line.product.subcategory_id, parse_form_data(line.item.comment))
+        for line in lines
+    ])
+    if errors:
+        raise CartError("; ".join(errors[:MAX_REPORTED_ERRORS]))
+    return lines
+
+
+def _form_data(comment: Optional[str]) -> Optional[dict]:
+    """Данные формы позиции: JSON-объект из comment, иначе текст как есть"""
+    if not comment:
+        return None
+    form_data = parse_form_data(comment)
+    return form_data if form_data is not None else {"comment": comment}
+
+
+def _line_item(line: CartLine, position: int) -> OrderItem:
+    return OrderItem(
+        product_id=line.product.id,
+        position=position,
+        product_name=line.title,
+        quantity=int(line.quantity),
+        price=line.total / line.quantity,
+        amount=line.total,
+        currency=line.item.currency,
+        form_data=_form_data(line.item.comment),
+    )
+
+
+PAYMENT_METHOD_NAMES = {
+    PaymentMethod.sberbank: "Банковская карта",
+    PaymentMethod.sbp: "СБП",
+    PaymentMethod.ton: "TON",
+    PaymentMethod.usdt: "USDT TON",
+    PaymentMethod.manual: "Ручная оплата"
+}
+
+ROBOKASSA_METHODS = (PaymentMethod.sberbank, PaymentMethod.sbp)
+
+MANUAL_GAME_NAME = "Manual Orders"
+MANUAL_PRODUCT_NAME = "Manual Order Service"
+
+
+class OrderService:
+    """
+    Единое создание заказов для всех endpoint'ов.
+
+    Товары и игры загружаются одним запросом, сумма считается по каталогу, заказ и его
+    позиции вставляются при flush, ссылка на оплату дописывается одним UPDATE при коммите,
+    письма и уведомления уходят в outbox в той же транзакции. Ответ (OrderRead)
+    собирается из объектов в памяти до коммита - повторной загрузки заказа нет.
+    """
+
+    def _create(self, db: Session, *, user_id: Optional[int], game: Game, product: Product,
+                amount: Decimal, currency: str, payment_method: PaymentMethod,
+                comment: Optional[str], items: List[OrderItem], quantity: int = 1, **extra) -> Order:
+        order = Order(
+            user_id=user_id,
+            game_id=game.id,
+            product_id=product.id,
+            amount=amount,
+            currency=currency,
+            payment_method=payment_method,
+            comment=comment,
+            quantity=quantity,
+            status=OrderStatus.pending,
+            **extra
+        )
+        # Связи берем из уже загруженных объектов, чтобы ответ не требовал запросов
+        order.game = game
+        order.product = product
+        order.items = items
+        db.add(order)
+        db.flush()
+
+        if payment_method in ROBOKASSA_METHODS:
+            try:
+                order.payment_url = robokassa_service.create_payment_url(
+                    order_id=order.id,
+                    amount=amount,
+                    currency=currency,
+                    description=payment_description(order.id)
+                )
+            except Exception as e:
+                # Заказ остается, ссылку можно перевыпустить из админки
+                logger.error(f"❌ Не удалось создать ссылку на оплату заказа #{order.id}: {e}")
+        return order
+
+    @staticmethod
+    def _commit(db: Session, order: Order) -> OrderRead:
+        response = OrderRead.model_validate(order)
+        db.commit()
+        # После коммита объект заказа истек - логируем из ответа, без лишнего SELECT
+        logger.info(f"🛒 Заказ #{response.id} создан: {response.amount} {response.currency}, {response.payment_method}")
+        return response
+
+    def _create_from_cart(self, db: Session, lines: List[CartLine], user_id: Optional[int],
+                          comment: Optional[str]) -> Order:
+        first = lines[0]
+        return self._create(
+            db,
+            user_id=user_id,
+            game=first.product.game,
+            product=first.product,
+            amount=sum(line.total for line in lines),
+            currency=first.item.currency,
+            payment_method=first.item.payment_method,
+            comment=comment,
+            items=[_line_item(line, position) for position, line in enumerate(lines)],
+            quantity=int(first.quantity) if len(lines) == 1 else 1,
+        )
+
+    def create_order(self, db: Session, data, user) -> OrderRead:
+        """Один товар от авторизованного пользователя (POST /orders)"""
+        if data.game_id is None or data.product_id is None:
+            raise CartError("game_id и product_id обязательны")
+        lines = validate_cart(db, [data])
+        order = self._create_from_cart(db, lines, user.id, None)
+
+        if user.email:
+            enqueue_email(
+                db,
+                to=user.email,
+                subject="✅ Заказ создан | Donate Raid",
+                template="order_created.html",
+                context={
+                    "order_id": order.id,
+                    "amount": order.amount,
+                    "currency": order.currency,
+                    "username": user.username,
+                },
+            )
+        return self._commit(db, order)
+
+    def create_bulk_order(self, db: Session, items: List, user) -> OrderRead:
+        """Корзина авторизованного пользователя (POST /orders/bulk)"""
+        lines = validate_cart(db, items)
+        order = self._create_from_cart(db, lines, user.id, None)
+        return self._commit(db, order)
+
+    def create_guest_order(self, db: Session, items: List, guest_email: str,
+                           guest_name: Optional[str]) -> OrderRead:
+        """Корзина гостя (POST /orders/guest/bulk): письмо гостю и уведомление админам через outbox"""
+        lines = validate_cart(db, items)
+        # Позиции - в order_items, в comment остаются только контакты гостя
+        guest = json.dumps({"guest_email": guest_email, "guest_name": guest_name}, ensure_ascii=False)
+        order = self._create_from_cart(db, lines, None, guest)
+        method = order.payment_method
+
+        enqueue_email(
+            db,
+            to=guest_email,
+            subject=f"✅ Заказ #{order.id} создан | Donate Raid",
+            template="guest_order_created.html",
+            context={
+                "order_id": order.id,
+                "amount": order.amount,
+                "currency": order.currency,
+                "payment_method": PAYMENT_METHOD_NAMES.get(method, method.value),
+                "guest_email": guest_email,
+                "guest_name": guest_name,
+                "created_at": order.created_at.strftime("%d.%m.%Y %H:%M")
+            },
+        )
+
+        items_info = [
+            f"• {line.product.game.name} / {line.title} - {line.total} {line.item.currency}"
+            for line in lines
+        ]
+        enqueue_telegram(
+            db,
+            f"🛒 <b>Новый гостевой заказ #{order.id}</b>\n\n"
+            f"📧 Email: <code>{guest_email}</code>\n"
+            f"👤 Имя: {guest_name or 'Не указано'}\n"
+            f"💳 Способ оплаты: {method.value}\n"
+            f"💵 Общая сумма: <b>{order.amount} {order.currency}</b>\n\n"
+            f"📦 Товары:\n" + "\n".join(items_info),
+            keyboard="manual_order",
+            order_id=order.id
+        )
+        return self._commit(db, order)
+
+    def _manual_product(self, db: Session) -> Product:
+        """Системные игра и товар для ручных заказов (один запрос, создаются при первом заказе)"""
+        product = (
+            db.query(Product)
+            .join(Game, Product.game_id == Game.id)
+            .options(joinedload(Product.game))
+            .filter(Game.name == MANUAL_GAME_NAME, Product.name == MANUAL_PRODUCT_NAME)
+            .first()
+        )
+        if product:
+            return product
+
+        game = db.query(Game).filter_by(name=MANUAL_GAME_NAME).first()
+        if not game:
+            game = Game(
+                name=MANUAL_GAME_NAME,
+                banner_url="",
+                auto_support=False,
+                sort_order=999999,
+                enabled=False
+            )
+            db.add(game)
+            db.flush()
+            logger.info(f"🛠️ Создана системная игра для manual заказов с ID: {game.id}")
+
+        product = Product(
+            game_id=game.id,
+            name=MANUAL_PRODUCT_NAME,
+            price_rub=Decimal("0.00"),
+            type=ProductType.service,
+            description="Системный продукт для ручных заказов",
+            enabled=False,
+            delivery="manual",
+            sort_order=999999
+        )
+        product.game = game
+        db.add(product)
+        db.flush()
+        logger.info(f"🛠️ Создан системный продукт для manual заказов с ID: {product.id}")
+        return product
+
+    def create_manual_order(self, db: Session, data, user, user_data_section: str = "") -> OrderRead:
+        """
+        Ручная заявка (POST /orders/manual): цены в каталоге нет, сумму задает клиент,
+        заявку оценивает администратор. Уведомление админам - через outbox.
+        """
+        if not data.manual_game_name:
+            raise CartError("manual_game_name is required for manual orders")
+
+        # Заявку можно привязать к товару каталога, иначе - к системному товару
+        product = load_cart_products(db, [data.product_id]).get(data.product_id) if data.product_id else None
+        if product is None:
+            product = self._manual_product(db)
+        order = self._create(
+            db,
+            user_id=user.id,
+            game=product.game,
+            product=product,
+            amount=data.amount,
+            currency=data.currency,
+            payment_method=PaymentMethod.manual,
+            comment=data.comment,
+            items=[OrderItem(
+                product_id=product.id,
+                product_name=data.manual_game_name,
+                quantity=1,
+                price=data.amount,
+                amount=data.amount,
+                currency=data.currency,
+                form_data=parse_form_data(data.comment),
+            )],
+            manual_game_name=data.manual_game_name,
+            auto_processed=data.auto_processed,
+        )
+
+        enqueue_telegram(
+            db,
+            f"📥 <b>Новая ручная заявка #{order.id}</b>\n"
+            f"👤 <b>{user.username or 'No username'}</b> (ID: {user.id})\n"
+            f"🎮 Игра: <code>{data.manual_game_name}</code>\n"
+            f"💵 Сумма: {data.amount} {data.currency}\n"
+            f"📝 Комментарий: {data.comment or '-'}"
+            f"{user_data_section}",
+            keyboard="manual_order",
+            order_id=order.id
+        )
+        return self._commit(db, order)
+
+
+# Глобальный экземпляр сервиса
+order_service = OrderService()
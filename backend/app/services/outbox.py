@@ -0,0 +1,260 @@
+# backend/app/services/outbox.py - TRANSACTIONAL OUTBOX: ЗАПИСЬ СОБЫТИЙ И ИХ ОБРАБОТКА ВОРКЕРОМ
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from loguru import logger
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.order import Order
+from app.models.outbox import OutboxEvent, OutboxStatus
+
+OutboxHandler = Callable[[Session, dict], None]
+
+
+class OutboxRetry(Exception):
+    """Обработчик выполнил часть работы: повторить событие с обновленным payload (что уже сделано)"""
+
+    def __init__(self, message: str, payload: dict):
+        super().__init__(message)
+        self.payload = payload
+
+_handlers: Dict[str, OutboxHandler] = {}
+
+
+def outbox_handler(event_type: str):
+    """Регистрирует обработчик типа события"""
+
+    def decorator(func: OutboxHandler) -> OutboxHandler:
+        _handlers[event_type] = func
+        return func
+
+    return decorator
+
+
+def enqueue(db, event_type: str, payload: dict) -> OutboxEvent:
+    """
+    Добавляет событие в сессию БЕЗ коммита - оно сохранится вместе с изменением заказа.
+    Работает и с Session, и с AsyncSession. Decimal/datetime в payload превращаются в строки.
+    """
+    event = OutboxEvent(
+        event_type=event_type,
+        payload=json.loads(json.dumps(payload, ensure_ascii=False, default=str)),
+        status=OutboxStatus.pending,
+        attempts=0,
+        available_at=datetime.utcnow(),
+    )
+    db.add(event)
+    return event
+
+
+def enqueue_email(db, to: str, subject: str, template: str, context: dict) -> OutboxEvent:
+    """Письмо рендерится и отправляется воркером"""
+    return enqueue(db, "email.send", {
+        "to": to,
+        "subject": subject,
+        "template": template,
+        "context": context,
+    })
+
+
+def enqueue_telegram(db, text: str, keyboard: Optional[str] = None, order_id: Optional[int] = None) -> OutboxEvent:
+    """Уведомление админам. keyboard: None, "manual_order" или "paid_order" """
+    return enqueue(db, "telegram.notify", {
+        "text": text,
+        "keyboard": keyboard,
+        "order_id": order_id,
+    })
+
+
+def enqueue_referral(db, order_id: int) -> OutboxEvent:
+    return enqueue(db, "referral.credit", {"order_id": order_id})
+
+
+def enqueue_payment_received(db, order_id: int, provider: str, payment_event_id: Optional[int] = None) -> OutboxEvent:
+    """Одно событие об оплате - воркер сам раскладывает его на уведомления и письма"""
+    return enqueue(db, "payment.received", {
+        "order_id": order_id,
+        "provider": provider,
+        "payment_event_id": payment_event_id,
+    })
+
+
+# ------------------------------------------------------------
+# Обработчики событий
+# ------------------------------------------------------------
+@outbox_handler("email.send")
+def _handle_email(db: Session, payload: dict):
+    from app.services.mailer import send_email, render_template
+
+    html = render_template(payload["template"], payload.get("context") or {})
+    send_email(to=payload["to"], subject=payload["subject"], body=html)
+    logger.info(f"📧 Отправлено письмо на {payload['to']}: {payload['subject']}")
+
+
+@outbox_handler("telegram.notify")
+def _handle_telegram(db: Session, payload: dict):
+    from app.services.telegram import (
+        SEND_FAILED, SEND_OK, SEND_REJECTED, telegram_notifier, manual_order_keyboard, paid_order_keyboard,
+    )
+
+    if not telegram_notifier.enabled:
+        logger.warning("⚠️ Telegram не настроен - уведомление из outbox пропущено")
+        return
+
+    keyboards = {"manual_order": manual_order_keyboard, "paid_order": paid_order_keyboard}
+    markup = None
+    if payload.get("keyboard") in keyboards and payload.get("order_id"):
+        markup = keyboards[payload["keyboard"]](payload["order_id"])
+
+    # Повтор идет только в чаты, которые еще не получили сообщение и не отказали навсегда
+    delivered = set(payload.get("delivered") or [])
+    rejected = set(payload.get("rejected") or [])
+    results = telegram_notifier.deliver_blocking(payload["text"], reply_markup=markup, skip=delivered | rejected)
+    delivered |= {chat_id for chat_id, status in results.items() if status == SEND_OK}
+    newly_rejected = {chat_id for chat_id, status in results.items() if status == SEND_REJECTED}
+    if newly_rejected:
+        logger.error(f"❌ Telegram отклонил сообщение для чатов {', '.join(sorted(newly_rejected))} - без повтора")
+    rejected |= newly_rejected
+
+    failed = sorted(chat_id for chat_id, status in results.items() if status == SEND_FAILED)
+    if failed:
+        raise OutboxRetry(
+            f"Telegram: не доставлено в чаты {', '.join(failed)}",
+            payload={**payload, "delivered": sorted(delivered), "rejected": sorted(rejected)},
+        )
+
+
+@outbox_handler("referral.credit")
+def _handle_referral(db: Session, payload: dict):
+    from app.services.referral import ReferralService
+
+    order = db.query(Order).filter(Order.id == payload["order_id"]).first()
+    if not order:
+        logger.warning(f"⚠️ Заказ #{payload['order_id']} для реферальной выплаты не найден")
+        return
+    # Повтор безопасен: сервис не начисляет дважды за один заказ
+    ReferralService.process_referral_earning(db, order)
+
+
+@outbox_handler("payment.received")
+def _handle_payment_received(db: Session, payload: dict):
+    from app.services.payments import expand_payment_received
+
+    # Дочерние события пишутся в этой же транзакции и повторяются независимо
+    expand_payment_received(db, payload["order_id"], payload.get("provider", "robokassa"))
+
+
+# ------------------------------------------------------------
+# Воркер
+# ------------------------------------------------------------
+class OutboxWorker:
+    """
+    Забирает события пачками (FOR UPDATE SKIP LOCKED - несколько воркеров не
+    мешают друг другу), помечает их processing на время аренды и выполняет.
+    Ошибка - повтор с экспоненциальной задержкой, после OUTBOX_MAX_ATTEMPTS - failed.
+    Если воркер упал посреди обработки, событие вернется в работу после аренды.
+    """
+
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+        self.batch_size = settings.OUTBOX_BATCH_SIZE
+        self.poll_interval = settings.OUTBOX_POLL_INTERVAL
+        self.max_attempts = settings.OUTBOX_MAX_ATTEMPTS
+        self.lease = timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+        self._running = False
+
+    def backoff(self, attempts: int) -> timedelta:
+        delay = settings.OUTBOX_RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0))
+        return timedelta(seconds=min(delay, settings.OUTBOX_RETRY_MAX_SECONDS))
+
+    def claim_batch(self) -> List[int]:
+        """Берет в работу пачку готовых событий и возвращает их id"""
+        now = datetime.utcnow()
+        with self.session_factory() as db:
+            events = (
+                db.query(OutboxEvent)
+                .filter(
+                    or_(
+                        OutboxEvent.status == OutboxStatus.pending,
+                        OutboxEvent.status == OutboxStatus.processing,  # аренда истекла
+                    ),
+                    OutboxEvent.available_at <= now,
+                )
+                .order_by(OutboxEvent.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+                .all()
+            )
+            for event in events:
+                event.status = OutboxStatus.processing
+                event.attempts += 1
+                event.available_at = now + self.lease
+            db.commit()
+            return [event.id for event in events]
+
+    def process_event(self, event_id: int):
+        with self.session_factory() as db:
+            event = db.query(OutboxEvent).filter(OutboxEvent.id == event_id).first()
+            if not event or event.status != OutboxStatus.processing:
+                return
+
+            handler = _handlers.get(event.event_type)
+            try:
+                if handler is None:
+                    raise LookupError(f"Нет обработчика для события {event.event_type}")
+                handler(db, event.payload or {})
+            except Exception as e:
+                db.rollback()
+                event = db.query(OutboxEvent).filter(OutboxEvent.id == event_id).first()
+                event.last_error = f"{type(e).__name__}: {e}"[:2000]
+                if isinstance(e, OutboxRetry):
+                    event.payload = json.loads(json.dumps(e.payload, ensure_ascii=False, default=str))
+                if event.attempts >= self.max_attempts:
+                    event.status = OutboxStatus.failed
+                    logger.error(f"❌ Outbox #{event.id} ({event.event_type}) не выполнено после {event.attempts} попыток: {e}")
+                else:
+                    event.status = OutboxStatus.pending
+                    event.available_at = datetime.utcnow() + self.backoff(event.attempts)
+                    logger.warning(
+                        f"⚠️ Outbox #{event.id} ({event.event_type}) попытка {event.attempts} не удалась, "
+                        f"повтор после {event.available_at:%H:%M:%S}: {e}"
+                    )
+                db.commit()
+                return
+
+            event.status = OutboxStatus.done
+            event.processed_at = datetime.utcnow()
+            event.last_error = None
+            db.commit()
+            logger.info(f"✅ Outbox #{event.id} ({event.event_type}) выполнено")
+
+    def run_once(self) -> int:
+        event_ids = self.claim_batch()
+        for event_id in event_ids:
+            self.process_event(event_id)
+        return len(event_ids)
+
+    def run_forever(self):
+        self._running = True
+        logger.info(f"📤 Outbox воркер запущен (пачка {self.batch_size}, опрос каждые {self.poll_interval} с)")
+        while self._running:
+            try:
+                processed = self.run_once()
+            except Exception as e:
+                logger.exception(f"❌ Ошибка цикла outbox воркера: {e}")
+                processed = 0
+            # Пока очередь не пуста - забираем без паузы
+            if processed < self.batch_size:
+                time.sleep(self.poll_interval)
+
+    def stop(self):
+        self._running = False
+
+
+# Глобальный экземпляр воркера
+outbox_worker = OutboxWorker()
@@ -0,0 +1,186 @@
+# backend/app/services/payments.py - ПРИЕМ УВЕДОМЛЕНИЙ ОБ ОПЛАТЕ: ДЕДУПЛИКАЦИЯ, ПЕРЕХОД СТАТУСА, РАЗБОР В ВОРКЕРЕ
+from datetime import datetime
+from typing import Optional
+
+from loguru import logger
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+from app.core.database import dialect_insert
+from app.models.order import Order, OrderStatus
+from app.models.payment_event import PaymentEvent
+from app.services.order_comments import order_user_data
+
+PROVIDER_NAMES = {"robokassa": "RoboKassa"}
+
+# Результаты apply_payment_notification
+PAYMENT_APPLIED = "applied"
+PAYMENT_IGNORED = "ignored"
+PAYMENT_DUPLICATE = "duplicate"
+PAYMENT_ORDER_MISSING = "missing"
+
+
+async def record_payment_event(
+        db: AsyncSession,
+        provider: str,
+        inv_id: int,
+        out_sum: str,
+        signature: str,
+        payload: dict,
+) -> Optional[int]:
+    """
+    Записывает уведомление в payment_events в текущей транзакции (INSERT ... ON CONFLICT DO NOTHING).
+    Возвращает id записи или None, если такое уведомление уже было - повтор обрабатывать не нужно.
+    """
+    stmt = (
+        dialect_insert(db, PaymentEvent)
+        .values(
+            provider=provider,
+            inv_id=inv_id,
+            out_sum=out_sum,
+            signature=signature.upper(),
+            payload=payload,
+            received_at=datetime.utcnow(),
+        )
+        .on_conflict_do_nothing(index_elements=["provider", "inv_id", "out_sum", "signature"])
+        .returning(PaymentEvent.id)
+    )
+    event_id = (await db.execute(stmt)).scalar_one_or_none()
+    if event_id is None:
+        logger.info(f"🔁 Повторное уведомление {provider} по заказу #{inv_id} - пропускаем")
+    return event_id
+
+
+async def mark_order_paid(db: AsyncSession, order_id: int, transaction_id: str) -> bool:
+    """
+    pending -> processing одним условным UPDATE.
+    True только у того запроса, который действительно перевел заказ: параллельные
+    уведомления, ручная отмена в боте или повторы получат False и ничего не сделают.
+    """
+    result = await db.execute(
+        update(Order)
+        .where(Order.id == order_id, Order.status == OrderStatus.pending)
+        .values(
+            status=OrderStatus.processing,
+            transaction_id=transaction_id,
+            updated_at=datetime.utcnow(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+async def finish_payment_event(db: AsyncSession, event_id: int, result: str):
+    await db.execute(
+        update(PaymentEvent)
+        .where(PaymentEvent.id == event_id)
+        .values(result=result, processed_at=datetime.utcnow())
+    )
+
+
+async def apply_payment_notification(
+        db: AsyncSession,
+        provider: str,
+        order_id: int,
+        out_sum: str,
+        signature: str,
+        payload: dict,
+) -> str:
+    """
+    Общий переход для Result webhook и сверки: дедупликация -> pending -> processing -> событие outbox.
+    Без коммита. На PAYMENT_ORDER_MISSING вызывающий должен откатить транзакцию.
+    """
+    from app.services.outbox import enqueue_payment_received
+
+    # 1) Дедупликация: то же уведомление второй раз не обрабатываем
+    event_id = await record_payment_event(db, provider, order_id, out_sum, signature, payload)
+    if event_id is None:
+        return PAYMENT_DUPLICATE
+
+    # 2) pending -> processing условным UPDATE: выигрывает только один запрос
+    transaction_id = f"{provider}_{order_id}_{out_sum}"
+    if not await mark_order_paid(db, order_id, transaction_id):
+        order_exists = (await db.execute(select(Order.id).where(Order.id == order_id))).first()
+        if not order_exists:
+            return PAYMENT_ORDER_MISSING
+        await finish_payment_event(db, event_id, PAYMENT_IGNORED)
+        return PAYMENT_IGNORED
+
+    # 3) Уведомления и письма разворачивает воркер из одного события outbox
+    enqueue_payment_received(db, order_id, provider=provider, payment_event_id=event_id)
+    await finish_payment_event(db, event_id, PAYMENT_APPLIED)
+    return PAYMENT_APPLIED
+
+
+def expand_payment_received(db: Session, order_id: int, provider: str = "robokassa"):
+    """
+    Обработчик outbox "payment.received": раскладывает оплату на уведомление
+    админам, письмо покупателю и реферальную выплату (без коммита - коммитит воркер).
+    """
+    from app.services.outbox import enqueue_email, enqueue_referral, enqueue_telegram
+
+    order = (
+        db.query(Order)
+        .options(
+            joinedload(Order.user),
+            joinedload(Order.game),
+            joinedload(Order.product),
+            selectinload(Order.items),
+        )
+        .filter(Order.id == order_id)
+        .first()
+    )
+    if not order:
+        logger.warning(f"⚠️ Оплаченный заказ #{order_id} не найден - уведомления не отправлены")
+        return
+
+    user_info = "👤 Гость"
+    if order.user:
+        user_info = f"👤 {order.user.username or 'Без имени'}"
+        if order.user.email:
+            user_info += f" ({order.user.email})"
+        user_info += f" [ID: {order.user.id}]"
+
+    game_info = f"🎮 {order.game.name}" if order.game else "🎮 Неизвестная игра"
+    product_info = f"📦 {order.product.name}" if order.product else "📦 Неизвестный товар"
+
+    # Данные форм - из позиций заказа (старые заказы без позиций - из comment)
+    user_data_info = order_user_data(order)
+
+    enqueue_telegram(
+        db,
+        f"💰 <b>Успешная оплата через {PROVIDER_NAMES.get(provider, provider)}!</b>\n\n"
+        f"🔢 Заказ: <code>#{order.id}</code>\n"
+        f"{user_info}\n"
+        f"{game_info}\n"
+        f"{product_info}\n"
+        f"💵 Сумма: <b>{order.amount} {order.currency}</b>\n"
+        f"💳 Способ: {PROVIDER_NAMES.get(provider, provider)}\n"
+        f"🆔 Транзакция: <code>{order.transaction_id}</code>"
+        f"{user_data_info}",
+        keyboard="paid_order",
+        order_id=order.id
+    )
+
+    # Отправляем email пользователю если есть
+    if order.user and order.user.email:
+        enqueue_email(
+            db,
+            to=order.user.email,
+            subject="💳 Заказ оплачен | Donate Raid",
+            template="order_paid.html",
+            context={
+                "order_id": order.id,
+                "amount": order.amount,
+                "currency": order.currency,
+                "username": order.user.username,
+                "transaction_id": order.transaction_id
+            },
+        )
+
+    # Начисление рефереру - отдельным событием, чтобы его повторы не дублировали уведомления
+    if order.user_id:
+        enqueue_referral(db, order.id)
+
+    logger.info(f"💰 Оплата заказа #{order.id} разложена на уведомления")
@@ -0,0 +1,554 @@
+# backend/app/services/product_import.py - МАССОВЫЙ ИМПОРТ/ЭКСПОРТ ТОВАРОВ И ИЗМЕНЕНИЕ ЦЕН
+import codecs
+import csv
+import io
+import json
+from dataclasses import asdict, dataclass, field
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from enum import Enum
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.game import Game
+from app.models.game_subcategory import GameSubcategory
+from app.models.product import Product, ProductType
+from app.services.catalog import catalog_service
+
+FORMATS = ("csv", "json")
+CENT = Decimal("0.01")
+MONEY_LIMIT = Decimal("100000000")  # Numeric(10, 2): не больше 99999999.99
+INT_MIN, INT_MAX = -2 ** 31, 2 ** 31 - 1  # Integer в PostgreSQL
+
+_TRUE = {"1", "true", "yes", "y", "да", "+"}
+_FALSE = {"0", "false", "no", "n", "нет", "-"}
+
+
+class ProductImportError(ValueError):
+    """Строка файла или параметры массовой операции не прошли проверку"""
+
+
+def _parse_int(value) -> int:
+    if isinstance(value, bool):
+        raise ValueError("ожидается целое число")
+    number = value if isinstance(value, int) else int(str(value).strip())
+    if not INT_MIN <= number <= INT_MAX:
+        raise ValueError("число вне диапазона")
+    return number
+
+
+def _parse_money(value) -> Decimal:
+    try:
+        money = Decimal(str(value).strip().replace(",", "."))
+    except InvalidOperation:
+        raise ValueError("ожидается сумма")
+    if not money.is_finite():
+        raise ValueError("ожидается сумма")
+    if money < 0:
+        raise ValueError("сумма не может быть отрицательной")
+    if money >= MONEY_LIMIT:
+        raise ValueError(f"сумма должна быть меньше {MONEY_LIMIT}")
+    return money.copy_abs().quantize(CENT)  # "-0" -> 0.00
+
+
+def _parse_bool(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    raise ValueError("ожидается true/false")
+
+
+def _parse_type(value) -> ProductType:
+    try:
+        return ProductType(str(value).strip())
+    except ValueError:
+        raise ValueError(f"допустимо: {', '.join(t.value for t in ProductType)}")
+
+
+def _parse_str(max_length: int):
+    def parse(value) -> str:
+        text = str(value).strip()
+        if len(text) > max_length:
+            raise ValueError(f"максимум {max_length} символов")
+        return text
+    return parse
+
+
+# колонка -> (парсер, пустое значение = NULL; иначе пустая ячейка не меняет поле)
+COLUMNS = {
+    "game_id": (_parse_int, False),
+    "name": (_parse_str(100), False),
+    "type": (_parse_type, False),
+    "price_rub": (_parse_money, False),
+    "old_price_rub": (_parse_money, True),
+    "min_amount": (_parse_money, False),
+    "max_amount": (_parse_money, False),
+    "sort_order": (_parse_int, False),
+    "subcategory_id": (_parse_int, True),
+    "enabled": (_parse_bool, False),
+    "delivery": (_parse_str(20), False),
+}
+EXPORT_COLUMNS = ("id",) + tuple(COLUMNS)
+REQUIRED_FOR_CREATE = ("game_id", "name", "type", "price_rub")
+CREATE_DEFAULTS = {
+    "old_price_rub": None,
+    "min_amount": Decimal("1.00"),
+    "max_amount": Decimal("1.00"),
+    "sort_order": 0,
+    "subcategory_id": None,
+    "enabled": True,
+    "delivery": "auto",
+}
+
+
+def _plain(value):
+    """Значение для отчета и экспорта: Decimal и Enum - строками"""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def parse_row(raw: dict) -> Tuple[Optional[int], dict]:
+    """(id или None для нового товара, значения переданных колонок); неизвестные колонки игнорируются"""
+    product_id = raw.get("id")
+    if product_id is not None and str(product_id).strip() != "":
+        try:
+            product_id = _parse_int(product_id)
+        except ValueError:
+            raise ProductImportError("id: ожидается целое число")
+    else:
+        product_id = None
+
+    values = {}
+    for column, (parse, nullable) in COLUMNS.items():
+        if column not in raw:
+            continue
+        value = raw[column]
+        if value is None or (isinstance(value, str) and not value.strip()):
+            if nullable:
+                values[column] = None
+            continue
+        try:
+            values[column] = parse(value)
+        except ValueError as e:
+            raise ProductImportError(f"{column}: {e}")
+    return product_id, values
+
+
+# ------------------------------------------------------------
+# Чтение файлов импорта
+# ------------------------------------------------------------
+def iter_csv_rows(stream: BinaryIO) -> Iterator[Tuple[int, dict]]:
+    """Построчно читает CSV (UTF-8, разделитель ',' или ';' как у Excel) -> (номер строки, данные)"""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    header_line = text.readline()
+    if not header_line.strip():
+        raise ProductImportError("Пустой файл")
+    delimiter = ";" if header_line.count(";") > header_line.count(",") else ","
+    header = [name.strip() for name in next(csv.reader([header_line], delimiter=delimiter))]
+
+    reader = csv.DictReader(text, fieldnames=header, delimiter=delimiter)
+    for row in reader:
+        # Короткие строки дают None - такие колонки считаем непереданными
+        data = {key: value for key, value in row.items() if key is not None and value is not None}
+        if any(str(value).strip() for value in data.values()):
+            yield reader.line_num + 1, data
+
+
+def iter_json_rows(stream: BinaryIO) -> Iterator[Tuple[int, dict]]:
+    """JSON-массив товаров или {"products": [...]} -> (номер элемента, данные)"""
+    try:
+        data = json.load(codecs.getreader("utf-8-sig")(stream))
+    except ValueError as e:
+        raise ProductImportError(f"Неверный JSON: {e}")
+    if isinstance(data, dict):
+        data = data.get("products")
+    if not isinstance(data, list):
+        raise ProductImportError("Ожидается массив товаров или {\"products\": [...]}")
+    for number, row in enumerate(data, start=1):
+        yield number, row if isinstance(row, dict) else {"__invalid__": row}
+
+
+def iter_import_rows(stream: BinaryIO, fmt: str) -> Iterator[Tuple[int, dict]]:
+    if fmt == "csv":
+        return iter_csv_rows(stream)
+    if fmt == "json":
+        return iter_json_rows(stream)
+    raise ProductImportError(f"Неизвестный формат {fmt}, допустимо: {', '.join(FORMATS)}")
+
+
+# ------------------------------------------------------------
+# Импорт
+# ------------------------------------------------------------
+@dataclass
+class ImportReport:
+    dry_run: bool
+    rows: int = 0
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    failed: int = 0
+    chunks_committed: int = 0
+    truncated: bool = False  # changes/errors обрезаны до PRODUCT_IMPORT_REPORT_LIMIT
+    error: Optional[str] = None  # файл не дочитан; применено то, что в chunks_committed
+    changes: List[dict] = field(default_factory=list)
+    errors: List[dict] = field(default_factory=list)
+
+    def add_change(self, entry: dict, limit: int):
+        if len(self.changes) < limit:
+            self.changes.append(entry)
+        else:
+            self.truncated = True
+
+    def add_error(self, row: int, product_id: Optional[int], error: str, limit: int):
+        self.failed += 1
+        if len(self.errors) < limit:
+            self.errors.append({"row": row, "id": product_id, "error": error})
+        else:
+            self.truncated = True
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass
+class _ChunkPlan:
+    creates: List[dict] = field(default_factory=list)
+    updates: List[dict] = field(default_factory=list)
+    changes: List[dict] = field(default_factory=list)
+    unchanged: int = 0
+
+
+class ProductImporter:
+    """
+    Импорт товаров пачками: каждая пачка - один запрос существующих товаров,
+    один запрос игр/подкатегорий, executemany INSERT/UPDATE и своя транзакция.
+    Строки с ошибками пропускаются и попадают в отчет, остальные применяются.
+    В режиме dry_run строится тот же отчет без записи в базу.
+    """
+
+    def __init__(self, chunk_size: int = 500, report_limit: int = 1000, max_rows: int = 50000):
+        self.chunk_size = chunk_size
+        self.report_limit = report_limit
+        self.max_rows = max_rows
+
+    def run(self, db: Session, rows: Iterable[Tuple[int, dict]], dry_run: bool = False) -> ImportReport:
+        report = ImportReport(dry_run=dry_run)
+        seen_ids = set()
+        chunk = []
+        try:
+            for number, raw in rows:
+                if report.rows >= self.max_rows:
+                    report.add_error(number, None, f"превышен лимит {self.max_rows} строк, остаток файла пропущен", self.report_limit)
+                    break
+                report.rows += 1
+                chunk.append((number, raw))
+                if len(chunk) >= self.chunk_size:
+                    self._process(db, chunk, report, seen_ids)
+                    chunk = []
+            if chunk:
+                self._process(db, chunk, report, seen_ids)
+        except (ProductImportError, UnicodeDecodeError, csv.Error) as e:
+            # Файл сломан посередине: уже записанные пачки остаются, админ видит отчет по ним
+            report.error = f"Файл прочитан не до конца (после строки {report.rows}): {e}"
+            for number, _ in chunk:
+                report.add_error(number, None, "строка не применена: чтение файла прервано", self.report_limit)
+        finally:
+            if report.chunks_committed:
+                catalog_service.invalidate(f"import: +{report.created} ~{report.updated}")
+
+        logger.info(
+            f"📦 Импорт товаров{' (dry run)' if dry_run else ''}: строк {report.rows}, "
+            f"новых {report.created}, изменено {report.updated}, без изменений {report.unchanged}, ошибок {report.failed}"
+            + (f", прерван: {report.error}" if report.error else "")
+        )
+        return report
+
+    def _process(self, db: Session, chunk: List[Tuple[int, dict]], report: ImportReport, seen_ids: set):
+        plan = self._plan(db, chunk, report, seen_ids)
+        if not report.dry_run and (plan.creates or plan.updates):
+            try:
+                if plan.updates:
+                    # ORM bulk UPDATE по первичному ключу -> executemany
+                    db.execute(update(Product), plan.updates)
+                if plan.creates:
+                    db.execute(insert(Product), plan.creates)
+                db.commit()
+            except SQLAlchemyError as e:
+                db.rollback()
+                logger.error(f"❌ Импорт товаров: пачка строк {chunk[0][0]}-{chunk[-1][0]} не записана: {e}")
+                for entry in plan.changes:
+                    report.add_error(entry["row"], entry["id"], "ошибка записи пачки, строка не применена", self.report_limit)
+                report.unchanged += plan.unchanged
+                return
+            report.chunks_committed += 1
+
+        report.created += len(plan.creates)
+        report.updated += len(plan.updates)
+        report.unchanged += plan.unchanged
+        for entry in plan.changes:
+            report.add_change(entry, self.report_limit)
+
+    def _plan(self, db: Session, chunk: List[Tuple[int, dict]], report: ImportReport, seen_ids: set) -> _ChunkPlan:
+        parsed = []
+        for number, raw in chunk:
+            try:
+                if "__invalid__" in raw:
+                    raise ProductImportError("элемент должен быть объектом")
+                product_id, values = parse_row(raw)
+            except ProductImportError as e:
+                report.add_error(number, None, str(e), self.report_limit)
+                continue
+            if product_id is not None:
+                if product_id in seen_ids:
+                    report.add_error(number, product_id, "id повторяется в файле", self.report_limit)
+                    continue
+                seen_ids.add(product_id)
+            parsed.append((number, product_id, values))
+
+        table = Product.__table__
+        ids = {product_id for _, product_id, _ in parsed if product_id is not None}
+        existing = {}
+        if ids:
+            rows = db.execute(
+                select(table.c.id, *(table.c[column] for column in COLUMNS))
+                .where(table.c.id.in_(ids), table.c.is_deleted == False)
+            )
+            existing = {row.id: dict(row._mapping) for row in rows}
+
+        # Итоговые game_id/subcategory_id строк проверяем двумя запросами на пачку
+        game_ids, subcategory_ids = set(), set()
+        for _, product_id, values in parsed:
+            current = existing.get(product_id, {})
+            game_ids.add(values.get("game_id", current.get("game_id")))
+            subcategory_ids.add(values.get("subcategory_id", current.get("subcategory_id")))
+        game_ids.discard(None)
+        subcategory_ids.discard(None)
+        known_games = set(db.scalars(select(Game.id).where(Game.id.in_(game_ids)))) if game_ids else set()
+        subcategory_games = dict(
+            db.execute(select(GameSubcategory.id, GameSubcategory.game_id).where(GameSubcategory.id.in_(subcategory_ids)))
+            .all()
+        ) if subcategory_ids else {}
+
+        plan = _ChunkPlan()
+        for number, product_id, values in parsed:
+            if product_id is not None:
+                current = existing.get(product_id)
+                if current is None:
+                    report.add_error(number, product_id, f"товар #{product_id} не найден", self.report_limit)
+                    continue
+                merged = {**current, **values}
+            else:
+                missing = [column for column in REQUIRED_FOR_CREATE if values.get(column) is None]
+                if missing:
+                    report.add_error(number, None, f"для нового товара нужны колонки: {', '.join(missing)}", self.report_limit)
+                    continue
+                current = {}
+                merged = {**CREATE_DEFAULTS, **values}
+
+            if merged["game_id"] not in known_games:
+                report.add_error(number, product_id, f"игра #{merged['game_id']} не найдена", self.report_limit)
+                continue
+            subcategory_id = merged["subcategory_id"]
+            if subcategory_id is not None and subcategory_games.get(subcategory_id) != merged["game_id"]:
+                report.add_error(number, product_id, f"подкатегория #{subcategory_id} не относится к игре #{merged['game_id']}", self.report_limit)
+                continue
+            # Цену проверяем, только если строка ее задает: системный товар ручных заказов стоит 0
+            if (product_id is None or "price_rub" in values) and (merged["price_rub"] is None or merged["price_rub"] <= 0):
+                report.add_error(number, product_id, "цена price_rub должна быть больше 0", self.report_limit)
+                continue
+            min_amount, max_amount = merged["min_amount"], merged["max_amount"]
+            if min_amount is not None and max_amount is not None and min_amount > max_amount:
+                report.add_error(number, product_id, f"min_amount ({min_amount}) больше max_amount ({max_amount})", self.report_limit)
+                continue
+
+            if product_id is None:
+                plan.creates.append(merged)
+                plan.changes.append({
+                    "row": number, "id": None, "action": "create",
+                    "fields": {column: [None, _plain(value)] for column, value in merged.items()},
+                })
+                continue
+
+            changed = {column: value for column, value in values.items() if value != current[column]}
+            if not changed:
+                plan.unchanged += 1
+                continue
+            plan.updates.append({"id": product_id, **changed})
+            plan.changes.append({
+                "row": number, "id": product_id, "action": "update",
+                "fields": {column: [_plain(current[column]), _plain(value)] for column, value in changed.items()},
+            })
+        return plan
+
+
+# ------------------------------------------------------------
+# Экспорт
+# ------------------------------------------------------------
+def _export_query(game_id: Optional[int]):
+    table = Product.__table__
+    query = select(*(table.c[column] for column in EXPORT_COLUMNS)).where(table.c.is_deleted == False)
+    if game_id:
+        query = query.where(table.c.game_id == game_id)
+    return query.order_by(table.c.game_id, table.c.sort_order, table.c.id)
+
+
+def iter_export_chunks(game_id: Optional[int] = None, chunk_size: int = 500) -> Iterator[List[dict]]:
+    """
+    Товары пачками через yield_per (на PostgreSQL - серверный курсор).
+    Сессия своя: зависимость get_db закрывается раньше, чем StreamingResponse дочитает генератор.
+    """
+    db = SessionLocal()
+    try:
+        result = db.execute(_export_query(game_id).execution_options(yield_per=chunk_size))
+        for partition in result.partitions():
+            yield [{column: _plain(value) for column, value in row._mapping.items()} for row in partition]
+    finally:
+        db.close()
+
+
+def stream_products_csv(game_id: Optional[int] = None, chunk_size: int = 500) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    for rows in iter_export_chunks(game_id, chunk_size):
+        for row in rows:
+            if isinstance(row["enabled"], bool):
+                row["enabled"] = "true" if row["enabled"] else "false"
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    yield buffer.getvalue()
+
+
+def stream_products_json(game_id: Optional[int] = None, chunk_size: int = 500) -> Iterator[str]:
+    yield "["
+    first = True
+    for rows in iter_export_chunks(game_id, chunk_size):
+        parts = []
+        for row in rows:
+            parts.append(("\n" if first else ",\n") + json.dumps(row, ensure_ascii=False))
+            first = False
+        yield "".join(parts)
+    yield "\n]\n"
+
+
+# ------------------------------------------------------------
+# Массовое изменение цен
+# ------------------------------------------------------------
+OLD_PRICE_MODES = ("keep", "previous", "clear")
+
+
+def _round_price(value: Decimal, step: Decimal) -> Decimal:
+    return ((value / step).quantize(Decimal(1), rounding=ROUND_HALF_UP) * step).quantize(CENT)
+
+
+def bulk_update_prices(
+        db: Session,
+        percent: Decimal,
+        game_id: Optional[int] = None,
+        subcategory_id: Optional[int] = None,
+        product_ids: Optional[List[int]] = None,
+        round_to: Decimal = Decimal("1"),
+        old_price: str = "keep",
+        dry_run: bool = False,
+        chunk_size: int = 500,
+        report_limit: int = 1000,
+) -> dict:
+    """
+    Меняет price_rub на percent процентов с округлением до шага round_to.
+    old_price: keep - не трогать, previous - старая цена = цена до изменения, clear - убрать старую цену.
+    Запись - executemany UPDATE по id пачками, по транзакции на пачку.
+    """
+    if not (game_id or subcategory_id or product_ids):
+        raise ProductImportError("Укажите game_id, subcategory_id или product_ids")
+    if percent <= -100:
+        raise ProductImportError("percent должен быть больше -100")
+    if round_to <= 0:
+        raise ProductImportError("round_to должен быть больше 0")
+    if old_price not in OLD_PRICE_MODES:
+        raise ProductImportError(f"old_price: допустимо {', '.join(OLD_PRICE_MODES)}")
+
+    table = Product.__table__
+    query = select(table.c.id, table.c.name, table.c.price_rub, table.c.old_price_rub).where(table.c.is_deleted == False)
+    if game_id:
+        query = query.where(table.c.game_id == game_id)
+    if subcategory_id:
+        query = query.where(table.c.subcategory_id == subcategory_id)
+    if product_ids:
+        query = query.where(table.c.id.in_(product_ids))
+
+    factor = (Decimal(100) + percent) / Decimal(100)
+    matched, updates, changes = 0, [], []
+    for row in db.execute(query.order_by(table.c.id)):
+        matched += 1
+        new_price = max(_round_price(row.price_rub * factor, round_to), CENT)
+        if new_price >= MONEY_LIMIT:
+            raise ProductImportError(f"Товар #{row.id}: новая цена {new_price} не помещается в Numeric(10, 2)")
+        new_old_price = {
+            "keep": row.old_price_rub,
+            "previous": row.price_rub,
+            "clear": None,
+        }[old_price]
+        if new_price == row.price_rub and new_old_price == row.old_price_rub:
+            continue
+        updates.append({"id": row.id, "price_rub": new_price, "old_price_rub": new_old_price})
+        if len(changes) < report_limit:
+            changes.append({
+                "id": row.id,
+                "name": row.name,
+                "price_rub": [_plain(row.price_rub), _plain(new_price)],
+                "old_price_rub": [_plain(row.old_price_rub), _plain(new_old_price)],
+            })
+
+    chunks_committed, applied, error = 0, 0, None
+    if not dry_run and updates:
+        try:
+            for start in range(0, len(updates), chunk_size):
+                chunk = updates[start:start + chunk_size]
+                db.execute(update(Product), chunk)
+                db.commit()
+                chunks_committed += 1
+                applied += len(chunk)
+        except SQLAlchemyError as e:
+            db.rollback()
+            error = f"Записано {applied} из {len(updates)} товаров, остальные не изменены: {e}"
+            logger.error(f"❌ Массовое изменение цен прервано: {error}")
+        finally:
+            if chunks_committed:
+                catalog_service.invalidate(f"prices {percent:+}%: {applied} products")
+    else:
+        applied = len(updates)
+
+    logger.info(
+        f"💸 Массовое изменение цен{' (dry run)' if dry_run else ''} {percent:+}%: "
+        f"подходит {matched}, изменено {applied}"
+    )
+    return {
+        "dry_run": dry_run,
+        "matched": matched,
+        "updated": applied,
+        "chunks_committed": chunks_committed,
+        "truncated": len(updates) > len(changes),
+        "changes": changes,
+        "error": error,
+    }
+
+
+product_importer = ProductImporter(
+    chunk_size=settings.PRODUCT_IMPORT_CHUNK_SIZE,
+    report_limit=settings.PRODUCT_IMPORT_REPORT_LIMIT,
+    max_rows=settings.PRODUCT_IMPORT_MAX_ROWS,
+)
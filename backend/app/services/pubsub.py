@@ -0,0 +1,149 @@
+# backend/app/services/pubsub.py - PUB/SUB МЕЖДУ ПРОЦЕССАМИ (API, БОТ, ВОРКЕР) ЧЕРЕЗ REDIS
+import asyncio
+import fnmatch
+import json
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from loguru import logger
+
+from app.core.config import settings
+
+MessageHandler = Callable[[str, dict], Awaitable[None]]
+
+
+def support_room_channel(room_id: str) -> str:
+    return f"support:room:{room_id}"
+
+
+def order_channel(order_id) -> str:
+    return f"order:{order_id}"
+
+
+class PubSub:
+    """
+    Шина событий между процессами.
+
+    С REDIS_URL публикация идет в Redis, а API подписывается на каналы по шаблону
+    и раздает сообщения своим WebSocket клиентам. Без REDIS_URL работает
+    локальный режим: сообщения доходят только до подписчиков этого же процесса
+    (годится для разработки с одним процессом, но не для бота в отдельном контейнере).
+    """
+
+    def __init__(self, url: Optional[str] = None):
+        self.url = url
+        self._sync_client = None
+        self._subscriptions: List[Tuple[str, MessageHandler]] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._listener: Optional[asyncio.Task] = None
+
+    @property
+    def is_distributed(self) -> bool:
+        return bool(self.url)
+
+    @staticmethod
+    def _encode(message: dict) -> str:
+        return json.dumps(message, ensure_ascii=False, default=str)
+
+    def _get_sync_client(self):
+        if self._sync_client is None:
+            import redis
+            self._sync_client = redis.Redis.from_url(self.url, socket_timeout=5, health_check_interval=30)
+        return self._sync_client
+
+    # --- Публикация ---
+    def publish_sync(self, channel: str, message: dict):
+        """Публикация из синхронного кода (роутеры, воркер, любой поток)"""
+        data = self._encode(message)
+        if self.is_distributed:
+            try:
+                self._get_sync_client().publish(channel, data)
+            except Exception as e:
+                logger.error(f"❌ Ошибка публикации в {channel}: {e}")
+            return
+
+        if self._loop is not None and self._loop.is_running():
+            asyncio.run_coroutine_threadsafe(self._dispatch(channel, data), self._loop)
+
+    async def publish(self, channel: str, message: dict):
+        """Публикация из async кода любого event loop"""
+        if self.is_distributed:
+            await asyncio.to_thread(self.publish_sync, channel, message)
+            return
+
+        data = self._encode(message)
+        if self._loop is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            await self._dispatch(channel, data)
+        else:
+            asyncio.run_coroutine_threadsafe(self._dispatch(channel, data), self._loop)
+
+    # --- Подписка ---
+    def subscribe(self, pattern: str, handler: MessageHandler):
+        """Регистрирует обработчик для каналов по glob-шаблону (до start_listener)"""
+        self._subscriptions.append((pattern, handler))
+
+    async def _dispatch(self, channel: str, data: str):
+        try:
+            message = json.loads(data)
+        except ValueError:
+            logger.warning(f"⚠️ Некорректное сообщение в {channel}: {data[:200]}")
+            return
+
+        for pattern, handler in self._subscriptions:
+            if fnmatch.fnmatchcase(channel, pattern):
+                try:
+                    await handler(channel, message)
+                except Exception as e:
+                    logger.error(f"❌ Ошибка обработчика {pattern} для {channel}: {e}")
+
+    async def start_listener(self):
+        """Запускается на старте API в его event loop"""
+        self._loop = asyncio.get_running_loop()
+        if not self.is_distributed:
+            logger.warning("⚠️ REDIS_URL не задан - pub/sub работает только внутри процесса")
+            return
+        if self._listener is None or self._listener.done():
+            self._listener = self._loop.create_task(self._listen())
+
+    async def _listen(self):
+        import redis.asyncio as aioredis
+
+        patterns = sorted({pattern for pattern, _ in self._subscriptions})
+        delay = 1
+        while True:
+            client = aioredis.from_url(self.url, health_check_interval=30)
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.psubscribe(*patterns)
+                logger.info(f"📡 Подписка на Redis каналы: {', '.join(patterns)}")
+                delay = 1
+                async for item in pubsub.listen():
+                    channel = item["channel"].decode() if isinstance(item["channel"], bytes) else item["channel"]
+                    data = item["data"].decode() if isinstance(item["data"], bytes) else item["data"]
+                    await self._dispatch(channel, data)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Потеряно соединение с Redis pub/sub: {e}, переподключение через {delay} с")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+            finally:
+                try:
+                    await pubsub.aclose()
+                    await client.aclose()
+                except Exception:
+                    pass
+
+    async def stop_listener(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+
+
+# Глобальный экземпляр
+pubsub = PubSub(settings.REDIS_URL)
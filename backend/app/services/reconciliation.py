@@ -0,0 +1,145 @@
+# backend/app/services/reconciliation.py - СВЕРКА ЗАВИСШИХ PENDING ЗАКАЗОВ С ROBOKASSA (OpStateExt)
+import asyncio
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+from loguru import logger
+from sqlalchemy import select
+
+from app.core.background_loop import BackgroundLoop
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.order import Order, OrderStatus, PaymentMethod
+from app.services.order_events import publish_order_status_by_id
+from app.services.payments import PAYMENT_APPLIED, PAYMENT_ORDER_MISSING, apply_payment_notification
+from app.services.robokassa import OperationState, robokassa_service
+
+ROBOKASSA_METHODS = (PaymentMethod.sberbank, PaymentMethod.sbp)
+
+# Подпись в payment_events для оплат, найденных сверкой: Result webhook с настоящей
+# подписью запишется отдельно и упрется в условный UPDATE
+RECONCILE_SIGNATURE = "opstate"
+
+
+class PaymentReconciler:
+    """
+    Находит pending заказы RoboKassa, по которым не дошел Result, и спрашивает у шлюза
+    состояние счета. Заказы выбираются пачками по id, запросы идут параллельно под
+    семафором, оплаченные проводятся тем же переходом, что и webhook.
+    """
+
+    def __init__(self):
+        self._loop = BackgroundLoop("payment-reconcile")
+
+    async def _load_batch(self, after_id: int, now: datetime) -> List[Tuple[int, Decimal]]:
+        async with AsyncSessionLocal() as db:
+            rows = await db.execute(
+                select(Order.id, Order.amount)
+                .where(
+                    Order.status == OrderStatus.pending,
+                    Order.payment_method.in_(ROBOKASSA_METHODS),
+                    Order.created_at <= now - timedelta(minutes=settings.RECONCILE_MIN_AGE_MINUTES),
+                    Order.created_at >= now - timedelta(hours=settings.RECONCILE_MAX_AGE_HOURS),
+                    Order.id > after_id,
+                )
+                .order_by(Order.id)
+                .limit(settings.RECONCILE_BATCH_SIZE)
+            )
+            return [(row.id, row.amount) for row in rows]
+
+    async def fetch_state(self, session: aiohttp.ClientSession, inv_id: int) -> Optional[OperationState]:
+        params = robokassa_service.op_state_params(inv_id)
+        try:
+            async with session.get(robokassa_service.op_state_url, params=params) as response:
+                body = await response.text()
+                if response.status != 200:
+                    logger.warning(f"⚠️ OpStateExt #{inv_id}: HTTP {response.status}")
+                    return None
+            return robokassa_service.parse_op_state(inv_id, body)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning(f"⚠️ OpStateExt #{inv_id} недоступен: {e}")
+        except Exception as e:
+            logger.error(f"❌ Не удалось разобрать ответ OpStateExt #{inv_id}: {e}")
+        return None
+
+    async def _apply(self, order_id: int, amount: Decimal, state: OperationState) -> str:
+        try:
+            paid_sum = Decimal(state.out_sum)
+        except (TypeError, InvalidOperation):
+            paid_sum = None
+        if paid_sum != amount:
+            logger.error(
+                f"❌ Сверка #{order_id}: оплачено {state.out_sum}, сумма заказа {amount} - заказ не проведен"
+            )
+            return "amount_mismatch"
+
+        payload = {
+            "source": "OpStateExt",
+            "state": state.state_code,
+            "out_sum": state.out_sum,
+            "op_key": state.op_key,
+        }
+        async with AsyncSessionLocal() as db:
+            result = await apply_payment_notification(
+                db, "robokassa", order_id, str(amount), RECONCILE_SIGNATURE, payload
+            )
+            if result == PAYMENT_ORDER_MISSING:
+                await db.rollback()
+                return result
+            await db.commit()
+
+        if result == PAYMENT_APPLIED:
+            await publish_order_status_by_id(order_id)
+            logger.info(f"✅ Сверка: заказ #{order_id} оплачен в RoboKassa - переведен в обработку")
+        return result
+
+    async def _check(self, session: aiohttp.ClientSession, semaphore: asyncio.Semaphore,
+                     order_id: int, amount: Decimal) -> str:
+        async with semaphore:
+            state = await self.fetch_state(session, order_id)
+        if state is None:
+            return "error"
+        if not state.is_paid:
+            return f"state_{state.state_code}" if state.result_code == 0 else f"result_{state.result_code}"
+        try:
+            return await self._apply(order_id, amount, state)
+        except Exception as e:
+            logger.error(f"❌ Сверка: ошибка проведения заказа #{order_id}: {e}")
+            return "error"
+
+    async def run_once(self) -> Dict[str, int]:
+        """Один проход по всем зависшим заказам. Возвращает счетчики исходов"""
+        now = datetime.utcnow()
+        stats: Dict[str, int] = {}
+        semaphore = asyncio.Semaphore(settings.RECONCILE_CONCURRENCY)
+        connector = aiohttp.TCPConnector(limit=settings.RECONCILE_CONCURRENCY)
+        timeout = aiohttp.ClientTimeout(total=settings.RECONCILE_REQUEST_TIMEOUT)
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            after_id = 0
+            while True:
+                batch = await self._load_batch(after_id, now)
+                if not batch:
+                    break
+                results = await asyncio.gather(*(
+                    self._check(session, semaphore, order_id, amount) for order_id, amount in batch
+                ))
+                for result in results:
+                    stats[result] = stats.get(result, 0) + 1
+                after_id = batch[-1][0]
+
+        if stats:
+            logger.info(f"🧾 Сверка RoboKassa: {sum(stats.values())} заказов, {stats}")
+        return stats
+
+    def run_sync(self) -> Dict[str, int]:
+        """Для планировщика: async engine и HTTP живут в одном долгоживущем loop"""
+        return self._loop.run(self.run_once())
+
+    def stop(self):
+        self._loop.stop()
+
+
+payment_reconciler = PaymentReconciler()
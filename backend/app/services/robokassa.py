@@ -1,13 +1,60 @@
 # backend/app/services/robokassa.py
 import hashlib
+import hmac
 import os
 import json
-import urllib.parse
-from typing import Optional, Dict, Any
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from urllib.parse import quote, urlencode
+from typing import Optional, Dict, Any, Iterable, Tuple
 from decimal import Decimal
-import requests
 from loguru import logger
 
+# Коды состояния операции OpStateExt
+OP_STATE_INITIATED = 5  # счет выставлен, оплаты нет
+OP_STATE_CANCELED = 10
+OP_STATE_PROCESSING = 50  # деньги получены, зачисление идет
+OP_STATE_REFUNDED = 60
+OP_STATE_SUSPENDED = 80
+OP_STATE_PAID = 100
+
+# Коды Result/Code OpStateExt
+OP_RESULT_OK = 0
+OP_RESULT_INVOICE_NOT_FOUND = 3
+
+# Значение суммы в шаблоне чека, вместо которого подставляется реальная сумма
+_SUM_MARKER = "__ROBOKASSA_SUM__"
+
+
+def payment_description(order_id: int) -> str:
+    """Описание платежа по закону (одинаковое для новых и перевыпущенных ссылок)"""
+    return f"Услуга по пополнению игрового аккаунта в игре #{order_id}"
+
+
+def _q(value: str) -> str:
+    """Кодирование значений как в ссылках RoboKassa ("/" не кодируется)"""
+    return quote(value, safe="/")
+
+
+@dataclass
+class OperationState:
+    """Ответ OpStateExt по одному счету"""
+    inv_id: int
+    result_code: int
+    state_code: Optional[int] = None
+    out_sum: Optional[str] = None
+    op_key: Optional[str] = None
+
+    @property
+    def is_paid(self) -> bool:
+        return self.result_code == OP_RESULT_OK and self.state_code == OP_STATE_PAID
+
+
+def _xml_text(root: ET.Element, path: str) -> Optional[str]:
+    # Ответ в пространстве имен merchant.roboxchange.com - ищем по локальным именам
+    node = root.find("/".join(f"{{*}}{part}" for part in path.split("/")))
+    return node.text.strip() if node is not None and node.text else None
+
 
 class RoboKassaService:
     """Сервис для работы с RoboKassa API"""
@@ -18,6 +65,8 @@ class RoboKassaService:
         self.password1 = os.getenv("ROBOKASSA_PASSWORD_1", "password_1")
         self.password2 = os.getenv("ROBOKASSA_PASSWORD_2", "password_2")
         self.is_test = os.getenv("ROBOKASSA_IS_TEST", "true").lower() == "true"
+        self.success_url = os.getenv("ROBOKASSA_SUCCESS_URL", "https://donateraid.ru/api/robokassa/success")
+        self.fail_url = os.getenv("ROBOKASSA_FAIL_URL", "https://donateraid.ru/api/robokassa/fail")
 
         # URL'ы для разных режимов
         if self.is_test:
@@ -25,35 +74,59 @@ class RoboKassaService:
         else:
             self.payment_url = "https://auth.robokassa.ru/Merchant/Index.aspx"
 
-    def create_receipt(self, total_amount: Decimal) -> str:
-        """Создание фискального чека для номенклатуры"""
-        # Формируем название услуги
-        service_name = "Услуга пополнения игрового аккаунта в игре"
+        # Состояние операции (сверка); переопределяется для локального мок-шлюза
+        self.op_state_url = os.getenv(
+            "ROBOKASSA_OPSTATE_URL",
+            "https://auth.robokassa.ru/Merchant/WebService/Service.asmx/OpStateExt"
+        )
 
-        # Структура чека согласно документации Robokassa
-        receipt_data = {
+        self._prepare_static_parts()
+
+    def _prepare_static_parts(self):
+        """
+        Все, что не зависит от заказа, собирается один раз: шаблон чека (уже
+        URL-кодированный для подписи и дважды - для ссылки), начало и конец query string.
+        """
+        receipt_template = {
             "sno": "usn_income",  # Упрощенная СН (доходы)
             "items": [
                 {
-                    "name": service_name,
+                    "name": "Услуга пополнения игрового аккаунта в игре",
                     "quantity": 1,
-                    "sum": float(total_amount),
+                    "sum": _SUM_MARKER,
                     "payment_method": "full_payment",  # Полная оплата
                     "payment_object": "service",  # Услуга
                     "tax": "none"  # Без НДС
                 }
             ]
         }
+        template_json = json.dumps(receipt_template, ensure_ascii=False)
+        self._receipt_json_parts = template_json.split(json.dumps(_SUM_MARKER))
+        # quote посимвольный, поэтому части можно кодировать заранее
+        self._receipt_parts = tuple(_q(part) for part in self._receipt_json_parts)
+        self._receipt_url_parts = tuple(_q(part) for part in self._receipt_parts)
+
+        self._query_head = urlencode({"MerchantLogin": self.merchant_login}, safe="/", quote_via=quote)
+        tail = {"Culture": "ru"}  # Русский интерфейс
+        if self.is_test:
+            tail["IsTest"] = "1"
+        self._query_tail = urlencode(tail, safe="/", quote_via=quote)
+        self._query_urls = urlencode(
+            {"SuccessURL": self.success_url, "FailURL": self.fail_url}, safe="/", quote_via=quote
+        )
 
-        # Конвертируем в JSON
-        receipt_json = json.dumps(receipt_data, ensure_ascii=False)
-
-        # URL-кодируем для передачи в параметрах
-        receipt_encoded = urllib.parse.quote(receipt_json)
+    @staticmethod
+    def _redact(signature_string: str, password: str) -> str:
+        return signature_string.replace(password, "***") if password else signature_string
 
-        logger.info(f"📋 Создан фискальный чек: {receipt_json}")
+    @staticmethod
+    def _sum_json(total_amount: Decimal) -> str:
+        return json.dumps(float(total_amount))
 
-        return receipt_encoded
+    def create_receipt(self, total_amount: Decimal) -> str:
+        """Фискальный чек для номенклатуры (URL-кодированный JSON - в таком виде он входит в подпись)"""
+        prefix, suffix = self._receipt_parts
+        return prefix + _q(self._sum_json(total_amount)) + suffix
 
     def generate_signature(self, merchant_login: str, out_sum: str, inv_id: str,
                            password: str, receipt: Optional[str] = None) -> str:
@@ -65,9 +138,8 @@ class RoboKassaService:
             # Без чека: MerchantLogin:OutSum:InvId:Password
             signature_string = f"{merchant_login}:{out_sum}:{inv_id}:{password}"
 
-        logger.info(f"🔑 Строка для подписи: {signature_string}")
         signature = hashlib.md5(signature_string.encode('utf-8')).hexdigest()
-        logger.info(f"🔑 Подпись: {signature}")
+        logger.debug(f"🔑 Подпись заказа #{inv_id}: {self._redact(signature_string, password)}")
         return signature
 
     def create_payment_url(self, order_id: int, amount: Decimal, currency: str = "RUB",
@@ -78,43 +150,38 @@ class RoboKassaService:
         inv_id = str(order_id)
         desc = description or f"Оплата заказа №{order_id} на Donate Raid"
 
-        # Создаем чек для фискализации
-        receipt = self.create_receipt(amount)
+        # Чек: для подписи - URL-кодированный JSON, в ссылке - он же, закодированный еще раз
+        sum_json = _q(self._sum_json(amount))
+        receipt = self._receipt_parts[0] + sum_json + self._receipt_parts[1]
+        receipt_in_url = self._receipt_url_parts[0] + _q(sum_json) + self._receipt_url_parts[1]
 
-        # Генерируем подпись
         signature = self.generate_signature(
             self.merchant_login, out_sum, inv_id, self.password1, receipt
         )
 
-        # Формируем параметры для URL
-        params = {
-            "MerchantLogin": self.merchant_login,
+        # Порядок параметров как раньше: MerchantLogin, OutSum, InvId, Description,
+        # SignatureValue, Culture, IsTest, Receipt, SuccessURL, FailURL
+        order_part = urlencode({
             "OutSum": out_sum,
             "InvId": inv_id,
             "Description": desc,
             "SignatureValue": signature,
-            "Culture": "ru",  # Русский интерфейс
-        }
-
-        # Добавляем тестовый режим
-        if self.is_test:
-            params["IsTest"] = "1"
-
-        # Добавляем чек если есть
-        if receipt:
-            params["Receipt"] = receipt
-
-        # URL'ы для результатов
-        params["SuccessURL"] = "https://donateraid.ru/api/robokassa/success"
-        params["FailURL"] = "https://donateraid.ru/api/robokassa/fail"
-
-        # Формируем финальный URL
-        query_string = "&".join([f"{key}={requests.utils.quote(str(value))}" for key, value in params.items()])
-        payment_url = f"{self.payment_url}?{query_string}"
+        }, safe="/", quote_via=quote)
+        payment_url = (
+            f"{self.payment_url}?{self._query_head}&{order_part}&{self._query_tail}"
+            f"&Receipt={receipt_in_url}&{self._query_urls}"
+        )
 
-        logger.info(f"💳 Создан URL для оплаты заказа #{order_id}: {payment_url}")
+        logger.info(f"💳 Создан URL для оплаты заказа #{order_id} на {out_sum} {currency}")
         return payment_url
 
+    def create_payment_urls(self, orders: Iterable[Tuple[int, Decimal, Optional[str]]]) -> Dict[int, str]:
+        """Ссылки для пачки заказов: (order_id, amount, description) -> {order_id: url}"""
+        urls = {}
+        for order_id, amount, description in orders:
+            urls[order_id] = self.create_payment_url(order_id, amount, description=description)
+        return urls
+
     def verify_signature_result(self, out_sum: str, inv_id: str, signature_value: str,
                                 receipt: Optional[str] = None) -> bool:
         """Проверка подписи от RoboKassa (Result URL)"""
@@ -125,16 +192,41 @@ class RoboKassaService:
         else:
             signature_string = f"{out_sum}:{inv_id}:{self.password2}"
 
-        logger.info(f"🔍 Строка для проверки подписи Result: {signature_string}")
         expected_signature = hashlib.md5(signature_string.encode('utf-8')).hexdigest()
+        is_valid = hmac.compare_digest(signature_value.lower().encode("utf-8"), expected_signature.encode("utf-8"))
 
-        is_valid = signature_value.lower() == expected_signature.lower()
-        logger.info(f"🔍 Проверка подписи Result: {'✅ ОК' if is_valid else '❌ ОШИБКА'}")
-        logger.info(f"    Получена: {signature_value}")
-        logger.info(f"    Ожидается: {expected_signature}")
+        logger.info(f"🔍 Проверка подписи Result для заказа #{inv_id}: {'✅ ОК' if is_valid else '❌ ОШИБКА'}")
+        if not is_valid:
+            logger.debug(
+                f"    Строка: {self._redact(signature_string, self.password2)}, "
+                f"получена: {signature_value}, ожидается: {expected_signature}"
+            )
 
         return is_valid
 
+    def op_state_params(self, inv_id: int) -> Dict[str, str]:
+        """Параметры запроса OpStateExt: подпись MerchantLogin:InvoiceID:Password#2"""
+        signature_string = f"{self.merchant_login}:{inv_id}:{self.password2}"
+        return {
+            "MerchantLogin": self.merchant_login,
+            "InvoiceID": str(inv_id),
+            "Signature": hashlib.md5(signature_string.encode("utf-8")).hexdigest(),
+        }
+
+    @staticmethod
+    def parse_op_state(inv_id: int, body: str) -> OperationState:
+        """Разбор XML ответа OpStateExt"""
+        root = ET.fromstring(body)
+        result_code = _xml_text(root, "Result/Code")
+        state_code = _xml_text(root, "State/Code")
+        return OperationState(
+            inv_id=inv_id,
+            result_code=int(result_code) if result_code is not None else -1,
+            state_code=int(state_code) if state_code is not None else None,
+            out_sum=_xml_text(root, "Info/OutSum"),
+            op_key=_xml_text(root, "Info/OpKey"),
+        )
+
     def get_payment_methods(self) -> Dict[str, Any]:
         """Получение доступных способов оплаты для конкретных методов"""
         return {
@@ -154,4 +246,4 @@ class RoboKassaService:
 
 
 # Глобальный экземпляр сервиса
-robokassa_service = RoboKassaService()
\ No newline at end of file
+robokassa_service = RoboKassaService()
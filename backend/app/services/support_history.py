@@ -0,0 +1,84 @@
+# backend/app/services/support_history.py - ИСТОРИЯ ЧАТА ПОДДЕРЖКИ С KEYSET-ПАГИНАЦИЕЙ
+from dataclasses import dataclass
+from typing import List, Optional
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.support import SupportMessage
+
+
+class InvalidCursor(ValueError):
+    """Курсор указывает на чужое или несуществующее сообщение"""
+
+
+def support_owner_filter(user_id: Optional[int] = None, guest_id: Optional[str] = None):
+    """Условие "сообщения этого диалога" (под индексы (user_id|guest_id, created_at))"""
+    if user_id is not None:
+        return SupportMessage.user_id == user_id
+    return SupportMessage.guest_id == guest_id
+
+
+@dataclass
+class SupportHistoryPage:
+    messages: List[SupportMessage]  # в хронологическом порядке
+    has_more: bool  # есть еще сообщения в направлении листания
+
+    @property
+    def first_id(self) -> Optional[int]:
+        return self.messages[0].id if self.messages else None
+
+    @property
+    def last_id(self) -> Optional[int]:
+        return self.messages[-1].id if self.messages else None
+
+
+async def load_support_page(
+        db: AsyncSession,
+        user_id: Optional[int] = None,
+        guest_id: Optional[str] = None,
+        before_id: Optional[int] = None,
+        after_id: Optional[int] = None,
+        limit: int = 50,
+) -> SupportHistoryPage:
+    """
+    Страница диалога по курсору.
+
+    Без курсоров - последние limit сообщений; before_id - более старые, чем курсор;
+    after_id - более новые. Сортировка по (created_at, id), чтобы запрос шел по
+    составному индексу владельца, а не сортировал весь диалог.
+    """
+    owner = support_owner_filter(user_id, guest_id)
+    cursor_id = after_id if after_id is not None else before_id
+
+    query = select(SupportMessage).where(owner)
+    if cursor_id is not None:
+        cursor_created_at = (await db.execute(
+            select(SupportMessage.created_at).where(owner, SupportMessage.id == cursor_id)
+        )).scalar_one_or_none()
+        if cursor_created_at is None:
+            raise InvalidCursor(f"Сообщение #{cursor_id} не найдено в этом диалоге")
+
+        if after_id is not None:
+            query = query.where(or_(
+                SupportMessage.created_at > cursor_created_at,
+                and_(SupportMessage.created_at == cursor_created_at, SupportMessage.id > after_id),
+            ))
+        else:
+            query = query.where(or_(
+                SupportMessage.created_at < cursor_created_at,
+                and_(SupportMessage.created_at == cursor_created_at, SupportMessage.id < before_id),
+            ))
+
+    if after_id is not None:
+        query = query.order_by(SupportMessage.created_at.asc(), SupportMessage.id.asc())
+    else:
+        query = query.order_by(SupportMessage.created_at.desc(), SupportMessage.id.desc())
+
+    rows = list((await db.execute(query.limit(limit + 1))).scalars().all())
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if after_id is None:
+        rows.reverse()
+
+    return SupportHistoryPage(messages=rows, has_more=has_more)
@@ -0,0 +1,79 @@
+# backend/app/services/support_realtime.py - СОБЫТИЯ ЧАТА ПОДДЕРЖКИ ДЛЯ WEBSOCKET (БЕЗ ЗАВИСИМОСТИ ОТ РОУТЕРОВ)
+from typing import List, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy import select
+
+from app.core.database import AsyncSessionLocal
+from app.models.support import SupportMessage
+from app.services.pubsub import pubsub, support_room_channel
+from app.services.support_history import support_owner_filter
+
+
+def serialize_support_message(message) -> dict:
+    """SupportMessage -> данные события new_message (поля как у /api/support/my)"""
+    return {
+        "id": message.id,
+        "user_id": message.user_id,
+        "guest_id": message.guest_id,
+        "message": message.message,
+        "is_from_user": message.is_from_user,
+        "created_at": message.created_at.isoformat() if message.created_at else None,
+        "status": message.status.value if hasattr(message.status, "value") else message.status,
+    }
+
+
+def get_support_room_id(user_id: int = None, guest_id: str = None):
+    if user_id:
+        return f"user_{user_id}"
+    if guest_id:
+        return f"guest_{guest_id}"
+    return None
+
+
+def parse_support_room_id(room_id: str) -> Tuple[Optional[int], Optional[str]]:
+    """Обратное к get_support_room_id: "user_5" -> (5, None), "guest_abc" -> (None, "abc")"""
+    if room_id.startswith("user_"):
+        try:
+            return int(room_id[len("user_"):]), None
+        except ValueError:
+            return None, None
+    if room_id.startswith("guest_"):
+        return None, room_id[len("guest_"):] or None
+    return None, None
+
+
+async def load_support_messages_after(room_id: str, last_id: int, limit: int) -> List[dict]:
+    """Сообщения комнаты с id > last_id (по возрастанию id) - для догрузки после переподключения"""
+    user_id, guest_id = parse_support_room_id(room_id)
+    if user_id is None and guest_id is None:
+        return []
+
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(SupportMessage)
+            .where(support_owner_filter(user_id, guest_id), SupportMessage.id > last_id)
+            .order_by(SupportMessage.id)
+            .limit(limit)
+        )
+        return [serialize_support_message(message) for message in result.scalars().all()]
+
+
+async def publish_support_message(user_id: int = None, guest_id: str = None, message_data: dict = None):
+    """
+    Уведомление через WebSocket о новом сообщении.
+    Публикуется в брокер, поэтому доходит до сокетов в любом процессе API (в т.ч. из контейнера бота).
+    """
+
+    # Определяем room_id (комнату чата)
+    room_id = get_support_room_id(user_id, guest_id)
+    if not room_id:
+        logger.warning("⚠️ Не указан user_id или guest_id для WebSocket уведомления")
+        return
+
+    await pubsub.publish(support_room_channel(room_id), {
+        "type": "new_message",
+        "data": message_data
+    })
+
+    logger.info(f"✅ WebSocket уведомление опубликовано для комнаты {room_id}")
\ No newline at end of file
@@ -1,18 +1,61 @@
 # backend/app/services/telegram.py - ИСПРАВЛЕННАЯ ВЕРСИЯ С КНОПКАМИ ДЛЯ ПЛАТНЫХ ЗАКАЗОВ
 import asyncio
+import atexit
+import time
 import aiohttp
-from typing import Optional
+from concurrent.futures import Future
+from typing import Dict, Iterable, List, Optional
+from app.core.background_loop import BackgroundLoop
 from app.core.config import settings
 from loguru import logger
 
+# Результат отправки в один чат
+SEND_OK = "sent"
+SEND_REJECTED = "rejected"  # 4xx (бот заблокирован, чат не найден) - повтор не поможет
+SEND_FAILED = "failed"  # сеть, 5xx, исчерпаны повторы 429 - можно повторить позже
+
+
+class TokenBucket:
+    """Ограничитель частоты: rate токенов в секунду, не больше capacity подряд"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
 
 class TelegramNotifier:
-    """Сервис для отправки уведомлений в Telegram"""
+    """
+    Сервис для отправки уведомлений в Telegram.
+
+    Одна aiohttp сессия с keep-alive живет в собственном фоновом loop, рассылка
+    по всем admin_chat_ids идет параллельно, частота ограничена token bucket
+    (общий лимит бота и лимит на чат), 429 повторяется через retry_after.
+    """
 
     def __init__(self):
         self.bot_token = settings.TG_BOT_TOKEN
         self.admin_chat_ids = self._parse_admin_chat_ids()
         self.enabled = bool(self.bot_token and self.admin_chat_ids)
+        self.max_retries = settings.TG_MAX_RETRIES
+
+        self._background = BackgroundLoop("telegram-notifier")
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._global_bucket: Optional[TokenBucket] = None
+        self._chat_buckets: Dict[str, TokenBucket] = {}
 
     def _parse_admin_chat_ids(self) -> list[str]:
         """Парсит ID чатов администраторов из настроек"""
@@ -20,61 +63,138 @@ class TelegramNotifier:
             return []
         return [chat_id.strip() for chat_id in settings.TG_ADMIN_CHAT_IDS.split(',')]
 
-    async def send_message(self, text: str, chat_id: Optional[str] = None, reply_markup=None):
-        """Отправляет сообщение в Telegram"""
+    # Все, что ниже, выполняется только внутри фонового loop
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=settings.TG_MAX_CONNECTIONS, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=15),
+            )
+        return self._session
+
+    def _chat_bucket(self, chat_id: str) -> TokenBucket:
+        if self._global_bucket is None:
+            self._global_bucket = TokenBucket(settings.TG_GLOBAL_RATE, settings.TG_GLOBAL_RATE)
+        if chat_id not in self._chat_buckets:
+            self._chat_buckets[chat_id] = TokenBucket(settings.TG_PER_CHAT_RATE, settings.TG_PER_CHAT_BURST)
+        return self._chat_buckets[chat_id]
+
+    async def _send_one(self, chat_id: str, payload: dict) -> str:
+        url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
+        chat_bucket = self._chat_bucket(chat_id)
+
+        for attempt in range(1, self.max_retries + 1):
+            await chat_bucket.acquire()
+            await self._global_bucket.acquire()
+            try:
+                async with self._get_session().post(url, json={**payload, "chat_id": chat_id}) as response:
+                    if response.status == 200:
+                        logger.info(f"Уведомление отправлено в чат {chat_id}")
+                        return SEND_OK
+
+                    response_text = await response.text()
+                    if response.status == 429:
+                        try:
+                            retry_after = (await response.json()).get("parameters", {}).get("retry_after", 1)
+                        except Exception:
+                            retry_after = 1
+                        if attempt < self.max_retries:
+                            logger.warning(f"⏳ Telegram 429 для чата {chat_id}, повтор через {retry_after} с")
+                            await asyncio.sleep(retry_after)
+                        continue
+
+                    logger.error(f"Ошибка отправки в чат {chat_id}: {response.status}")
+                    logger.error(f"Ответ Telegram API: {response_text}")
+                    if response.status < 500:
+                        return SEND_REJECTED  # 400/403 - повтор не поможет
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.error(f"Ошибка отправки уведомления в Telegram (чат {chat_id}, попытка {attempt}): {e}")
+
+            # После последней попытки не ждем - событие повторит outbox со своей задержкой
+            if attempt < self.max_retries:
+                await asyncio.sleep(min(2 ** attempt, 30))
+
+        return SEND_FAILED
+
+    async def _deliver(self, text: str, chat_ids: List[str], reply_markup) -> Dict[str, str]:
+        payload = {
+            "text": text,
+            "parse_mode": "HTML",
+            "disable_web_page_preview": True
+        }
+        # Добавляем клавиатуру если есть
+        if reply_markup:
+            payload["reply_markup"] = reply_markup
+
+        results = await asyncio.gather(*(self._send_one(str(cid), payload) for cid in chat_ids))
+        return dict(zip((str(cid) for cid in chat_ids), results))
+
+    async def _send_all(self, text: str, chat_id: Optional[str], reply_markup) -> bool:
+        chat_ids = [chat_id] if chat_id else self.admin_chat_ids
+        results = await self._deliver(text, chat_ids, reply_markup)
+        return all(status == SEND_OK for status in results.values())
+
+    async def _close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    # Публичный API
+    async def send_message(self, text: str, chat_id: Optional[str] = None, reply_markup=None) -> bool:
+        """
+        Отправляет сообщение в Telegram (можно await из любого loop).
+        False - хотя бы в один чат не доставлено (outbox воркер повторит попытку).
+        """
         if not self.enabled:
             logger.warning("Telegram уведомления отключены (не настроен токен или chat_id)")
             return False
+        return await self._background.run_async(self._send_all(text, chat_id, reply_markup))
 
-        chat_ids = [chat_id] if chat_id else self.admin_chat_ids
+    def send_message_blocking(self, text: str, chat_id: Optional[str] = None, reply_markup=None) -> bool:
+        """Синхронная отправка с ожиданием результата (для воркеров)"""
+        if not self.enabled:
+            logger.warning("Telegram уведомления отключены (не настроен токен или chat_id)")
+            return False
+        return self._background.run(self._send_all(text, chat_id, reply_markup))
+
+    def deliver_blocking(self, text: str, reply_markup=None, skip: Iterable[str] = ()) -> Dict[str, str]:
+        """
+        Отправка админам, кроме чатов из skip, с ожиданием результата.
+        Возвращает статус по каждому чату (SEND_OK / SEND_REJECTED / SEND_FAILED) -
+        outbox воркер повторяет только SEND_FAILED.
+        """
+        if not self.enabled:
+            logger.warning("Telegram уведомления отключены (не настроен токен или chat_id)")
+            return {}
+        skip = {str(chat_id) for chat_id in skip}
+        chat_ids = [chat_id for chat_id in self.admin_chat_ids if chat_id not in skip]
+        if not chat_ids:
+            return {}
+        return self._background.run(self._deliver(text, chat_ids, reply_markup))
+
+    def send_message_sync(self, text: str, chat_id: Optional[str] = None, reply_markup=None) -> Optional[Future]:
+        """Синхронная версия отправки сообщения: ставит в фоновый loop и сразу возвращается"""
+        if not self.enabled:
+            logger.warning("Telegram уведомления отключены (не настроен токен или chat_id)")
+            return None
 
-        for chat_id in chat_ids:
-            try:
-                url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
-                payload = {
-                    "chat_id": chat_id,
-                    "text": text,
-                    "parse_mode": "HTML",
-                    "disable_web_page_preview": True
-                }
-
-                # Добавляем клавиатуру если есть
-                if reply_markup:
-                    payload["reply_markup"] = reply_markup
-                    logger.info(f"🔍 Отправляем клавиатуру: {reply_markup}")
-
-                logger.info(f"🔍 Полный payload для Telegram API: {payload}")
-
-                async with aiohttp.ClientSession() as session:
-                    async with session.post(url, json=payload) as response:
-                        response_text = await response.text()
-                        if response.status == 200:
-                            logger.info(f"Уведомление отправлено в чат {chat_id}")
-                        else:
-                            logger.error(f"Ошибка отправки в чат {chat_id}: {response.status}")
-                            logger.error(f"Ответ Telegram API: {response_text}")
-
-            except Exception as e:
-                logger.error(f"Ошибка отправки уведомления в Telegram: {e}")
-
-        return True
-
-    def send_message_sync(self, text: str, chat_id: Optional[str] = None, reply_markup=None):
-        """Синхронная версия отправки сообщения"""
-        try:
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                # Если цикл уже запущен, создаем задачу
-                asyncio.create_task(self.send_message(text, chat_id, reply_markup))
-            else:
-                # Запускаем в новом цикле
-                loop.run_until_complete(self.send_message(text, chat_id, reply_markup))
-        except Exception as e:
-            logger.error(f"Ошибка синхронной отправки: {e}")
+        future = self._background.submit(self._send_all(text, chat_id, reply_markup))
+
+        def log_result(done: Future):
+            if done.exception() is not None:
+                logger.error(f"Ошибка синхронной отправки: {done.exception()}")
+            elif not done.result():
+                logger.error("Telegram уведомление доставлено не во все чаты")
+
+        future.add_done_callback(log_result)
+        return future
+
+    def close(self):
+        self._background.stop(self._close())
 
 
 # Глобальный экземпляр
 telegram_notifier = TelegramNotifier()
+atexit.register(telegram_notifier.close)
 
 
 # Функции-хелперы для совместимости с существующим кодом
@@ -83,36 +203,38 @@ def notify_order_sync(message: str):
     telegram_notifier.send_message_sync(message)
 
 
-def notify_manual_order_sync(message: str, order_id: int = None):
-    """Уведомление о ручном заказе с клавиатурой"""
-    keyboard = None
-    if order_id:
-        # Создаем клавиатуру в формате Telegram Bot API
-        keyboard = {
-            "inline_keyboard": [
-                [{"text": "✅ Принять", "callback_data": f"approve_{order_id}"}],
-                [{"text": "↩️ Отклонить с возвратом", "callback_data": f"reject_with_refund_{order_id}"}],
-                [{"text": "❌ Удалить", "callback_data": f"delete_order_{order_id}"}]
+def manual_order_keyboard(order_id: int) -> dict:
+    """Клавиатура ручного заказа в формате Telegram Bot API (как в bot/handlers/manual_orders.py)"""
+    return {
+        "inline_keyboard": [
+            [{"text": "✅ Принять", "callback_data": f"approve_{order_id}"}],
+            [{"text": "↩️ Отклонить с возвратом", "callback_data": f"reject_with_refund_{order_id}"}],
+            [{"text": "❌ Удалить", "callback_data": f"delete_order_{order_id}"}]
+        ]
+    }
+
+
+def paid_order_keyboard(order_id: int) -> dict:
+    """Клавиатура оплаченного заказа в формате Telegram Bot API"""
+    return {
+        "inline_keyboard": [
+            [
+                {"text": "✅ Выполнен", "callback_data": f"paid_complete_{order_id}"},
+                {"text": "💸 Возврат", "callback_data": f"paid_refund_{order_id}"}
             ]
-        }
+        ]
+    }
 
+
+def notify_manual_order_sync(message: str, order_id: int = None):
+    """Уведомление о ручном заказе с клавиатурой"""
+    keyboard = manual_order_keyboard(order_id) if order_id else None
     telegram_notifier.send_message_sync(message, reply_markup=keyboard)
 
 
 def notify_payment_sync(message: str, order_id: int = None):
     """Уведомление об оплате с кнопками управления"""
-    keyboard = None
-    if order_id:
-        # Создаем клавиатуру в формате Telegram Bot API
-        keyboard = {
-            "inline_keyboard": [
-                [
-                    {"text": "✅ Выполнен", "callback_data": f"paid_complete_{order_id}"},
-                    {"text": "💸 Возврат", "callback_data": f"paid_refund_{order_id}"}
-                ]
-            ]
-        }
-
+    keyboard = paid_order_keyboard(order_id) if order_id else None
     telegram_notifier.send_message_sync(message, reply_markup=keyboard)
 
 
@@ -0,0 +1,51 @@
+# backend/app/worker.py - ФОНОВЫЙ ВОРКЕР (WORKER_MODE=true в start.sh)
+import signal
+from datetime import datetime, timedelta
+
+from apscheduler.schedulers.background import BackgroundScheduler
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.services.email_templates import email_templates
+from app.services.outbox import outbox_worker
+from app.services.reconciliation import payment_reconciler
+
+
+def start_scheduler() -> BackgroundScheduler:
+    scheduler = BackgroundScheduler()
+    if settings.RECONCILE_ENABLED:
+        # Проходы не накладываются друг на друга (max_instances=1), первый - вскоре после старта
+        scheduler.add_job(
+            payment_reconciler.run_sync,
+            "interval",
+            minutes=settings.RECONCILE_INTERVAL_MINUTES,
+            next_run_time=datetime.now() + timedelta(seconds=30),
+            id="payment_reconcile",
+            max_instances=1,
+            coalesce=True,
+            replace_existing=True,
+        )
+        logger.info(f"🧾 Сверка RoboKassa: каждые {settings.RECONCILE_INTERVAL_MINUTES} мин")
+    scheduler.start()
+    return scheduler
+
+
+def main():
+    def shutdown(signum, frame):
+        logger.info(f"🛑 Получен сигнал {signum}, останавливаем воркер")
+        outbox_worker.stop()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    email_templates.precompile()
+    scheduler = start_scheduler()
+    try:
+        outbox_worker.run_forever()
+    finally:
+        scheduler.shutdown(wait=False)
+        payment_reconciler.stop()
+
+
+if __name__ == "__main__":
+    main()
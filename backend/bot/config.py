@@ -4,3 +4,7 @@ TG_BOT_TOKEN = os.getenv("TG_BOT_TOKEN")
 ADMIN_CHAT_IDS = [
     int(chat_id.strip()) for chat_id in os.getenv("TG_ADMIN_CHAT_IDS", "").split(",") if chat_id.strip().isdigit()
 ]
+
+
+# Максимум уведомлений админам в очереди bot/notify.py (сверх - отбрасываются с подсчетом в метриках)
+NOTIFY_QUEUE_SIZE = int(os.getenv("NOTIFY_QUEUE_SIZE", "500"))
@@ -6,6 +6,7 @@ from sqlalchemy.orm import Session
 from app.core.database import SessionLocal
 from app.models.order import Order, OrderStatus
 from app.models.user import User
+from app.services.order_events import publish_order_status_async
 from bot.states.manual_orders import ApproveOrderState, RefundOrderState
 from decimal import Decimal  # ДОБАВЛЕН ИМПОРТ
 
@@ -33,7 +34,7 @@ async def approve_manual_order(call: CallbackQuery):
 
     db = get_db()
     try:
-        order = db.query(Order).get(order_id)
+        order = db.query(Order).filter(Order.id == order_id).with_for_update().first()
         if not order or order.status != OrderStatus.pending:
             await call.message.answer("❌ Заявка не найдена или уже обработана.")
             await call.answer()
@@ -42,6 +43,7 @@ async def approve_manual_order(call: CallbackQuery):
         # Меняем статус на completed (done)
         order.status = OrderStatus.done
         db.commit()
+        await publish_order_status_async(order)
 
         # Получаем информацию о пользователе
         user = db.query(User).get(order.user_id)
@@ -107,14 +109,14 @@ async def reject_with_refund_amount(msg: Message, state: FSMContext):
 
     db = get_db()
     try:
-        order = db.query(Order).get(order_id)
+        order = db.query(Order).filter(Order.id == order_id).with_for_update().first()
         if not order:
             return await msg.answer("❌ Заявка не найдена.")
 
         if order.status != OrderStatus.pending:
             return await msg.answer(f"❌ Заявка уже обработана. Статус: {order.status.value}")
 
-        user = db.query(User).get(order.user_id)
+        user = db.query(User).filter(User.id == order.user_id).with_for_update().first()
         if not user:
             return await msg.answer("❌ Пользователь не найден.")
 
@@ -131,6 +133,7 @@ async def reject_with_refund_amount(msg: Message, state: FSMContext):
         db.commit()
         db.refresh(user)
         db.refresh(order)
+        await publish_order_status_async(order)
 
         username = user.username or user.email or f"ID: {user.id}"
 
@@ -6,7 +6,8 @@ from sqlalchemy.orm import Session
 from app.core.database import SessionLocal
 from app.models.order import Order, OrderStatus
 from app.models.user import User
-from app.services.mailer import send_email, render_template
+from app.services.mailer import send_email_async, render_template
+from app.services.order_events import publish_order_status_async
 from decimal import Decimal
 
 router = Router()
@@ -32,7 +33,7 @@ async def complete_paid_order(call: CallbackQuery):
 
     db = get_db()
     try:
-        order = db.query(Order).get(order_id)
+        order = db.query(Order).filter(Order.id == order_id).with_for_update().first()
         if not order:
             await call.message.answer("❌ Заказ не найден.")
             await call.answer()
@@ -47,6 +48,7 @@ async def complete_paid_order(call: CallbackQuery):
         order.status = OrderStatus.done
         db.commit()
         db.refresh(order)
+        await publish_order_status_async(order)
 
         # Получаем информацию о пользователе
         user = db.query(User).get(order.user_id)
@@ -61,7 +63,7 @@ async def complete_paid_order(call: CallbackQuery):
                     "amount": order.amount,
                     "currency": order.currency
                 })
-                send_email(
+                await send_email_async(
                     to=user.email,
                     subject="✅ Заказ выполнен | Donate Raid",
                     body=html
@@ -94,7 +96,8 @@ async def refund_paid_order(call: CallbackQuery):
 
     db = get_db()
     try:
-        order = db.query(Order).get(order_id)
+        # Блокируем строку заказа: webhook оплаты и повторное нажатие ждут конца транзакции
+        order = db.query(Order).filter(Order.id == order_id).with_for_update().first()
         if not order:
             await call.message.answer("❌ Заказ не найден.")
             await call.answer()
@@ -106,7 +109,7 @@ async def refund_paid_order(call: CallbackQuery):
             return
 
         # Получаем пользователя
-        user = db.query(User).get(order.user_id)
+        user = db.query(User).filter(User.id == order.user_id).with_for_update().first()
         if not user:
             await call.message.answer("❌ Пользователь не найден.")
             await call.answer()
@@ -122,6 +125,7 @@ async def refund_paid_order(call: CallbackQuery):
         db.commit()
         db.refresh(user)
         db.refresh(order)
+        await publish_order_status_async(order)
 
         username = user.username or user.email or f"ID: {user.id}"
 
@@ -134,7 +138,7 @@ async def refund_paid_order(call: CallbackQuery):
                     "currency": order.currency,
                     "username": user.username
                 })
-                send_email(
+                await send_email_async(
                     to=user.email,
                     subject="💸 Возврат средств | Donate Raid",
                     body=html
@@ -11,6 +11,7 @@ from app.models.user import User
 from app.core.config import settings
 from bot.states.support import SupportReplyState
 from bot.instance import bot
+from app.services.support_realtime import publish_support_message, serialize_support_message
 from datetime import datetime
 from loguru import logger
 
@@ -193,6 +194,9 @@ async def send_reply_support(msg: Message, state: FSMContext):
 
         logger.info(f"💬 Создан ответ поддержки: ID={reply.id}, user_id={user_id}, guest_id={guest_id}")
 
+        # Пушим ответ в открытые чаты на сайте (через брокер в процесс API)
+        await publish_support_message(user_id, guest_id, serialize_support_message(reply))
+
         # Сообщаем админу об успешной отправке
         if user_id:
             user = db.query(User).get(user_id)
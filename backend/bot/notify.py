@@ -1,38 +1,148 @@
+# backend/bot/notify.py - ОЧЕРЕДЬ УВЕДОМЛЕНИЙ АДМИНАМ ИЗ СИНХРОННОГО КОДА API
 import asyncio
+import atexit
 import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
 from aiogram.types import Message
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from bot.config import ADMIN_CHAT_IDS
+from loguru import logger
+from app.core.background_loop import BackgroundLoop
+from bot.config import ADMIN_CHAT_IDS, NOTIFY_QUEUE_SIZE
 from .handlers.manual_orders import manual_order_keyboard
 from bot.instance import bot
 
 
-async def send_to_admins(text: str, keyboard=None):
-    for chat_id in ADMIN_CHAT_IDS:
+async def send_to_admins(text: str, keyboard=None) -> bool:
+    """Рассылает сообщение всем админам параллельно, False - хотя бы одному не доставлено"""
+
+    async def send(chat_id):
         try:
             await bot.send_message(chat_id, text, reply_markup=keyboard, parse_mode="HTML")
+            return True
         except Exception as e:
-            print(f"[ERROR] Can't send to {chat_id}: {e}")
+            logger.error(f"[ERROR] Can't send to {chat_id}: {e}")
+            return False
+
+    results = await asyncio.gather(*(send(chat_id) for chat_id in ADMIN_CHAT_IDS))
+    return all(results)
+
+
+@dataclass
+class _Notification:
+    text: str
+    keyboard: Any = None
+    key: Optional[str] = None
+
+
+@dataclass
+class NotifyMetrics:
+    enqueued: int = 0
+    coalesced: int = 0  # заменили еще не отправленное уведомление с тем же ключом
+    dropped: int = 0  # очередь переполнена
+    sent: int = 0
+    failed: int = 0
+
+
+class NotificationDispatcher:
+    """
+    Один фоновый loop и одна задача-отправитель на процесс.
+
+    Синхронные вызовы только кладут уведомление в ограниченную очередь и
+    сразу возвращаются. Сессия aiogram bot используется только из этого loop.
+    Уведомление с тем же key, еще не ушедшее в Telegram, заменяется новым.
+    """
+
+    def __init__(self, maxsize: int = 500):
+        self.maxsize = maxsize
+        self.metrics = NotifyMetrics()
+        self._background = BackgroundLoop("bot-notify")
+        self._queue: Optional[asyncio.Queue] = None
+        self._pending: Dict[str, _Notification] = {}
+        self._consumer: Optional[asyncio.Task] = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._queue is None:
+            with self._lock:
+                if self._queue is None:
+                    self._background.run(self._start())
+
+    async def _start(self):
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._consumer = asyncio.get_running_loop().create_task(self._consume())
+
+    def enqueue(self, text: str, keyboard=None, key: Optional[str] = None):
+        self._ensure_started()
+        notification = _Notification(text=text, keyboard=keyboard, key=key)
+        self._background.loop.call_soon_threadsafe(self._put, notification)
+
+    def _put(self, notification: _Notification):
+        """Выполняется в фоновом loop"""
+        key = notification.key
+        if key and key in self._pending:
+            pending = self._pending[key]
+            pending.text, pending.keyboard = notification.text, notification.keyboard
+            self.metrics.coalesced += 1
+            return
+
+        try:
+            self._queue.put_nowait(notification)
+        except asyncio.QueueFull:
+            self.metrics.dropped += 1
+            logger.error(f"[ERROR] Очередь уведомлений переполнена ({self.maxsize}), сообщение отброшено")
+            return
+
+        self.metrics.enqueued += 1
+        if key:
+            self._pending[key] = notification
+
+    async def _consume(self):
+        while True:
+            notification = await self._queue.get()
+            if notification.key:
+                self._pending.pop(notification.key, None)
+            try:
+                if await send_to_admins(notification.text, notification.keyboard):
+                    self.metrics.sent += 1
+                else:
+                    self.metrics.failed += 1
+            except Exception as e:
+                self.metrics.failed += 1
+                logger.error(f"[ERROR] Notification failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """Выполняет произвольную корутину с ботом в loop диспетчера и ждет результат"""
+        self._ensure_started()
+        return self._background.run(coro, timeout)
+
+    async def run_async(self, coro):
+        """То же из async кода другого loop (например, фоновые задачи FastAPI)"""
+        self._ensure_started()
+        return await self._background.run_async(coro)
+
+    def get_metrics(self) -> dict:
+        return {**self.metrics.__dict__, "queued": self._queue.qsize() if self._queue else 0}
+
+    async def _shutdown(self):
+        if self._consumer is not None:
+            self._consumer.cancel()
+
+    def close(self):
+        self._background.stop(self._shutdown())
+
+
+# Один диспетчер на процесс
+notification_dispatcher = NotificationDispatcher(maxsize=NOTIFY_QUEUE_SIZE)
+atexit.register(notification_dispatcher.close)
 
 
 def notify_manual_order_sync(text: str, order_id: int = None):
     """Синхронная версия уведомления о ручном заказе"""
     kb = manual_order_keyboard(order_id) if order_id else None
-
-    def run_notification():
-        try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            loop.run_until_complete(send_to_admins(text, kb))
-        except Exception as e:
-            print(f"[ERROR] Notification failed: {e}")
-        finally:
-            try:
-                loop.close()
-            except:
-                pass
-
-    threading.Thread(target=run_notification, daemon=True).start()
+    notification_dispatcher.enqueue(text, kb, key=f"manual_order:{order_id}" if order_id else None)
 
 
 def review_moderation_keyboard(review_id: int):
@@ -76,18 +186,4 @@ def notify_new_review_sync(review_data: dict):
     # Клавиатура для модерации
     kb = review_moderation_keyboard(review_id)
 
-    def run_notification():
-        try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            loop.run_until_complete(send_to_admins(message, kb))
-            print(f"✅ [REVIEW] Уведомление о новом отзыве #{review_id} отправлено")
-        except Exception as e:
-            print(f"[ERROR] Review notification failed: {e}")
-        finally:
-            try:
-                loop.close()
-            except:
-                pass
-
-    threading.Thread(target=run_notification, daemon=True).start()
\ No newline at end of file
+    notification_dispatcher.enqueue(message, kb, key=f"review:{review_id}" if review_id else None)
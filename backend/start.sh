@@ -13,7 +13,21 @@ export PYTHONPATH=.
 if [ "$BOT_MODE" = "true" ]; then
   echo "🚀 BOT_MODE=true — запускаем Telegram-бота"
   python bot/main.py
+elif [ "$WORKER_MODE" = "true" ]; then
+  echo "🚀 WORKER_MODE=true — запускаем outbox воркер"
+  python -m app.worker
 else
   echo "🚀 BOT_MODE=false — запускаем FastAPI"
-  uvicorn app.main:app --host 0.0.0.0 --port 8000 --reload
+  # UVICORN_WORKERS>1 - несколько процессов API: чат поддержки и инвалидация
+  # кэшей каталога/контента синхронизируются между ними только через REDIS_URL
+  WORKERS="${UVICORN_WORKERS:-1}"
+  if [ "$WORKERS" -gt 1 ] && [ -z "$REDIS_URL" ]; then
+    echo "⚠️ UVICORN_WORKERS=$WORKERS без REDIS_URL — процессы отдавали бы устаревший каталог и цены, запускаем 1 процесс"
+    WORKERS=1
+  fi
+  if [ "${UVICORN_WORKERS:-1}" -gt 1 ]; then
+    uvicorn app.main:app --host 0.0.0.0 --port 8000 --workers "$WORKERS"
+  else
+    uvicorn app.main:app --host 0.0.0.0 --port 8000 --reload
+  fi
 fi
@@ -253,7 +253,9 @@ const handleBuySelected = () => {
         id: product.id,
         game_id: product.game_id,
         name: product.name,
-        price_rub: product.price_rub
+        price_rub: product.price_rub,
+        min_amount: product.min_amount,
+        max_amount: product.max_amount
       },
       inputs: collectedInputs,
       quantity: quantity
@@ -30,6 +30,7 @@ interface Order {
   created_at: string
   game?: { id: number; name: string }
   product?: { id: number; name: string; price_rub: number }
+  items?: { id: number; product_id?: number; product_name?: string; quantity: number; form_data?: Record<string, string> }[]
 }
 
 export default function OrderPage() {
@@ -45,6 +46,23 @@ export default function OrderPage() {
     loadOrder()
   }, [id])
 
+  // Смены статуса приходят с сервера (SSE), без повторных запросов заказа
+  const isFinal = order?.status === 'done' || order?.status === 'canceled'
+  useEffect(() => {
+    if (!order || isFinal) return
+
+    const source = new EventSource(`${process.env.NEXT_PUBLIC_API_URL}/orders/${id}/events`)
+    source.addEventListener('status', (event) => {
+      const data = JSON.parse((event as MessageEvent).data)
+      setOrder((prev) => (prev ? { ...prev, status: data.status } : prev))
+      if (data.status === 'done' || data.status === 'canceled') {
+        source.close()
+      }
+    })
+
+    return () => source.close()
+  }, [id, Boolean(order), isFinal])
+
   const loadOrder = async () => {
     try {
       const response = await api.get(`/orders/${id}`)
@@ -163,7 +181,14 @@ export default function OrderPage() {
     )
   }
 
-  const userData = order.comment ? parseUserData(order.comment) : {}
+  // Данные форм - из позиций заказа, для старых заказов - из комментария
+  const itemsData = (order.items || []).reduce<Record<string, string>>(
+    (acc, item) => Object.assign(acc, item.form_data || {}),
+    {}
+  )
+  const userData = Object.keys(itemsData).length > 0
+    ? itemsData
+    : order.comment ? parseUserData(order.comment) : {}
 
   return (
   <div className="py-8 max-w-4xl mx-auto space-y-6 px-4">
@@ -127,7 +127,8 @@ export default function CheckoutPage() {
         items: items.map((item) => ({
           game_id: item.product.game_id,
           product_id: item.product.id,
-          amount: item.product.price_rub,
+          amount: item.product.price_rub * (item.quantity || 1),
+          quantity: item.quantity || 1,
           currency: 'RUB',
           payment_method: method,
           comment: JSON.stringify(item.inputs),
@@ -67,7 +67,9 @@ export default function ProductGrid({ products, onAddToCart, gameInputFields }:
         id: product.id,
         game_id: product.game_id,
         name: product.name,
-        price_rub: product.price_rub
+        price_rub: product.price_rub,
+        min_amount: product.min_amount,
+        max_amount: product.max_amount
       },
       inputs: {} // TODO: Здесь должны быть собранные поля
     }
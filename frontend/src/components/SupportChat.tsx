@@ -16,6 +16,18 @@ interface SupportChatProps {
   onClose: () => void
 }
 
+// Пока WebSocket подключен, /support/my не опрашиваем - polling только как запасной канал
+const POLLING_INTERVAL = 3000
+const WS_RECONNECT_DELAY = 5000
+// Коды закрытия сокета при отказе в доступе (см. websocket_support.py) - переподключаться бессмысленно
+const WS_AUTH_CLOSE_CODES = [4401, 4403]
+
+// Добавляет сообщение, если его еще нет (одно и то же приходит из сокета, ответа /send и polling)
+function mergeMessage(messages: SupportMessage[], message: SupportMessage): SupportMessage[] {
+  if (messages.some(m => m.id === message.id)) return messages
+  return [...messages, message].sort((a, b) => a.id - b.id)
+}
+
 // Генерация и сохранение guest_id
 function generateGuestId(): string {
   let guestId = localStorage.getItem('support_guest_id') // используем отдельный ключ для поддержки
@@ -42,7 +54,9 @@ export default function SupportChat({ onClose }: SupportChatProps) {
   const messagesEndRef = useRef<HTMLDivElement>(null)
   const inputRef = useRef<HTMLTextAreaElement>(null)
   const pollingIntervalRef = useRef<NodeJS.Timeout | null>(null)
-  const lastMessageCountRef = useRef(0)
+  const lastMessageIdRef = useRef(0)
+  const wsRef = useRef<WebSocket | null>(null)
+  const wsConnectedRef = useRef(false)
 
   // Прокрутка к последнему сообщению
   const scrollToBottom = useCallback(() => {
@@ -85,14 +99,17 @@ export default function SupportChat({ onClose }: SupportChatProps) {
 
         const newMessages = Array.isArray(data) ? data : []
 
-        // Проверяем, изменилось ли количество сообщений
-        const currentCount = newMessages.length
-        if (currentCount !== lastMessageCountRef.current || !silent) {
-          setMessages(newMessages)
-          lastMessageCountRef.current = currentCount
+        // Сравниваем id последнего сообщения, а не количество: /support/my отдает
+        // только последние SUPPORT_MY_LIMIT сообщений, и на длинном диалоге оно не меняется
+        const lastId = newMessages.length ? newMessages[newMessages.length - 1].id : 0
+        if (lastId !== lastMessageIdRef.current || !silent) {
+          const hasNew = lastId > lastMessageIdRef.current
+          // Сообщения новее снимка могли уже прийти через WebSocket - не теряем их
+          setMessages(prev => [...newMessages, ...prev.filter(m => m.id > lastId && m.status !== 'sending')])
+          lastMessageIdRef.current = Math.max(lastMessageIdRef.current, lastId)
 
           // Прокручиваем только если добавились новые сообщения
-          if (currentCount > lastMessageCountRef.current || !silent) {
+          if (hasNew || !silent) {
             setTimeout(scrollToBottom, 100)
           }
         }
@@ -160,13 +177,15 @@ export default function SupportChat({ onClose }: SupportChatProps) {
         const data = await response.json()
         console.log('✅ Сообщение отправлено:', data)
 
-        // Убираем временное сообщение и сразу перезагружаем все сообщения
-        setMessages(prev => prev.filter(msg => msg.id !== tempMessage.id))
+        // Заменяем временное сообщение сохраненным
+        setMessages(prev => mergeMessage(prev.filter(msg => msg.id !== tempMessage.id), data))
 
-        // Перезагружаем сообщения через небольшую задержку
-        setTimeout(() => {
-          loadMessages(true)
-        }, 500)
+        // Без WebSocket перезагружаем сообщения через небольшую задержку
+        if (!wsConnectedRef.current) {
+          setTimeout(() => {
+            loadMessages(true)
+          }, 500)
+        }
 
       } else {
         console.error('❌ Ошибка отправки сообщения:', response.status, response.statusText)
@@ -212,13 +231,105 @@ export default function SupportChat({ onClose }: SupportChatProps) {
     loadMessages()
   }, [loadMessages])
 
-  // Настройка polling для автоматического получения новых сообщений
+  // WebSocket: новые сообщения приходят сразу, пропущенные догружаются по last_id
+  useEffect(() => {
+    let closed = false
+    let reconnectTimer: NodeJS.Timeout | null = null
+
+    const resolveRoomId = async (): Promise<string | null> => {
+      if (!token) return `guest_${guestId}`
+      const response = await fetch(`${process.env.NEXT_PUBLIC_API_URL}/users/me`, {
+        headers: { Authorization: `Bearer ${token}` }
+      })
+      if (!response.ok) return null
+      const user = await response.json()
+      return `user_${user.id}`
+    }
+
+    const connect = async () => {
+      let roomId: string | null = null
+      try {
+        roomId = await resolveRoomId()
+      } catch (error) {
+        console.error('❌ Не удалось определить комнату чата:', error)
+      }
+      if (closed) return
+      if (!roomId) {
+        console.warn('⚠️ WebSocket недоступен, остаемся на polling')
+        return
+      }
+
+      const params = new URLSearchParams()
+      if (lastMessageIdRef.current) {
+        params.append('last_id', String(lastMessageIdRef.current))
+      }
+      const query = params.toString() ? '?' + params.toString() : ''
+      const ws = new WebSocket(`${process.env.NEXT_PUBLIC_WS_URL}/ws/support/ws/${encodeURIComponent(roomId)}${query}`)
+      wsRef.current = ws
+
+      ws.onopen = () => {
+        // Токен - первым кадром, а не в URL (URL попадает в логи прокси)
+        ws.send(JSON.stringify(token ? { type: 'auth', token } : { type: 'auth', guest_id: guestId }))
+        wsConnectedRef.current = true
+        console.log('🔌 WebSocket чата поддержки подключен:', roomId)
+        // Без last_id догрузки нет - сообщения до подписки берем из /support/my
+        if (!lastMessageIdRef.current) {
+          loadMessages(true)
+        }
+      }
+
+      ws.onmessage = (event) => {
+        let data: any
+        try {
+          data = JSON.parse(event.data)
+        } catch {
+          return
+        }
+
+        if (data.type === 'ping') {
+          ws.send('pong')
+        } else if (data.type === 'new_message' && data.data) {
+          const message: SupportMessage = data.data
+          lastMessageIdRef.current = Math.max(lastMessageIdRef.current, message.id)
+          setMessages(prev => mergeMessage(prev, message))
+          setTimeout(scrollToBottom, 100)
+        } else if (data.type === 'replay_done' && data.truncated) {
+          // Пропущено больше, чем сервер догружает за раз - берем последние сообщения целиком
+          loadMessages(true)
+        }
+      }
+
+      ws.onclose = (event) => {
+        wsConnectedRef.current = false
+        if (wsRef.current === ws) wsRef.current = null
+        if (closed) return
+        if (WS_AUTH_CLOSE_CODES.includes(event.code)) {
+          console.warn('⚠️ WebSocket отклонен сервером, остаемся на polling:', event.code)
+          return
+        }
+        console.log('🔌 WebSocket отключен, переподключение...')
+        reconnectTimer = setTimeout(connect, WS_RECONNECT_DELAY)
+      }
+    }
+
+    connect()
+
+    return () => {
+      closed = true
+      wsConnectedRef.current = false
+      if (reconnectTimer) clearTimeout(reconnectTimer)
+      wsRef.current?.close()
+      wsRef.current = null
+    }
+  }, [token, guestId, loadMessages, scrollToBottom])
+
+  // Polling - запасной канал, пока WebSocket не подключен
   useEffect(() => {
-    // Устанавливаем polling каждые 3 секунды (независимо от минимизации)
     pollingIntervalRef.current = setInterval(() => {
+      if (wsConnectedRef.current) return
       console.log('🔄 Polling - проверяем новые сообщения...')
       loadMessages(true)
-    }, 3000)
+    }, POLLING_INTERVAL)
 
     return () => {
       if (pollingIntervalRef.current) {
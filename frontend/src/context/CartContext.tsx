@@ -9,6 +9,8 @@ export type CartItem = {
     game_id: number
     name: string
     price_rub: number
+    min_amount?: number
+    max_amount?: number
   }
   inputs: Record<string, string>
   quantity?: number
@@ -27,6 +29,14 @@ type CartContextType = {
 
 const CartContext = createContext<CartContextType | undefined>(undefined)
 
+// Количество позиции в пределах min_amount..max_amount товара. В старых корзинах
+// лимитов нет - такое количество бэкенд сам разбивает на позиции по max_amount
+const clampQuantity = (product: CartItem['product'], quantity: number) => {
+  const min = product.min_amount || 1
+  const max = product.max_amount || Infinity
+  return Math.min(Math.max(quantity, min), max)
+}
+
 export function CartProvider({ children }: { children: ReactNode }) {
   const [items, setItems] = useState<CartItem[]>([])
   const [mounted, setMounted] = useState(false)
@@ -68,16 +78,17 @@ export function CartProvider({ children }: { children: ReactNode }) {
       )
 
       if (existingIndex >= 0) {
-        // Увеличиваем количество существующего товара
+        // Увеличиваем количество существующего товара, но не больше max_amount
         const updated = [...prev]
         updated[existingIndex] = {
           ...updated[existingIndex],
-          quantity: (updated[existingIndex].quantity || 1) + (newItem.quantity || 1)
+          product: newItem.product,
+          quantity: clampQuantity(newItem.product, (updated[existingIndex].quantity || 1) + (newItem.quantity || 1))
         }
         return updated
       } else {
         // Добавляем новый товар
-        return [...prev, { ...newItem, quantity: newItem.quantity || 1 }]
+        return [...prev, { ...newItem, quantity: clampQuantity(newItem.product, newItem.quantity || 1) }]
       }
     })
   }
@@ -95,10 +106,11 @@ export function CartProvider({ children }: { children: ReactNode }) {
         if (existingIndex >= 0) {
           updated[existingIndex] = {
             ...updated[existingIndex],
-            quantity: (updated[existingIndex].quantity || 1) + (newItem.quantity || 1)
+            product: newItem.product,
+            quantity: clampQuantity(newItem.product, (updated[existingIndex].quantity || 1) + (newItem.quantity || 1))
           }
         } else {
-          updated.push({ ...newItem, quantity: newItem.quantity || 1 })
+          updated.push({ ...newItem, quantity: clampQuantity(newItem.product, newItem.quantity || 1) })
         }
       })
       
@@ -123,7 +135,7 @@ export function CartProvider({ children }: { children: ReactNode }) {
     setItems(prev => {
       const updated = [...prev]
       if (updated[index]) {
-        updated[index] = { ...updated[index], quantity }
+        updated[index] = { ...updated[index], quantity: clampQuantity(updated[index].product, quantity) }
       }
       return updated
     })